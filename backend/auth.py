@@ -1,37 +1,50 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
+import hashlib
 import os
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import secrets
+import uuid
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from database import execute_query
+from database import execute_query, read_prepared, insert_refresh_token, get_refresh_token, rotate_refresh_token, revoke_refresh_token_family
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Refresh tokens let clients get new access tokens without re-sending the password (and paying
+# for bcrypt). They are single use: each refresh revokes the token and issues a successor.
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+# A token reused this soon after rotation is treated as a race between tabs, not theft
+REFRESH_REUSE_GRACE_SECONDS = 30
+
 # Simple single-user credentials (set via environment variables)
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "password123")
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (passlib/bcrypt and python-jose are imported on first use to keep cold starts fast)
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """Get the bcrypt password context"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Token security
 security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -44,12 +57,52 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 def verify_token(token: str) -> Optional[dict]:
     """Verify and decode a JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
 
+def hash_refresh_token(token: str) -> str:
+    """Hash a refresh token for storage (tokens are random, so a fast hash is enough)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def create_refresh_token(user_id: int, family_id: Optional[str] = None) -> str:
+    """Issue a refresh token, starting a new token family unless one is given"""
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    insert_refresh_token(user_id, hash_refresh_token(token), family_id or uuid.uuid4().hex, expires_at)
+    return token
+
+def refresh_tokens(refresh_token: str) -> Optional[Tuple[str, str]]:
+    """Exchange a refresh token for a new (access token, refresh token) pair; None if it is not valid"""
+    row = get_refresh_token(hash_refresh_token(refresh_token))
+    if row is None:
+        return None
+    now = datetime.utcnow()
+    if row['revoked_at'] is not None:
+        if now - row['revoked_at'] > timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+            # A rotated token came back: it may have been stolen, so end the whole session
+            revoke_refresh_token_family(row['family_id'])
+        return None
+    if row['expires_at'] < now:
+        return None
+
+    new_token = secrets.token_urlsafe(32)
+    expires_at = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    if not rotate_refresh_token(row['id'], row['user_id'], hash_refresh_token(new_token), row['family_id'], expires_at):
+        # Rotated concurrently by another request
+        return None
+    access_token = create_access_token(data={"sub": str(row['user_id'])})
+    return access_token, new_token
+
+def revoke_refresh_token(refresh_token: str):
+    """Revoke a refresh token and every token rotated from the same login (logout)"""
+    row = get_refresh_token(hash_refresh_token(refresh_token))
+    if row is not None:
+        revoke_refresh_token_family(row['family_id'])
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get the current authenticated user"""
     credentials_exception = HTTPException(
@@ -69,7 +122,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         raise credentials_exception
     
     # Get user from database
-    user = execute_query("SELECT id, username, email FROM users WHERE id = %s", (user_id,), fetch_one=True)
+    user = read_prepared("user_by_id", (user_id,), fetch_one=True)
     
     if user is None:
         raise credentials_exception
@@ -80,6 +133,17 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         "email": user['email']
     }
 
+def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
+    """Get the authenticated user's ID from the token alone, without a database lookup (for hot write paths)"""
+    payload = verify_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return int(payload["sub"])
+
 def authenticate_user(username: str, password: str) -> Optional[dict]:
     """Authenticate a user with username and password"""
     # First try to get user from database
@@ -0,0 +1,94 @@
+"""
+End-to-end latency and throughput of the FastAPI endpoints.
+
+Start the API first (e.g. `uv run uvicorn main:app --workers 4`) against a
+database that bench_db can also use, then point BENCH_API_URL at it. The admin
+credentials come from ADMIN_USERNAME / ADMIN_PASSWORD as in auth.py.
+"""
+
+import gzip
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import summarize, synthetic_cards
+
+BENCH_API_URL = os.getenv("BENCH_API_URL", "http://localhost:8000")
+BENCH_SUBJECT = "__bench_api__"
+
+
+def request(method: str, path: str, token: str = None, body=None, accept_encoding: str = None):
+    """Returns (decoded JSON, bytes on the wire)"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f"{BENCH_API_URL}{path}", data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    if accept_encoding:
+        req.add_header("Accept-Encoding", accept_encoding)
+    with urllib.request.urlopen(req) as response:
+        payload = response.read()
+        wire_size = len(payload)
+        if response.headers.get("Content-Encoding") == "gzip":
+            payload = gzip.decompress(payload)
+    return json.loads(payload), wire_size
+
+
+def load(method: str, path: str, token: str, requests: int, concurrency: int, body=None, accept_encoding: str = None) -> dict:
+    """
+    Fire `requests` calls with `concurrency` parallel clients.
+
+    Returns:
+        Latency summary plus overall throughput and average response size
+    """
+    def timed(_):
+        start = time.perf_counter()
+        _, size = request(method, path, token, body, accept_encoding)
+        return time.perf_counter() - start, size
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    stats = summarize([duration for duration, _ in samples])
+    stats['concurrency'] = concurrency
+    stats['throughput_rps'] = requests / elapsed
+    stats['response_bytes'] = sum(size for _, size in samples) / len(samples)
+    return stats
+
+
+def run(quick: bool = False) -> dict:
+    login = {"username": os.getenv("ADMIN_USERNAME", "admin"), "password": os.getenv("ADMIN_PASSWORD", "password123")}
+    token = request("POST", "/login", body=login)[0]["access_token"]
+
+    deck_size = 200 if quick else 2000
+    cards = [dict(c, subject=BENCH_SUBJECT, test=f"deck-{deck_size}") for c in synthetic_cards(deck_size)]
+    request("POST", "/upload_flashcards", token, {"flashcards": cards})
+
+    subjects = request("GET", "/subjects", token)[0]
+    subject_id = next(s["id"] for s in subjects if s["name"] == BENCH_SUBJECT)
+    tests = request("GET", f"/subjects/{subject_id}/tests", token)[0]
+    test_id = next(t["id"] for t in tests if t["name"] == f"deck-{deck_size}")
+    card_id = request("GET", f"/tests/{test_id}/flashcards", token)[0][0]["id"]
+
+    requests = 50 if quick else 500
+    results = {}
+    for concurrency in ([4] if quick else [1, 8, 32]):
+        results[f"GET /subjects[c={concurrency}]"] = load("GET", "/subjects", token, requests, concurrency)
+        results[f"GET /subjects/id/tests[c={concurrency}]"] = load("GET", f"/subjects/{subject_id}/tests", token, requests, concurrency)
+        results[f"GET /tests/id/flashcards[{deck_size} cards,c={concurrency}]"] = load(
+            "GET", f"/tests/{test_id}/flashcards", token, max(requests // 10, 10), concurrency)
+        results[f"GET /tests/id/flashcards[{deck_size} cards,gzip,c={concurrency}]"] = load(
+            "GET", f"/tests/{test_id}/flashcards", token, max(requests // 10, 10), concurrency, accept_encoding="gzip")
+        results[f"GET /tests/id/flashcards?limit=200[{deck_size} cards,c={concurrency}]"] = load(
+            "GET", f"/tests/{test_id}/flashcards?offset=0&limit=200", token, requests, concurrency)
+        results[f"PATCH /flashcards/id/mastered[c={concurrency}]"] = load(
+            "PATCH", f"/flashcards/{card_id}/mastered", token, requests, concurrency, body=True)
+        results[f"POST /reviews[c={concurrency}]"] = load(
+            "POST", "/reviews", token, requests, concurrency,
+            body={"events": [{"flashcard_id": card_id, "result": "correct", "latency_ms": 1500}]})
+        results[f"POST /upload_flashcards[20 dup cards,c={concurrency}]"] = load(
+            "POST", "/upload_flashcards", token, max(requests // 10, 10), concurrency, body={"flashcards": cards[:20]})
+    return results
@@ -0,0 +1,28 @@
+"""
+Microbenchmarks for chunking and pre-generation filtering.
+"""
+
+from chunking import chunk_text_intelligently, chunk_text_content_defined, preprocess_text_for_chunking
+from filtering import dedupe_chunks
+from benchmarks.common import measure, synthetic_text
+
+
+def run(quick: bool = False) -> dict:
+    sizes = [10_000] if quick else [10_000, 100_000, 500_000]
+    repeat = 5 if quick else 20
+    results = {}
+
+    for size in sizes:
+        text = synthetic_text(size)
+        results[f"preprocess_text_for_chunking[{size}w]"] = measure(
+            lambda: preprocess_text_for_chunking(text), repeat=repeat)
+        results[f"chunk_text_intelligently[{size}w]"] = measure(
+            lambda: list(chunk_text_intelligently(text, 1000, 100)), repeat=repeat)
+        results[f"chunk_text_content_defined[{size}w]"] = measure(
+            lambda: list(chunk_text_content_defined(text, 1000)), repeat=repeat)
+
+        chunks = list(chunk_text_intelligently(text, 1000, 100))
+        results[f"dedupe_chunks[{len(chunks)} chunks]"] = measure(
+            lambda: dedupe_chunks(chunks), repeat=repeat)
+
+    return results
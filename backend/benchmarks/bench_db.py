@@ -0,0 +1,82 @@
+"""
+Database benchmarks against a local Postgres.
+
+Set BENCH_DATABASE_URL (or DATABASE_URL) to a disposable database; the suite
+creates a "__bench__" subject owned by the admin user and removes it afterwards.
+"""
+
+import asyncio
+import os
+from benchmarks.common import measure, synthetic_cards
+
+BENCH_SUBJECT = "__bench__"
+
+
+def cleanup(execute_query, subject_id):
+    execute_query("DELETE FROM flashcards WHERE test_id IN (SELECT id FROM tests WHERE subject_id = %s)", (subject_id,), fetch_all=False)
+    execute_query("DELETE FROM tests WHERE subject_id = %s", (subject_id,), fetch_all=False)
+    execute_query("DELETE FROM subjects WHERE id = %s", (subject_id,), fetch_all=False)
+
+
+def search_rows(count: int, batch: int = 10_000):
+    """(front, back, mastered) rows generated in batches; one card in 1000 mentions the rare word "zygote" """
+    for start in range(0, count, batch):
+        for i, card in enumerate(synthetic_cards(min(batch, count - start), seed=start)):
+            back = card['back'] + (" zygote" if (start + i) % 1000 == 0 else "")
+            yield f"{start + i}: {card['front']}", back, False
+
+
+def run(quick: bool = False) -> dict:
+    if os.getenv("BENCH_DATABASE_URL"):
+        os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+
+    from database import (init_db, execute_query, insert_subject, insert_test, get_existing_flashcard_fronts,
+                          insert_flashcards, import_flashcards, search_flashcards)
+    from auth import create_admin_user_if_not_exists
+    from main import upload_flashcards_batch, FlashcardsBatch, FlashcardCreate
+
+    init_db()
+    create_admin_user_if_not_exists()
+    user = {"id": 1}
+    subject_id = insert_subject(BENCH_SUBJECT, user["id"])
+    repeat = 3 if quick else 10
+    results = {}
+
+    try:
+        for batch_size in ([100] if quick else [1, 100, 1000]):
+            cards = [(c['front'], c['back']) for c in synthetic_cards(batch_size)]
+            test_id = insert_test(f"insert-{batch_size}", subject_id)
+            results[f"insert_flashcards[{batch_size} cards]"] = measure(
+                lambda: insert_flashcards(test_id, cards), repeat=repeat, warmup=1)
+
+        for deck_size in ([1000] if quick else [1000, 10_000]):
+            test_id = insert_test(f"fronts-{deck_size}", subject_id)
+            insert_flashcards(test_id, [(c['front'], c['back']) for c in synthetic_cards(deck_size)])
+            results[f"get_existing_flashcard_fronts[{deck_size} cards]"] = measure(
+                lambda: get_existing_flashcard_fronts(test_id), repeat=repeat)
+
+        for batch_size in ([20] if quick else [20, 200]):
+            counter = iter(range(1_000_000))
+
+            def upload():
+                # A fresh test per run so every card is new rather than a skipped duplicate
+                test_name = f"upload-{batch_size}-{next(counter)}"
+                batch = FlashcardsBatch(flashcards=[
+                    FlashcardCreate(front=c['front'], back=c['back'], subject=BENCH_SUBJECT, test=test_name)
+                    for c in synthetic_cards(batch_size)
+                ])
+                return asyncio.run(upload_flashcards_batch(batch, user))
+
+            results[f"upload_flashcards_batch[{batch_size} cards]"] = measure(upload, repeat=repeat, warmup=1)
+
+        search_cards = int(os.getenv("BENCH_SEARCH_CARDS", "20000" if quick else "200000"))
+        test_id = insert_test(f"search-{search_cards}", subject_id)
+        import_flashcards(test_id, search_rows(search_cards))
+        execute_query("ANALYZE flashcards", fetch_all=False)
+        for label, query in (("rare term", "zygote"), ("common term", "binary"), ("phrase", "hash table")):
+            results[f"search_flashcards[{label},{search_cards} cards]"] = measure(
+                lambda: search_flashcards(user["id"], query, 20, 0), repeat=repeat)
+    finally:
+        cleanup(execute_query, subject_id)
+
+    return results
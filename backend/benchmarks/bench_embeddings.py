@@ -0,0 +1,57 @@
+"""
+Semantic search benchmarks: top-k query latency over the memory-mapped vector
+index and embedding throughput.
+
+The index is built in a temporary directory from random unit vectors (no
+database or model needed). BENCH_EMBED_CARDS and BENCH_EMBED_DIM override the
+corpus size (default 100k x 768, nomic-embed-text's dimension; 10k with --quick).
+"""
+
+import os
+import tempfile
+import numpy as np
+from benchmarks.common import measure, synthetic_cards
+from embeddings import HashingEmbedder, embed_texts
+from vector_index import VectorIndex
+
+USERS = 10
+
+
+def build_index(directory: str, count: int, dim: int, batch: int = 20_000) -> VectorIndex:
+    """Index `count` random unit vectors; card i belongs to user i % USERS"""
+    rng = np.random.default_rng(0)
+    index = VectorIndex("bench", directory)
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        vectors = rng.standard_normal((size, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = np.arange(start + 1, start + size + 1, dtype=np.int64)
+        index.append(ids, ids % USERS, vectors, ids.tolist())
+    return index
+
+
+def run(quick: bool = False) -> dict:
+    count = int(os.getenv("BENCH_EMBED_CARDS", "10000" if quick else "100000"))
+    dim = int(os.getenv("BENCH_EMBED_DIM", "768"))
+    repeat = 10 if quick else 50
+    results = {}
+    rng = np.random.default_rng(1)
+    query = rng.standard_normal(dim, dtype=np.float32)
+    query /= np.linalg.norm(query)
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = build_index(directory, count, dim)
+        # Every card belongs to one user: a full scan of the file
+        index.users[:] = 1
+        results[f"search[all {count} cards,{dim}d,k=10]"] = measure(lambda: index.search(query, 1, 10), repeat=repeat, warmup=2)
+        # 1 user in USERS owns the cards: only their rows are gathered
+        index.users[:] = index.ids % USERS
+        results[f"search[{count // USERS} of {count} cards,{dim}d,k=10]"] = measure(
+            lambda: index.search(query, 1, 10), repeat=repeat, warmup=2)
+        results[f"related[{count // USERS} of {count} cards,{dim}d,k=10]"] = measure(
+            lambda: index.search(index.vector_for(USERS + 1), 1, 10, exclude=(USERS + 1,)), repeat=repeat, warmup=2)
+
+    texts = [f"{card['front']}\n{card['back']}" for card in synthetic_cards(1000 if quick else 10_000)]
+    embedder = HashingEmbedder()
+    results[f"embed_texts[hash-256,{len(texts)} cards]"] = measure(lambda: embed_texts(texts, embedder), repeat=3, warmup=1)
+    return results
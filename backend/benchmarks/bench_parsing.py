@@ -0,0 +1,35 @@
+"""
+Microbenchmarks for parse_flashcards on synthetic LLM output.
+
+Ollama is replaced by a canned response so only the JSON parse and the regex
+fallback are measured.
+"""
+
+import import_pdf
+from benchmarks.common import measure, synthetic_llm_output
+
+
+class CannedOllama:
+    def __init__(self, content: str):
+        self.response = {"message": {"content": content}}
+
+    def chat(self, model, messages, **kwargs):
+        return self.response
+
+
+def run(quick: bool = False) -> dict:
+    counts = [20] if quick else [20, 200, 2000]
+    repeat = 20 if quick else 100
+    results = {}
+    original = import_pdf.ollama
+
+    try:
+        for count in counts:
+            for style in ("json", "prose", "broken"):
+                import_pdf.ollama = CannedOllama(synthetic_llm_output(count, style))
+                results[f"parse_flashcards[{style},{count} cards]"] = measure(
+                    lambda: import_pdf.parse_flashcards("chunk"), repeat=repeat)
+    finally:
+        import_pdf.ollama = original
+
+    return results
@@ -0,0 +1,64 @@
+"""
+End-to-end generation pipeline throughput against the fake Ollama server.
+
+Runs chunking, filtering and parse_flashcards over a synthetic document with
+the real `ollama` client pointed at `benchmarks.fake_ollama`, so results are
+reproducible without a GPU. Configure the simulated model with the
+BENCH_OLLAMA_LATENCY, BENCH_OLLAMA_TPS and BENCH_OLLAMA_MALFORMED variables.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import ollama
+import import_pdf
+from chunking import chunk_text_intelligently
+from filtering import dedupe_chunks
+from benchmarks.common import synthetic_text
+from benchmarks.fake_ollama import start_fake_ollama
+
+
+def run_pipeline(text: str, client, workers: int) -> dict:
+    start = time.perf_counter()
+    chunks, _ = dedupe_chunks(list(chunk_text_intelligently(text, 1000, 100)))
+    chunked = time.perf_counter()
+
+    original = import_pdf.ollama
+    import_pdf.ollama = client
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            card_lists = list(pool.map(import_pdf.parse_flashcards, chunks))
+    finally:
+        import_pdf.ollama = original
+    elapsed = time.perf_counter() - start
+
+    cards = sum(len(c) for c in card_lists)
+    return {
+        'chunks': len(chunks),
+        'cards': cards,
+        'empty_chunks': sum(1 for c in card_lists if not c),
+        'chunking_ms': (chunked - start) * 1000,
+        'total_s': elapsed,
+        'chunks_per_sec': len(chunks) / elapsed,
+        'cards_per_sec': cards / elapsed,
+    }
+
+
+def run(quick: bool = False) -> dict:
+    latency = os.getenv("BENCH_OLLAMA_LATENCY", "lognormal:-2.3,0.3")
+    tokens_per_sec = float(os.getenv("BENCH_OLLAMA_TPS", "2000"))
+    malformed_rate = float(os.getenv("BENCH_OLLAMA_MALFORMED", "0.1"))
+    text = synthetic_text(20_000 if quick else 200_000)
+    results = {}
+
+    for server_slots in ([1] if quick else [1, 4]):
+        server = start_fake_ollama(latency=latency, tokens_per_sec=tokens_per_sec,
+                                   concurrency=server_slots, malformed_rate=malformed_rate)
+        try:
+            client = ollama.Client(host=server.url)
+            for workers in ([1, 4] if quick else [1, 4, 8]):
+                results[f"pipeline[slots={server_slots},workers={workers}]"] = run_pipeline(text, client, workers)
+        finally:
+            server.shutdown()
+
+    return results
@@ -0,0 +1,113 @@
+"""
+Prepared-statement registry benchmarks: the database work of each hot endpoint
+run three ways against a local Postgres.
+
+- raw: SQL text on a fresh connection per query (execute_query)
+- pooled: SQL text on a pooled connection, parsed and planned every time
+- prepared: by name from PREPARED_QUERIES on a pooled connection (execute_prepared);
+  the deck reads in UNPREPARED_QUERIES run there as pooled SQL, like "pooled"
+
+"pooled" vs "raw" is the connection saved; "prepared" vs "pooled" is the
+parse/plan saved. Set BENCH_DATABASE_URL (or DATABASE_URL) to a disposable
+database, as for bench_db.
+"""
+
+import os
+from benchmarks.common import measure, synthetic_cards
+
+BENCH_SUBJECT = "__bench_prepared__"
+DECK_SIZE = 200
+
+
+def fetch(cur, mode: str):
+    if mode == "one":
+        return cur.fetchone()
+    if mode == "all":
+        return cur.fetchall()
+    return cur.rowcount
+
+
+def run(quick: bool = False) -> dict:
+    if os.getenv("BENCH_DATABASE_URL"):
+        os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+
+    import storage_postgres
+    from database import init_db, execute_query, execute_prepared, insert_subject, insert_test, insert_flashcards, PREPARED_QUERIES
+    from auth import create_admin_user_if_not_exists
+    from benchmarks.bench_db import cleanup
+
+    init_db()
+    create_admin_user_if_not_exists()
+    user_id = 1
+    subject_id = insert_subject(BENCH_SUBJECT, user_id)
+    test_id = insert_test("deck", subject_id)
+    card_id = insert_flashcards(test_id, [(c['front'], c['back']) for c in synthetic_cards(DECK_SIZE)])[0]
+
+    # The statements each endpoint runs (deck reads are cache misses)
+    endpoints = {
+        "GET /me": [
+            ("user_by_id", (user_id,), "one"),
+        ],
+        "GET /subjects/{id}/tests": [
+            ("user_by_id", (user_id,), "one"),
+            ("subject_for_user", (subject_id, user_id), "one"),
+            ("tests_for_subject", (subject_id,), "all"),
+        ],
+        "GET /tests/{id}/flashcards": [
+            ("test_for_user", (test_id, user_id), "one"),
+            ("deck", (test_id,), "all"),
+        ],
+        "GET /tests/{id}/flashcards?limit=100": [
+            ("test_for_user", (test_id, user_id), "one"),
+            ("deck_page", (test_id, 100, 100), "all"),
+        ],
+        "PATCH /flashcards/{id}/mastered": [
+            ("user_by_id", (user_id,), "one"),
+            ("flashcard_for_user", (card_id, user_id), "one"),
+            ("set_mastered", (False, card_id), "none"),
+        ],
+        "POST /upload_flashcards (upserts)": [
+            ("user_by_id", (user_id,), "one"),
+            ("insert_subject", (BENCH_SUBJECT, user_id), "none"),
+            ("subject_id", (BENCH_SUBJECT, user_id), "one"),
+            ("insert_test", ("deck", subject_id), "none"),
+            ("test_id", ("deck", subject_id), "one"),
+        ],
+    }
+
+    def raw(name, params, mode):
+        return execute_query(PREPARED_QUERIES[name], params, fetch_one=mode == "one", fetch_all=mode == "all")
+
+    def pooled(name, params, mode):
+        pool = storage_postgres.get_primary_pool()
+        conn = pool.getconn()
+        try:
+            cur = conn.cursor()
+            cur.execute(PREPARED_QUERIES[name], params)
+            result = fetch(cur, mode)
+            conn.commit()
+            return result
+        finally:
+            pool.putconn(conn)
+
+    def prepared(name, params, mode):
+        return execute_prepared(name, params, fetch_one=mode == "one", fetch_all=mode == "all")
+
+    repeat = 50 if quick else 300
+    results = {}
+    try:
+        for endpoint, statements in endpoints.items():
+            medians = {}
+            for variant, runner in (("raw", raw), ("pooled", pooled), ("prepared", prepared)):
+                stats = measure(lambda: [runner(*statement) for statement in statements], repeat=repeat, warmup=5)
+                results[f"{endpoint} [{variant}]"] = stats
+                medians[variant] = stats['median_ms']
+            results[f"{endpoint} saved"] = {
+                'queries': len(statements),
+                'vs_raw_ms': medians['raw'] - medians['prepared'],
+                'vs_pooled_ms': medians['pooled'] - medians['prepared'],
+            }
+    finally:
+        cleanup(execute_query, subject_id)
+
+    return results
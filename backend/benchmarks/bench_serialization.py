@@ -0,0 +1,68 @@
+"""
+CPU cost and wire size of deck responses (GET /tests/{id}/flashcards).
+
+Serializes a synthetic deck with textbook-length answers the way FastAPI does
+by default (jsonable_encoder + stdlib json) and through `FastJSONResponse`,
+then compresses the body with each coding `CompressionMiddleware` can
+negotiate. Timings are CPU time (process_time), not wall time.
+"""
+
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from benchmarks.common import summarize, synthetic_cards
+from responses import brotli, compress_body, orjson, render_json
+
+
+def measure_cpu(fn, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        samples.append(time.process_time() - start)
+    return summarize(samples)
+
+
+def deck_rows(count: int):
+    return [
+        {'id': i + 1, 'test_id': 1, 'front': card['front'], 'back': card['back'], 'mastered': i % 3 == 0}
+        for i, card in enumerate(synthetic_cards(count, back_words=60))
+    ]
+
+
+def default_fastapi_render(rows) -> bytes:
+    """What a plain `return rows` endpoint costs: jsonable_encoder, then JSONResponse.render"""
+    return json.dumps(jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def run(quick: bool = False) -> dict:
+    deck_size = 1000 if quick else 10000
+    repeat = 5 if quick else 20
+    rows = deck_rows(deck_size)
+    results = {}
+
+    serializers = {"fastapi default": default_fastapi_render, "FastJSONResponse": render_json}
+    for name, render in serializers.items():
+        stats = measure_cpu(lambda: render(rows), repeat)
+        stats['bytes'] = len(render(rows))
+        results[f"serialize[{name},{deck_size} cards]"] = stats
+    results[f"serialize[FastJSONResponse,{deck_size} cards]"]['backend'] = "orjson" if orjson is not None else "json"
+
+    body = render_json(rows)
+    codings = [("gzip-1", "gzip", {'gzip_level': 1}), ("gzip-4", "gzip", {'gzip_level': 4}), ("gzip-6", "gzip", {'gzip_level': 6})]
+    if brotli is not None:
+        codings += [("br-4", "br", {'brotli_quality': 4}), ("br-6", "br", {'brotli_quality': 6})]
+    for label, encoding, options in codings:
+        stats = measure_cpu(lambda: compress_body(body, encoding, **options), repeat)
+        stats['bytes'] = len(compress_body(body, encoding, **options))
+        stats['ratio'] = len(body) / stats['bytes']
+        results[f"compress[{label},{deck_size} cards]"] = stats
+
+    # Full response as served by default (GZIP_LEVEL / BROTLI_QUALITY)
+    for label, encoding in ([("gzip", "gzip")] + ([("br", "br")] if brotli is not None else [])):
+        stats = measure_cpu(lambda: compress_body(render_json(rows), encoding), repeat)
+        stats['bytes'] = len(compress_body(render_json(rows), encoding))
+        results[f"response[FastJSONResponse+{label},{deck_size} cards]"] = stats
+    return results
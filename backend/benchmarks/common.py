@@ -0,0 +1,197 @@
+"""
+Shared helpers for the StudyBuddy benchmark suite: timing, synthetic data and
+JSON result files that can be compared across commits.
+"""
+
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+WORDS = (
+    "algorithm array binary tree node graph edge vertex heap stack queue pointer "
+    "recursion iteration complexity memory cache hash table key value search sort "
+    "merge quick insertion bubble linked list traversal depth breadth first root leaf "
+    "balanced height rotation invariant proof induction loop condition variable"
+).split()
+
+
+def summarize(samples: List[float]) -> Dict:
+    """
+    Summarize timing samples (seconds) as milliseconds.
+
+    Args:
+        samples: Wall-clock durations in seconds
+
+    Returns:
+        Dictionary with min/mean/median/p95/p99/max in ms and operations per second
+    """
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    mean = statistics.fmean(ordered)
+    return {
+        'runs': len(ordered),
+        'min_ms': ordered[0] * 1000,
+        'mean_ms': mean * 1000,
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': percentile(95) * 1000,
+        'p99_ms': percentile(99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'stdev_ms': (statistics.stdev(ordered) * 1000) if len(ordered) > 1 else 0.0,
+        'ops_per_sec': (1 / mean) if mean else 0.0,
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int = 20, warmup: int = 2) -> Dict:
+    """
+    Time a callable repeatedly after a few warmup calls.
+
+    Args:
+        fn: Zero-argument callable to benchmark
+        repeat: Number of timed runs
+        warmup: Number of untimed runs first
+
+    Returns:
+        Summary statistics from `summarize`
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def synthetic_text(num_words: int, seed: int = 42, paragraph_sentences: int = 6) -> str:
+    """
+    Generate deterministic study-material-like text with sentences and paragraphs.
+
+    Args:
+        num_words: Approximate number of words
+        seed: Random seed
+        paragraph_sentences: Sentences per paragraph
+
+    Returns:
+        Synthetic text
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    sentences = []
+    words = 0
+    while words < num_words:
+        length = rng.randint(8, 28)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        words += length
+        if len(sentences) == paragraph_sentences:
+            paragraphs.append(" ".join(sentences))
+            sentences = []
+    if sentences:
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def synthetic_cards(count: int, seed: int = 42, back_words: int = 30) -> List[Dict]:
+    """
+    Generate deterministic flashcards.
+
+    Args:
+        count: Number of cards
+        seed: Random seed
+        back_words: Words in each answer
+
+    Returns:
+        List of {'front', 'back'} dictionaries
+    """
+    rng = random.Random(seed)
+    return [
+        {
+            'front': f"Q{i}: What is the {rng.choice(WORDS)} of a {rng.choice(WORDS)}?",
+            'back': " ".join(rng.choice(WORDS) for _ in range(back_words)),
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_llm_output(count: int, style: str = "json", seed: int = 42) -> str:
+    """
+    Render cards the way an LLM might answer.
+
+    Args:
+        count: Number of cards
+        style: "json" (a clean JSON array), "prose" (arrays wrapped in chatter,
+            forcing the regex fallback) or "broken" (some arrays are malformed)
+        seed: Random seed
+
+    Returns:
+        Raw model output text
+    """
+    cards = synthetic_cards(count, seed)
+    if style == "json":
+        return json.dumps(cards)
+
+    blocks = []
+    for i in range(0, len(cards), 5):
+        block = json.dumps(cards[i:i + 5])
+        if style == "broken" and (i // 5) % 3 == 2:
+            block = block[:-10]
+        blocks.append(f"Here are some flashcards for section {i // 5 + 1}:\n{block}\n")
+    return "Sure! " + "\n".join(blocks) + "\nLet me know if you want more."
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(results: Dict, output_dir: str = None) -> str:
+    """
+    Write benchmark results to a JSON file tagged with the commit and environment.
+
+    Args:
+        results: Suite name -> benchmark name -> summary
+        output_dir: Directory for result files (defaults to benchmarks/results)
+
+    Returns:
+        Path of the written file
+    """
+    output_dir = output_dir or RESULTS_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    revision = git_revision()
+    timestamp = datetime.now(timezone.utc)
+    payload = {
+        'revision': revision,
+        'timestamp': timestamp.isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    path = os.path.join(output_dir, f"{timestamp.strftime('%Y%m%dT%H%M%SZ')}-{revision}.json")
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def print_results(suite: str, results: Dict):
+    print(f"\n== {suite} ==")
+    print(f"{'benchmark':<48} {'median ms':>10} {'p95 ms':>10} {'ops/s':>10}")
+    for name, stats in results.items():
+        if 'median_ms' in stats:
+            print(f"{name:<48} {stats['median_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['ops_per_sec']:>10.1f}")
+        else:
+            print(f"{name:<48} {json.dumps(stats)}")
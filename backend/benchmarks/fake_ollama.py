@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for an Ollama server.
+
+Implements the `/api/chat` (streaming and non-streaming) and `/api/tags`
+endpoints used by the `ollama` client, returning canned flashcards with
+configurable latency, generation speed, concurrency and malformed-output
+injection. Responses depend only on the prompt and the seed, so pipeline runs
+are reproducible without a GPU.
+
+Usage (from backend/):
+    uv run python -m benchmarks.fake_ollama --port 11435 --latency lognormal:-0.7,0.4 --tokens_per_sec 40
+    OLLAMA_HOST=http://127.0.0.1:11435 uv run python import_txt.py --file notes.txt --subject S --test T
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from benchmarks.common import WORDS
+
+DEFAULT_MODELS = ["llama3.1:latest", "mistral:latest"]
+
+
+def parse_latency(spec: str):
+    """
+    Parse a latency distribution spec into a sampler returning seconds.
+
+    Supported: "fixed:S", "uniform:LO,HI", "normal:MEAN,STDEV", "lognormal:MU,SIGMA".
+
+    Args:
+        spec: Distribution spec
+
+    Returns:
+        Function taking a random.Random and returning a non-negative delay
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeOllamaConfig:
+    def __init__(self, models: List[str] = None, latency: str = "fixed:0", tokens_per_sec: float = 0,
+                 concurrency: int = 1, malformed_rate: float = 0.0, cards_per_chunk: int = 8,
+                 cards_file: Optional[str] = None, seed: int = 42):
+        self.models = models or DEFAULT_MODELS
+        self.latency = parse_latency(latency)
+        self.tokens_per_sec = tokens_per_sec
+        self.concurrency = concurrency
+        self.malformed_rate = malformed_rate
+        self.cards_per_chunk = cards_per_chunk
+        self.seed = seed
+        self.canned_cards = None
+        if cards_file:
+            with open(cards_file) as f:
+                self.canned_cards = json.load(f)
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: FakeOllamaConfig):
+        super().__init__(address, FakeOllamaHandler)
+        self.config = config
+        self.slots = threading.BoundedSemaphore(config.concurrency)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'malformed': 0, 'in_flight': 0, 'max_queued': 0, 'queued': 0, 'eval_tokens': 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def update_stats(self, **deltas):
+        with self.lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+            self.stats['max_queued'] = max(self.stats['max_queued'], self.stats['queued'])
+
+    def render_response(self, prompt: str):
+        """Return (content, rng) for a prompt; identical prompts give identical output"""
+        digest = hashlib.sha256(f"{self.config.seed}:{prompt}".encode("utf-8")).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+
+        if self.config.canned_cards is not None:
+            cards = self.config.canned_cards
+        else:
+            source_words = [w.strip(".,!?;:") for w in prompt.split("Text:")[-1].split()] or WORDS
+            cards = [
+                {
+                    'front': f"What is meant by '{' '.join(rng.choice(source_words) for _ in range(3))}'?",
+                    'back': " ".join(rng.choice(source_words) for _ in range(rng.randint(8, 25))),
+                }
+                for _ in range(self.config.cards_per_chunk)
+            ]
+
+        content = json.dumps(cards, indent=2)
+        if rng.random() < self.config.malformed_rate:
+            self.update_stats(malformed=1)
+            if rng.random() < 0.5:
+                # Prose around the array: forces parse_flashcards' regex fallback
+                content = f"Here are your flashcards:\n{content}\nHope this helps!"
+            else:
+                # Truncated output: nothing parseable
+                content = content[: len(content) // 2]
+        return content, rng
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            now = datetime.now(timezone.utc).isoformat()
+            self.send_json(200, {"models": [
+                {"name": name, "model": name, "modified_at": now, "size": 4_700_000_000,
+                 "digest": hashlib.sha256(name.encode()).hexdigest(),
+                 "details": {"format": "gguf", "family": "fake", "parameter_size": "8B", "quantization_level": "Q4_0"}}
+                for name in self.server.config.models
+            ]})
+        elif self.path == "/_stats":
+            self.send_json(200, self.server.stats)
+        elif self.path in ("/", "/api/version"):
+            self.send_json(200, {"version": "0.0.0-fake"})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = request.get("model", "")
+        known = self.server.config.models
+        if model not in known and f"{model}:latest" not in known:
+            self.send_json(404, {"error": f"model '{model}' not found, try pulling it first"})
+            return
+
+        server = self.server
+        server.update_stats(requests=1, queued=1)
+        with server.slots:
+            server.update_stats(queued=-1, in_flight=1)
+            try:
+                self.generate(request, model)
+            finally:
+                server.update_stats(in_flight=-1)
+
+    def generate(self, request: dict, model: str):
+        server = self.server
+        config = server.config
+        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+        content, rng = server.render_response(prompt)
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        eval_tokens = max(1, len(content) // 4)
+        server.update_stats(eval_tokens=eval_tokens)
+        started = time.perf_counter()
+
+        load_delay = config.latency(rng)
+        time.sleep(load_delay)
+        generation_time = eval_tokens / config.tokens_per_sec if config.tokens_per_sec else 0.0
+
+        metadata = {
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(load_delay * 1e9),
+            "eval_count": eval_tokens,
+            "eval_duration": int(generation_time * 1e9),
+            "load_duration": 0,
+        }
+
+        if request.get("stream", True) is False:
+            time.sleep(generation_time)
+            self.send_json(200, dict(
+                model=model,
+                created_at=datetime.now(timezone.utc).isoformat(),
+                message={"role": "assistant", "content": content},
+                done=True,
+                total_duration=int((time.perf_counter() - started) * 1e9),
+                **metadata,
+            ))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+        for piece in pieces:
+            time.sleep(generation_time / len(pieces))
+            self.write_chunk({"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                              "message": {"role": "assistant", "content": piece}, "done": False})
+        self.write_chunk(dict(
+            model=model,
+            created_at=datetime.now(timezone.utc).isoformat(),
+            message={"role": "assistant", "content": ""},
+            done=True,
+            total_duration=int((time.perf_counter() - started) * 1e9),
+            **metadata,
+        ))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, payload: dict):
+        line = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+def start_fake_ollama(host: str = "127.0.0.1", port: int = 0, **config) -> FakeOllamaServer:
+    """
+    Start a fake Ollama server in a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one; see `server.url`)
+        **config: FakeOllamaConfig options
+
+    Returns:
+        The running server; call `shutdown()` when done
+    """
+    server = FakeOllamaServer((host, port), FakeOllamaConfig(**config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic fake Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS, help="Model names reported by /api/tags")
+    parser.add_argument("--latency", default="fixed:0", help="Time to first token: fixed:S, uniform:LO,HI, normal:MEAN,SD, lognormal:MU,SIGMA")
+    parser.add_argument("--tokens_per_sec", type=float, default=0, help="Generation speed (0 = instant)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Parallel generations (like OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--malformed_rate", type=float, default=0.0, help="Fraction of responses with prose-wrapped or truncated JSON")
+    parser.add_argument("--cards_per_chunk", type=int, default=8, help="Cards generated per request")
+    parser.add_argument("--cards_file", default=None, help="JSON file with canned cards returned for every request")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer((args.host, args.port), FakeOllamaConfig(
+        models=args.models, latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+        concurrency=args.concurrency, malformed_rate=args.malformed_rate,
+        cards_per_chunk=args.cards_per_chunk, cards_file=args.cards_file, seed=args.seed,
+    ))
+    print(f"🦙 Fake Ollama listening on {server.url} (set OLLAMA_HOST={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a Redis server, for the deck cache (DECK_CACHE_URL=redis://...).
+
+Speaks enough of the Redis protocol for `deck_cache.RedisCache` (PING, GET,
+SET with EX/PX, INCR, HGET, HSET, PEXPIRE, DEL, AUTH, SELECT, FLUSHALL, DBSIZE), keeps everything in
+memory and can add a fixed delay per command to mimic a cache on another host.
+
+Usage (from backend/):
+    uv run python -m benchmarks.fake_redis --port 6390 --latency_ms 0.5
+    DECK_CACHE_URL=redis://127.0.0.1:6390/0 uv run uvicorn main:app --workers 4
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    server: "FakeRedisServer"
+
+    def read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command (e.g. typed into telnet)
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            if self.server.latency_ms:
+                time.sleep(self.server.latency_ms / 1000)
+            self.wfile.write(self.server.execute(args))
+            self.wfile.flush()
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], latency_ms: float = 0.0):
+        super().__init__(address, FakeRedisHandler)
+        self.latency_ms = latency_ms
+        # Values are bytes (strings) or dicts (hashes)
+        self.data: Dict[bytes, Tuple[Optional[float], Union[bytes, Dict[bytes, bytes]]]] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def lookup(self, key: bytes):
+        entry = self.data.get(key)
+        if entry is None or (entry[0] is not None and entry[0] < time.monotonic()):
+            self.data.pop(key, None)
+            return None
+        return entry
+
+    def execute(self, args: List[bytes]) -> bytes:
+        name = args[0].upper()
+        with self.lock:
+            if name == b"PING":
+                return b"+PONG\r\n"
+            if name in (b"AUTH", b"SELECT"):
+                return b"+OK\r\n"
+            if name == b"GET" and len(args) == 2:
+                entry = self.lookup(args[1])
+                if entry is None:
+                    return b"$-1\r\n"
+                if isinstance(entry[1], dict):
+                    return b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n"
+                return b"$%d\r\n%s\r\n" % (len(entry[1]), entry[1])
+            if name == b"SET" and len(args) in (3, 5):
+                expires_at = None
+                if len(args) == 5:
+                    unit = args[3].upper()
+                    seconds = int(args[4]) / 1000 if unit == b"PX" else int(args[4])
+                    expires_at = time.monotonic() + seconds
+                self.data[args[1]] = (expires_at, args[2])
+                return b"+OK\r\n"
+            if name == b"INCR" and len(args) == 2:
+                entry = self.lookup(args[1])
+                if entry is not None and isinstance(entry[1], dict):
+                    return b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n"
+                value = int(entry[1]) + 1 if entry is not None else 1
+                self.data[args[1]] = (entry[0] if entry is not None else None, str(value).encode())
+                return b":%d\r\n" % value
+            if name == b"HGET" and len(args) == 3:
+                entry = self.lookup(args[1])
+                value = entry[1].get(args[2]) if entry is not None and isinstance(entry[1], dict) else None
+                if value is None:
+                    return b"$-1\r\n"
+                return b"$%d\r\n%s\r\n" % (len(value), value)
+            if name == b"HSET" and len(args) >= 4 and len(args) % 2 == 0:
+                entry = self.lookup(args[1])
+                if entry is None or not isinstance(entry[1], dict):
+                    entry = self.data[args[1]] = (None, {})
+                fields = entry[1]
+                added = 0
+                for field, value in zip(args[2::2], args[3::2]):
+                    added += field not in fields
+                    fields[field] = value
+                return b":%d\r\n" % added
+            if name == b"PEXPIRE" and len(args) == 3:
+                entry = self.lookup(args[1])
+                if entry is None:
+                    return b":0\r\n"
+                self.data[args[1]] = (time.monotonic() + int(args[2]) / 1000, entry[1])
+                return b":1\r\n"
+            if name == b"DEL":
+                removed = sum(self.data.pop(key, None) is not None for key in args[1:])
+                return b":%d\r\n" % removed
+            if name == b"DBSIZE":
+                return b":%d\r\n" % len(self.data)
+            if name == b"FLUSHALL":
+                self.data.clear()
+                return b"+OK\r\n"
+        return b"-ERR unsupported command '%s'\r\n" % args[0]
+
+
+def start_fake_redis(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0) -> FakeRedisServer:
+    """
+    Start a fake Redis server in a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one; see `server.url`)
+        latency_ms: Delay added to every command
+
+    Returns:
+        The running server; call `shutdown()` when done
+    """
+    server = FakeRedisServer((host, port), latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Redis-protocol server for local runs and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency_ms", type=float, default=0.0, help="Delay added to every command")
+    args = parser.parse_args()
+
+    server = FakeRedisServer((args.host, args.port), args.latency_ms)
+    print(f"🧰 Fake Redis listening on {server.url} (set DECK_CACHE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
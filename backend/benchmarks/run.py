@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Run the StudyBuddy benchmark suite and store the results as JSON.
+
+Usage (from backend/):
+    uv run python -m benchmarks.run                          # chunking + parsing
+    uv run python -m benchmarks.run --suite db --suite api   # needs Postgres / a running API
+    uv run python -m benchmarks.run --suite serialization    # deck response CPU and bytes on the wire
+    uv run python -m benchmarks.run --suite embeddings       # semantic search top-k latency at 100k cards
+    uv run python -m benchmarks.run --suite prepared         # hot endpoint queries: fresh connection vs pooled vs prepared
+    uv run python -m benchmarks.run --suite pipeline         # generation against benchmarks.fake_ollama
+    uv run python -m benchmarks.run --compare OLD.json NEW.json
+"""
+
+import argparse
+import importlib
+import json
+import sys
+from benchmarks.common import save_results, print_results
+
+SUITES = {
+    "chunking": "benchmarks.bench_chunking",
+    "parsing": "benchmarks.bench_parsing",
+    "serialization": "benchmarks.bench_serialization",
+    "embeddings": "benchmarks.bench_embeddings",
+    "db": "benchmarks.bench_db",
+    "prepared": "benchmarks.bench_prepared",
+    "api": "benchmarks.bench_api",
+    "pipeline": "benchmarks.bench_pipeline",
+}
+DEFAULT_SUITES = ["chunking", "parsing"]
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{old['revision']} → {new['revision']}")
+    print(f"{'benchmark':<56} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for suite, benchmarks in new['results'].items():
+        for name, stats in benchmarks.items():
+            before = old['results'].get(suite, {}).get(name)
+            if not before or 'median_ms' not in stats:
+                continue
+            change = (stats['median_ms'] / before['median_ms'] - 1) * 100 if before['median_ms'] else 0.0
+            print(f"{suite + ': ' + name:<56} {before['median_ms']:>10.3f} {stats['median_ms']:>10.3f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run StudyBuddy benchmarks")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="Suite to run (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs and fewer repetitions")
+    parser.add_argument("--output", default=None, help="Directory for the JSON result file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = {}
+    for suite in args.suite or DEFAULT_SUITES:
+        try:
+            module = importlib.import_module(SUITES[suite])
+            results[suite] = module.run(quick=args.quick)
+        except ImportError as e:
+            # An optional dependency of this suite (e.g. tqdm, numpy) is not installed: run the others
+            print(f"⏭️  Suite '{suite}' skipped: {e}", file=sys.stderr)
+            continue
+        except Exception as e:
+            print(f"❌ Suite '{suite}' failed: {e}", file=sys.stderr)
+            continue
+        print_results(suite, results[suite])
+
+    path = save_results(results, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ This module provides intelligent chunking strategies that respect document struc
 sentence boundaries, and include overlap to prevent information loss.
 """
 
+import hashlib
 import re
 from typing import Generator, List
 
@@ -104,6 +105,77 @@ def chunk_text_intelligently(text: str, target_chunk_size: int = 1000, overlap_s
         yield current_chunk.strip()
 
 
+def chunk_text_content_defined(text: str, target_chunk_size: int = 1000, min_chunk_size: int = None,
+                               max_chunk_size: int = None, window_size: int = 8) -> Generator[str, None, None]:
+    """
+    Chunk text at content-defined sentence boundaries.
+    
+    A boundary is placed after a sentence when a hash of its last `window_size`
+    words falls below a threshold proportional to the sentence length, so chunks
+    average `target_chunk_size` words. Because boundaries depend only on nearby
+    text, editing one paragraph changes only the chunks around it and every other
+    chunk (and its hash) stays the same across re-imports. No overlap is added,
+    since overlap would tie each chunk's content to its predecessor.
+    
+    Args:
+        text: Input text to chunk
+        target_chunk_size: Average number of words per chunk
+        min_chunk_size: Never cut before this many words (default: half the target)
+        max_chunk_size: Always cut before exceeding this many words (default: twice the target)
+        window_size: Number of trailing words hashed at each sentence end
+    
+    Returns:
+        Generator of text chunks
+    """
+    min_chunk_size = min_chunk_size if min_chunk_size is not None else target_chunk_size // 2
+    max_chunk_size = max_chunk_size if max_chunk_size is not None else target_chunk_size * 2
+    expected_span = max(target_chunk_size - min_chunk_size, 1)
+    
+    text = re.sub(r'\s+', ' ', text).strip()
+    sentences = re.split(r'(?<=[.!?])\s+', text) if text else []
+    
+    current_words = []
+    for sentence in sentences:
+        words = sentence.split()
+        # Split run-on "sentences" (tables, lists without punctuation) at the hard limit
+        while len(words) > max_chunk_size:
+            if current_words:
+                yield " ".join(current_words)
+                current_words = []
+            yield " ".join(words[:max_chunk_size])
+            words = words[max_chunk_size:]
+        
+        if current_words and len(current_words) + len(words) > max_chunk_size:
+            yield " ".join(current_words)
+            current_words = []
+        
+        current_words.extend(words)
+        if len(current_words) < min_chunk_size:
+            continue
+        
+        window = " ".join(current_words[-window_size:]).lower().encode("utf-8")
+        fingerprint = int.from_bytes(hashlib.blake2b(window, digest_size=4).digest(), "big") / 2 ** 32
+        if fingerprint < len(words) / expected_span:
+            yield " ".join(current_words)
+            current_words = []
+    
+    if current_words:
+        yield " ".join(current_words)
+
+
+def get_chunk_hash(chunk: str) -> str:
+    """
+    Stable content hash of a chunk, insensitive to whitespace differences.
+    
+    Args:
+        chunk: Chunk text
+        
+    Returns:
+        Hex SHA-256 digest
+    """
+    return hashlib.sha256(" ".join(chunk.split()).encode("utf-8")).hexdigest()
+
+
 def preprocess_text_for_chunking(text: str) -> str:
     """
     Preprocess text to improve chunking quality by detecting structure.
@@ -0,0 +1,43 @@
+"""
+Shared pytest fixtures: each test gets a fresh SQLite database under tmp_path,
+so the suite runs without a PostgreSQL server.
+
+Run: uv run pytest
+"""
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh SQLite database with the schema and the admin user (id 1)"""
+    from auth import create_admin_user_if_not_exists
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'studybuddy.db'}")
+    monkeypatch.setattr(database, "schema_ready", False)
+    database.get_backend()
+    create_admin_user_if_not_exists()
+    return database
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """A TestClient for the API on the test database, with its own review buffer (closed on shutdown)"""
+    from fastapi.testclient import TestClient
+    import main
+    from review_events import ReviewBuffer
+
+    monkeypatch.setattr(main, "review_buffer", ReviewBuffer(flush_seconds=0.05))
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth(client):
+    """Log in as the admin user; returns (headers, refresh token)"""
+    from auth import ADMIN_USERNAME, ADMIN_PASSWORD
+
+    tokens = client.post("/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD}).json()
+    return {"Authorization": f"Bearer {tokens['access_token']}"}, tokens['refresh_token']
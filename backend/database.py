@@ -1,64 +1,103 @@
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from deck_cache import deck_cache
+from read_after_write import record_write, required_position
 
 load_dotenv()
 
+# Bump whenever init_db changes the schema, so running processes re-apply it
+SCHEMA_VERSION = 10
+
+# Set DB_SCHEMA_CHECK=0 when the schema is migrated at deploy time (python init_db.py)
+SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "1") != "0"
+
+schema_lock = threading.Lock()
+schema_ready = False
+
+# Hot queries, run by name with execute_prepared / read_prepared. PostgreSQL prepares each one
+# once per pooled connection, so later calls skip parsing and planning; SQLite's per-connection
+# statement cache does the same for any query text.
+PREPARED_QUERIES = {
+    "user_by_id": "SELECT id, username, email FROM users WHERE id = %s",
+    "subject_for_user": "SELECT id FROM subjects WHERE id = %s AND user_id = %s",
+    "tests_for_subject": """
+        SELECT id, subject_id, name, card_count, mastered_count, card_count - mastered_count AS due_count
+        FROM tests WHERE subject_id = %s
+    """,
+    "test_for_user": """
+        SELECT t.id, t.name, t.card_count FROM tests t
+        JOIN subjects s ON t.subject_id = s.id
+        WHERE t.id = %s AND s.user_id = %s
+    """,
+    "deck": "SELECT id, test_id, front, back, mastered FROM flashcards WHERE test_id = %s ORDER BY id",
+    "deck_page": "SELECT id, test_id, front, back, mastered FROM flashcards WHERE test_id = %s ORDER BY id LIMIT %s OFFSET %s",
+    "flashcard_for_user": """
+        SELECT f.id, f.test_id FROM flashcards f
+        JOIN tests t ON f.test_id = t.id
+        JOIN subjects s ON t.subject_id = s.id
+        WHERE f.id = %s AND s.user_id = %s
+    """,
+    "set_mastered": "UPDATE flashcards SET mastered = %s WHERE id = %s",
+    "insert_subject": "INSERT INTO subjects (name, user_id) VALUES (%s, %s) ON CONFLICT (user_id, name) DO NOTHING",
+    "subject_id": "SELECT id FROM subjects WHERE name = %s AND user_id = %s",
+    "insert_test": "INSERT INTO tests (name, subject_id) VALUES (%s, %s) ON CONFLICT (subject_id, name) DO NOTHING",
+    "test_id": "SELECT id FROM tests WHERE name = %s AND subject_id = %s",
+}
+
+# Registry queries run as plain SQL on the pooled connection instead of being prepared: the deck
+# reads return hundreds of rows, so parse/plan is noise next to the transfer, and bench_prepared
+# measured them slower prepared than pooled (a generic plan for any deck size and page)
+UNPREPARED_QUERIES = {"deck", "deck_page"}
+
+def select_backend():
+    """Pick the storage backend module from DATABASE_URL (sqlite:///path selects SQLite, anything else PostgreSQL)"""
+    if os.getenv("DATABASE_URL", "").startswith("sqlite:"):
+        import storage_sqlite
+        return storage_sqlite
+    import storage_postgres
+    return storage_postgres
+
+def get_backend():
+    """Get the storage backend, verifying the schema on first use in this process"""
+    backend = select_backend()
+    if not schema_ready:
+        ensure_schema(backend)
+    return backend
+
+def ensure_schema(backend):
+    """Create or upgrade the schema once per process, only if the recorded version is behind"""
+    global schema_ready
+    with schema_lock:
+        if schema_ready:
+            return
+        if SCHEMA_CHECK and read_schema_version(backend) < SCHEMA_VERSION:
+            backend.init_db()
+        schema_ready = True
+
+def read_schema_version(backend):
+    """Read the applied schema version (0 if the schema was never initialized)"""
+    conn = backend.get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MAX(version) AS version FROM schema_version")
+        return cur.fetchone()['version'] or 0
+    except Exception:
+        conn.rollback()
+        return 0
+    finally:
+        conn.close()
+
 def get_db_connection():
-    """Get database connection - PostgreSQL only"""
-    database_url = os.getenv("DATABASE_URL")
-    
-    if not database_url:
-        raise Exception("DATABASE_URL environment variable is required. Please set it to your PostgreSQL connection string.")
-    
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+    """Get database connection from the configured backend"""
+    return get_backend().get_db_connection()
 
 def init_db():
-    """Initialize database tables - PostgreSQL only"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # PostgreSQL schema
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id SERIAL PRIMARY KEY,
-        username VARCHAR(50) UNIQUE NOT NULL,
-        email VARCHAR(100) UNIQUE NOT NULL,
-        hashed_password VARCHAR(255) NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
-    
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS subjects (
-        id SERIAL PRIMARY KEY,
-        user_id INTEGER NOT NULL,
-        name VARCHAR(255) NOT NULL,
-        FOREIGN KEY(user_id) REFERENCES users(id),
-        UNIQUE(user_id, name)
-    )""")
-    
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS tests (
-        id SERIAL PRIMARY KEY,
-        subject_id INTEGER,
-        name VARCHAR(255) NOT NULL,
-        FOREIGN KEY(subject_id) REFERENCES subjects(id),
-        UNIQUE(subject_id, name)
-    )""")
-    
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS flashcards (
-        id SERIAL PRIMARY KEY,
-        test_id INTEGER,
-        front TEXT NOT NULL,
-        back TEXT NOT NULL,
-        mastered BOOLEAN DEFAULT FALSE,
-        FOREIGN KEY(test_id) REFERENCES tests(id)
-    )""")
-    
-    conn.commit()
-    conn.close()
+    """Initialize database tables"""
+    global schema_ready
+    select_backend().init_db()
+    schema_ready = True
 
 def execute_query(query, params=None, fetch_one=False, fetch_all=True):
     """Execute a query and return results"""
@@ -86,24 +125,47 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=True):
     finally:
         conn.close()
 
+def mark_write():
+    """Record the primary's WAL position after a write, so this client's later reads skip replicas that lag behind it (see read_after_write)"""
+    backend = get_backend()
+    if hasattr(backend, "write_position"):
+        record_write(backend.write_position())
+
+def execute_read(query, params=None, fetch_one=False):
+    """Run a read-only query on a read replica when DATABASE_READ_URLS is set (one that has replayed the client's last write)"""
+    backend = get_backend()
+    if not hasattr(backend, "execute_read"):
+        return execute_query(query, params, fetch_one=fetch_one)
+    return backend.execute_read(query, params, fetch_one, min_position=required_position())
+
+def execute_prepared(name, params=None, fetch_one=False, fetch_all=True):
+    """Run a PREPARED_QUERIES statement by name on the primary (like execute_query)"""
+    backend = get_backend()
+    if hasattr(backend, "execute_prepared"):
+        return backend.execute_prepared(name, params, fetch_one, fetch_all)
+    return execute_query(PREPARED_QUERIES[name], params, fetch_one=fetch_one, fetch_all=fetch_all)
+
+def read_prepared(name, params=None, fetch_one=False):
+    """Run a read-only PREPARED_QUERIES statement by name, on a read replica like execute_read"""
+    backend = get_backend()
+    if not hasattr(backend, "execute_read"):
+        return execute_prepared(name, params, fetch_one=fetch_one)
+    return backend.execute_read(name, params, fetch_one, prepared=True, min_position=required_position())
+
 def insert_subject(name, user_id):
     """Insert a subject and return its ID"""
-    query = "INSERT INTO subjects (name, user_id) VALUES (%s, %s) ON CONFLICT (user_id, name) DO NOTHING"
-    execute_query(query, (name, user_id), fetch_all=False)
+    execute_prepared("insert_subject", (name, user_id), fetch_all=False)
     
     # Get the ID
-    query = "SELECT id FROM subjects WHERE name = %s AND user_id = %s"
-    result = execute_query(query, (name, user_id), fetch_one=True)
+    result = execute_prepared("subject_id", (name, user_id), fetch_one=True)
     return result['id'] if result else None
 
 def insert_test(name, subject_id):
     """Insert a test and return its ID"""
-    query = "INSERT INTO tests (name, subject_id) VALUES (%s, %s) ON CONFLICT (subject_id, name) DO NOTHING"
-    execute_query(query, (name, subject_id), fetch_all=False)
+    execute_prepared("insert_test", (name, subject_id), fetch_all=False)
     
     # Get the ID
-    query = "SELECT id FROM tests WHERE name = %s AND subject_id = %s"
-    result = execute_query(query, (name, subject_id), fetch_one=True)
+    result = execute_prepared("test_id", (name, subject_id), fetch_one=True)
     return result['id'] if result else None
 
 def get_existing_flashcard_fronts(test_id):
@@ -112,20 +174,94 @@ def get_existing_flashcard_fronts(test_id):
     results = execute_query(query, (test_id,))
     return set(row['front'] for row in results)
 
-def insert_flashcards(test_id, flashcards):
-    """Insert flashcards for a test"""
-    if not flashcards:
-        return
-    
-    query = "INSERT INTO flashcards (test_id, front, back) VALUES (%s, %s, %s)"
-    params = [(test_id, front, back) for front, back in flashcards]
-    
+def get_flashcard_texts_by_id(test_id):
+    """Get a test's flashcard (front, back) texts keyed by card ID"""
+    query = "SELECT id, front, back FROM flashcards WHERE test_id = %s"
+    results = execute_query(query, (test_id,))
+    return {row['id']: (row['front'], row['back']) for row in results}
+
+def update_flashcard_back(card_id, back):
+    """Replace a card's answer, keeping its ID and mastered state"""
+    result = execute_query("UPDATE flashcards SET back = %s WHERE id = %s RETURNING test_id", (back, card_id), fetch_one=True)
+    if result:
+        deck_cache.invalidate(result['test_id'])
+
+def insert_flashcards(test_id, flashcards, import_job_id=None):
+    """Insert flashcards for a test and return their IDs; import_job_id tags cards generated by an import job (embedding happens later, see embeddings.backfill)"""
+    ids = get_backend().insert_flashcards(test_id, flashcards, import_job_id)
+    if ids:
+        deck_cache.invalidate(test_id)
+    return ids
+
+def enqueue_import_job(test_id, user_id, model, chunks, source=None):
+    """Create an import job with one pending row per chunk and return its ID"""
+    conn = get_db_connection()
     cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO import_jobs (user_id, test_id, model, source) VALUES (%s, %s, %s, %s) RETURNING id",
+            (user_id, test_id, model, source),
+        )
+        job_id = cur.fetchone()['id']
+        cur.executemany(
+            "INSERT INTO import_chunks (job_id, chunk_index, content) VALUES (%s, %s, %s)",
+            [(job_id, i, chunk) for i, chunk in enumerate(chunks)],
+        )
+        conn.commit()
+        return job_id
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur:
+            cur.close()
+        conn.close()
+
+def create_document_import_job(test_id, user_id, model, filename, document, chunk_size=1000, overlap_size=100):
+    """Store an uploaded document as a queued import job and return its ID"""
+    query = """
+        INSERT INTO import_jobs (user_id, test_id, model, source, status, document, chunk_size, overlap_size, baseline_card_id)
+        VALUES (%s, %s, %s, %s, 'queued', %s, %s, %s, (SELECT COALESCE(MAX(id), 0) FROM flashcards WHERE test_id = %s))
+        RETURNING id
+    """
+    result = execute_query(
+        query,
+        (user_id, test_id, model, filename, document, chunk_size, overlap_size, test_id),
+        fetch_one=True,
+    )
+    return result['id']
+
+def claim_document_import_job(worker_id, lease_seconds=600, max_attempts=3):
+    """Claim the next uploaded document awaiting extraction, or None if there is none"""
+    return get_backend().claim_document_import_job(worker_id, lease_seconds, max_attempts)
+
+def get_import_job_document(job_id, worker_id):
+    """Read a claimed job's uploaded document; None if the worker no longer holds its lease"""
+    query = "SELECT document FROM import_jobs WHERE id = %s AND worker_id = %s AND status = 'extracting'"
+    result = execute_query(query, (job_id, worker_id), fetch_one=True)
+    return bytes(result['document']) if result and result['document'] is not None else None
+
+def add_import_chunks(job_id, worker_id, chunks):
+    """Enqueue the chunks extracted from an uploaded document and release its raw bytes"""
     conn = get_db_connection()
+    cur = None
     try:
         cur = conn.cursor()
-        cur.executemany(query, params)
+        cur.execute("""
+            UPDATE import_jobs
+            SET status = 'chunked', document = NULL, lease_expires_at = NULL
+            WHERE id = %s AND worker_id = %s AND status = 'extracting'
+        """, (job_id, worker_id))
+        if cur.rowcount != 1:
+            conn.rollback()
+            return False
+        cur.executemany(
+            "INSERT INTO import_chunks (job_id, chunk_index, content) VALUES (%s, %s, %s)",
+            [(job_id, i, chunk) for i, chunk in enumerate(chunks)],
+        )
         conn.commit()
+        return True
     except Exception as e:
         conn.rollback()
         raise e
@@ -133,3 +269,288 @@ def insert_flashcards(test_id, flashcards):
         if cur:
             cur.close()
         conn.close()
+
+def fail_document_import_job(job_id, error):
+    """Mark an uploaded document as failed during extraction"""
+    query = """
+        UPDATE import_jobs
+        SET status = 'failed', error = %s, document = NULL, lease_expires_at = NULL
+        WHERE id = %s
+    """
+    execute_query(query, (error, job_id), fetch_all=False)
+
+def reap_expired_import_jobs(max_attempts=3):
+    """Fail uploaded documents whose worker crashed during extraction on their last attempt"""
+    query = """
+        UPDATE import_jobs
+        SET status = 'failed', error = 'lease expired during extraction', document = NULL, lease_expires_at = NULL
+        WHERE status = 'extracting' AND lease_expires_at < CURRENT_TIMESTAMP AND attempts >= %s
+    """
+    return execute_query(query, (max_attempts,), fetch_all=False)
+
+def record_worker_heartbeat(worker_id):
+    """Record that a worker is polling the import queue"""
+    query = """
+        INSERT INTO import_workers (worker_id, seen_at) VALUES (%s, %s)
+        ON CONFLICT (worker_id) DO UPDATE SET seen_at = EXCLUDED.seen_at
+    """
+    execute_query(query, (worker_id, datetime.utcnow()), fetch_all=False)
+
+def import_worker_seen_within(seconds):
+    """Whether any worker polled the import queue in the last `seconds`"""
+    query = "SELECT 1 AS seen FROM import_workers WHERE seen_at > %s LIMIT 1"
+    return execute_query(query, (datetime.utcnow() - timedelta(seconds=seconds),), fetch_one=True) is not None
+
+def get_import_job_cards(job_id, after_id):
+    """Cards an import job has generated so far, after a card ID, in ID order"""
+    query = "SELECT id, front, back FROM flashcards WHERE import_job_id = %s AND id > %s ORDER BY id"
+    return execute_query(query, (job_id, after_id))
+
+def claim_import_chunk(worker_id, lease_seconds=600, max_attempts=3):
+    """Claim the next pending (or lease-expired) chunk for a worker, or None if the queue is empty"""
+    return get_backend().claim_import_chunk(worker_id, lease_seconds, max_attempts)
+
+def complete_import_chunk(chunk_id, worker_id, cards_created):
+    """Mark a claimed chunk as done; returns False if the worker no longer holds its lease"""
+    query = """
+        UPDATE import_chunks
+        SET status = 'done', cards_created = %s, lease_expires_at = NULL, error = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND worker_id = %s AND status = 'running'
+    """
+    return execute_query(query, (cards_created, chunk_id, worker_id), fetch_all=False) == 1
+
+def fail_import_chunk(chunk_id, worker_id, error, max_attempts=3):
+    """Release a claimed chunk after an error, retrying it until max_attempts is reached"""
+    query = """
+        UPDATE import_chunks
+        SET status = CASE WHEN attempts < %s THEN 'pending' ELSE 'failed' END,
+            error = %s, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND worker_id = %s AND status = 'running'
+    """
+    return execute_query(query, (max_attempts, error, chunk_id, worker_id), fetch_all=False) == 1
+
+def reap_expired_import_chunks(max_attempts=3):
+    """Fail chunks whose worker crashed after using up their last attempt"""
+    query = """
+        UPDATE import_chunks
+        SET status = 'failed', error = 'lease expired', lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'running' AND lease_expires_at < CURRENT_TIMESTAMP AND attempts >= %s
+    """
+    return execute_query(query, (max_attempts,), fetch_all=False)
+
+def get_import_job_status(job_id=None):
+    """Summarize chunk progress per import job"""
+    query = """
+        SELECT j.id, j.user_id, j.test_id, j.model, j.source, j.status, j.error, j.baseline_card_id, j.created_at,
+               COUNT(c.id) AS total,
+               COUNT(*) FILTER (WHERE c.status = 'pending') AS pending,
+               COUNT(*) FILTER (WHERE c.status = 'running' AND c.lease_expires_at >= CURRENT_TIMESTAMP) AS running,
+               COUNT(*) FILTER (WHERE c.status = 'running' AND c.lease_expires_at < CURRENT_TIMESTAMP) AS expired,
+               COUNT(*) FILTER (WHERE c.status = 'done') AS done,
+               COUNT(*) FILTER (WHERE c.status = 'failed') AS failed,
+               COALESCE(SUM(c.cards_created), 0) AS cards_created
+        FROM import_jobs j
+        LEFT JOIN import_chunks c ON c.job_id = j.id
+    """
+    if job_id is not None:
+        query += " WHERE j.id = %s GROUP BY j.id ORDER BY j.id"
+        return execute_query(query, (job_id,))
+    query += " GROUP BY j.id ORDER BY j.id"
+    return execute_query(query)
+
+def get_chunk_manifest(test_id):
+    """Get the stored chunk manifest for a test, keyed by chunk hash"""
+    return get_backend().get_chunk_manifest(test_id)
+
+def save_chunk_manifest_entry(test_id, chunk_hash, chunk_index, word_count, card_ids):
+    """Record (or replace) the cards generated from a chunk"""
+    return get_backend().save_chunk_manifest_entry(test_id, chunk_hash, chunk_index, word_count, card_ids)
+
+def update_chunk_manifest_indexes(test_id, chunk_indexes):
+    """Update the position of reused chunks in the revised document"""
+    return get_backend().update_chunk_manifest_indexes(test_id, chunk_indexes)
+
+def retire_chunk_manifest_entries(test_id, chunk_hashes, delete_cards=True, keep_card_ids=()):
+    """Remove chunks that no longer exist in the document, optionally deleting their cards (except keep_card_ids); returns cards deleted"""
+    deleted = get_backend().retire_chunk_manifest_entries(test_id, chunk_hashes, delete_cards, keep_card_ids)
+    if deleted:
+        deck_cache.invalidate(test_id)
+    return deleted
+
+def export_flashcards(test_id, fmt):
+    """Stream a test's cards as NDJSON or CSV byte chunks"""
+    return get_backend().export_flashcards(test_id, fmt)
+
+def import_flashcards(test_id, rows):
+    """Bulk-load (front, back, mastered) rows into a test, skipping fronts it already has; returns (staged, inserted)"""
+    staged, inserted = get_backend().import_flashcards(test_id, rows)
+    if inserted:
+        deck_cache.invalidate(test_id)
+    return staged, inserted
+
+def search_flashcards(user_id, query, limit=20, offset=0):
+    """Ranked full-text search over a user's cards (returns up to limit + 1 rows)"""
+    return get_backend().search_flashcards(user_id, query, limit, offset)
+
+def insert_review_events(rows):
+    """Write a batch of review events in one multi-row INSERT; returns how many were written"""
+    return get_backend().insert_review_events(rows)
+
+def save_flashcard_embeddings(rows):
+    """Store (flashcard_id, user_id, model, dim, vector_bytes) rows, replacing any previous vector for those cards and models"""
+    if not rows:
+        return
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.executemany("DELETE FROM flashcard_embeddings WHERE flashcard_id = %s AND model = %s", [(row[0], row[2]) for row in rows])
+        cur.executemany(
+            "INSERT INTO flashcard_embeddings (flashcard_id, user_id, model, dim, vector) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+def get_flashcards_without_embeddings(model, limit=1000):
+    """Get cards (with their owner) that have no vector for the given embedding model"""
+    query = """
+        SELECT f.id, s.user_id, f.front, f.back FROM flashcards f
+        JOIN tests t ON f.test_id = t.id
+        JOIN subjects s ON t.subject_id = s.id
+        LEFT JOIN flashcard_embeddings e ON e.flashcard_id = f.id AND e.model = %s
+        WHERE e.flashcard_id IS NULL
+        ORDER BY f.id
+        LIMIT %s
+    """
+    return execute_query(query, (model, limit))
+
+def get_flashcard_embeddings_since(model, seq, limit=5000):
+    """Get stored vectors for a model added after the given sequence number, oldest first"""
+    query = """
+        SELECT seq, flashcard_id, user_id, dim, vector FROM flashcard_embeddings
+        WHERE model = %s AND seq > %s
+        ORDER BY seq
+        LIMIT %s
+    """
+    return execute_query(query, (model, seq, limit))
+
+def get_flashcard_embedding_seqs(model, after, upto):
+    """Get the sequence numbers of a model's stored vectors in (after, upto]"""
+    query = "SELECT seq FROM flashcard_embeddings WHERE model = %s AND seq > %s AND seq <= %s"
+    return [row['seq'] for row in execute_query(query, (model, after, upto))]
+
+def get_flashcard_embeddings_by_seq(model, seqs):
+    """Get a model's stored vectors by sequence number, oldest first"""
+    if not seqs:
+        return []
+    placeholders = ", ".join(["%s"] * len(seqs))
+    query = f"""
+        SELECT seq, flashcard_id, user_id, dim, vector FROM flashcard_embeddings
+        WHERE model = %s AND seq IN ({placeholders})
+        ORDER BY seq
+    """
+    return execute_query(query, (model, *seqs))
+
+def get_flashcards_for_user(user_id, flashcard_ids):
+    """Get cards by ID with their test and subject, keeping only those the user owns"""
+    if not flashcard_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(flashcard_ids))
+    query = f"""
+        SELECT f.id, f.test_id, t.name AS test_name, s.id AS subject_id, s.name AS subject_name,
+               f.front, f.back, f.mastered
+        FROM flashcards f
+        JOIN tests t ON f.test_id = t.id
+        JOIN subjects s ON t.subject_id = s.id
+        WHERE f.id IN ({placeholders}) AND s.user_id = %s
+    """
+    return execute_query(query, (*flashcard_ids, user_id))
+
+def get_subject_tree(user_id):
+    """Get the user's subjects, each with its tests and their card counts, in one query"""
+    query = """
+        SELECT s.id AS subject_id, s.name AS subject_name, t.id AS test_id, t.name AS test_name,
+               t.card_count, t.mastered_count
+        FROM subjects s
+        LEFT JOIN tests t ON t.subject_id = s.id
+        WHERE s.user_id = %s
+        ORDER BY s.id, t.id
+    """
+    subjects = {}
+    for row in execute_read(query, (user_id,)):
+        subject = subjects.get(row['subject_id'])
+        if subject is None:
+            subject = subjects[row['subject_id']] = {
+                'id': row['subject_id'], 'name': row['subject_name'],
+                'card_count': 0, 'mastered_count': 0, 'due_count': 0, 'tests': [],
+            }
+        if row['test_id'] is None:
+            continue
+        # No review schedule yet: every card that is not mastered is due
+        due_count = row['card_count'] - row['mastered_count']
+        subject['tests'].append({
+            'id': row['test_id'], 'subject_id': row['subject_id'], 'name': row['test_name'],
+            'card_count': row['card_count'], 'mastered_count': row['mastered_count'], 'due_count': due_count,
+        })
+        subject['card_count'] += row['card_count']
+        subject['mastered_count'] += row['mastered_count']
+        subject['due_count'] += due_count
+    return list(subjects.values())
+
+def insert_refresh_token(user_id, token_hash, family_id, expires_at):
+    """Store a new refresh token's hash, dropping the user's expired tokens"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM refresh_tokens WHERE user_id = %s AND expires_at < %s", (user_id, datetime.utcnow()))
+        cur.execute(
+            "INSERT INTO refresh_tokens (user_id, token_hash, family_id, expires_at) VALUES (%s, %s, %s, %s)",
+            (user_id, token_hash, family_id, expires_at),
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+def get_refresh_token(token_hash):
+    """Look up a refresh token by its hash (always on the primary: rotation must see its own writes)"""
+    query = "SELECT id, user_id, family_id, expires_at, revoked_at FROM refresh_tokens WHERE token_hash = %s"
+    return execute_query(query, (token_hash,), fetch_one=True)
+
+def rotate_refresh_token(token_id, user_id, new_token_hash, family_id, expires_at):
+    """Revoke a refresh token and store its successor in one transaction; False if it was already revoked"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        # The conditional UPDATE makes concurrent rotations of the same token race for one winner
+        cur.execute("UPDATE refresh_tokens SET revoked_at = %s WHERE id = %s AND revoked_at IS NULL",
+                    (datetime.utcnow(), token_id))
+        if cur.rowcount != 1:
+            conn.rollback()
+            return False
+        cur.execute(
+            "INSERT INTO refresh_tokens (user_id, token_hash, family_id, expires_at) VALUES (%s, %s, %s, %s)",
+            (user_id, new_token_hash, family_id, expires_at),
+        )
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+def revoke_refresh_token_family(family_id):
+    """Revoke every live token descended from the same login; returns how many were revoked"""
+    query = "UPDATE refresh_tokens SET revoked_at = %s WHERE family_id = %s AND revoked_at IS NULL"
+    return execute_query(query, (datetime.utcnow(), family_id), fetch_all=False)
@@ -0,0 +1,274 @@
+"""
+Read-through cache for rendered decks (GET /tests/{id}/flashcards).
+
+Each test has one entry holding JSON bodies for the parts of its deck that were
+requested (the whole deck and/or pages of it), together with the user they
+were rendered for, so a hit skips the ownership check, the deck query and
+serialization, and is only served to that same user. Writes that change a deck
+(`database.insert_flashcards`, `import_flashcards`, manifest retirement and the
+mastery endpoint) invalidate the whole entry right after they commit.
+
+Each deck also has a version that every invalidation increments. Entries are
+stamped with the version read before their deck was rendered and only count as
+hits while it is still current, so a load that overlaps a write (in this or any
+other process) can store its pre-write body but never serve it.
+
+DECK_CACHE_URL selects the backend:
+
+- unset or "off": no caching
+- "redis://[:password@]host:port/db": any server speaking the Redis protocol
+  (Redis, Valkey, or `benchmarks.fake_redis` locally), shared by every
+  API worker and import process; an entry is a hash with one field per part,
+  next to a "<key>:version" counter
+- "memory": in-process LRU bounded by DECK_CACHE_MAX_BYTES of bodies, for
+  single-process deployments only: it cannot see writes made by other
+  processes (worker.py, the import scripts, other uvicorn workers or serverless
+  instances) and serves their pre-write decks until DECK_CACHE_TTL_SECONDS pass
+
+Callers must render cached bodies from the primary database: a replica's rows
+can already be stale when they are stored.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from metrics import DECK_CACHE_BYTES, DECK_CACHE_EVICTIONS, DECK_CACHE_HIT_RATIO, DECK_CACHE_LOOKUPS
+
+DECK_CACHE_URL = os.getenv("DECK_CACHE_URL", "off")
+DECK_CACHE_MAX_BYTES = int(os.getenv("DECK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DECK_CACHE_TTL_SECONDS = float(os.getenv("DECK_CACHE_TTL_SECONDS", "300"))
+REDIS_TIMEOUT_SECONDS = 0.5
+
+logger = logging.getLogger("studybuddy.deck_cache")
+
+
+class MemoryCache:
+    """In-process LRU of entries (each a dict of fields), bounded by the total size of the stored values"""
+
+    def __init__(self, max_bytes: int = DECK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Dict[str, Tuple[float, bytes]]]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, key: str, field: str) -> Tuple[int, Optional[bytes]]:
+        with self.lock:
+            version = self.versions.get(key, 0)
+            fields = self.entries.get(key)
+            if fields is None or field not in fields:
+                return version, None
+            expires_at, value = fields[field]
+            if expires_at < time.monotonic():
+                del fields[field]
+                self.size -= len(value)
+                if not fields:
+                    del self.entries[key]
+                DECK_CACHE_BYTES.set(self.size)
+                return version, None
+            self.entries.move_to_end(key)
+            return version, value
+
+    def set(self, key: str, field: str, value: bytes, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            fields = self.entries.setdefault(key, {})
+            self.entries.move_to_end(key)
+            previous = fields.get(field)
+            if previous is not None:
+                self.size -= len(previous[1])
+            fields[field] = (time.monotonic() + ttl, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                DECK_CACHE_EVICTIONS.inc()
+            DECK_CACHE_BYTES.set(self.size)
+
+    def invalidate(self, key: str):
+        with self.lock:
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.remove(key)
+            DECK_CACHE_BYTES.set(self.size)
+
+    def remove(self, key: str):
+        fields = self.entries.pop(key, None)
+        if fields is not None:
+            self.size -= sum(len(value) for _, value in fields.values())
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache:
+    """Minimal Redis-protocol (RESP) client for versioned hash entries, one connection per thread"""
+
+    def __init__(self, url: str):
+        parsed = urllib.parse.urlparse(url)
+        self.address = (parsed.hostname or "localhost", parsed.port or 6379)
+        self.password = urllib.parse.unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=REDIS_TIMEOUT_SECONDS)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self.local.conn = (sock, sock.makefile("rb"))
+            if self.password:
+                self.command("AUTH", self.password)
+            if self.db:
+                self.command("SELECT", str(self.db))
+        return conn
+
+    def command(self, *args):
+        return self.pipeline(args)[0]
+
+    def pipeline(self, *commands):
+        """Send several commands in one write and return their replies"""
+        sock, reader = self.connection()
+        parts = []
+        for args in commands:
+            parts.append(f"*{len(args)}\r\n".encode())
+            for arg in args:
+                data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+                parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            sock.sendall(b"".join(parts))
+            replies = [self.read_reply(reader) for _ in commands]
+        except (OSError, ValueError):
+            # Drop the connection so the next command reconnects
+            self.local.conn = None
+            sock.close()
+            raise
+        return replies
+
+    def read_reply(self, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body
+        if kind == b"-":
+            raise RedisError(body.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by cache server")
+            return data[:-2]
+        if kind == b"*":
+            count = int(body)
+            return None if count < 0 else [self.read_reply(reader) for _ in range(count)]
+        raise ValueError(f"Unexpected reply from cache server: {line[:40]!r}")
+
+    def lookup(self, key: str, field: str) -> Tuple[int, Optional[bytes]]:
+        version, value = self.pipeline(("GET", f"{key}:version"), ("HGET", key, field))
+        return int(version or 0), value
+
+    def set(self, key: str, field: str, value: bytes, ttl: float):
+        # Hash fields cannot expire on their own: the TTL restarts whenever part of the deck is cached
+        self.pipeline(("HSET", key, field, value), ("PEXPIRE", key, str(int(ttl * 1000))))
+
+    def invalidate(self, key: str):
+        # The version key never expires: if it restarted from 0, an old stamp could match again
+        self.pipeline(("INCR", f"{key}:version"), ("DEL", key))
+
+
+class DeckCache:
+    def __init__(self, backend, ttl: float = DECK_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.lookups = 0
+
+    @property
+    def enabled(self) -> bool:
+        return not isinstance(self.backend, NullCache)
+
+    def record(self, result: str):
+        DECK_CACHE_LOOKUPS.inc(1, result)
+        with self.lock:
+            self.lookups += 1
+            self.hits += result == "hit"
+            DECK_CACHE_HIT_RATIO.set(self.hits / self.lookups)
+
+    def load(self, user_id: int, test_id: int, loader: Callable[[], bytes], part: str = "all") -> bytes:
+        """
+        Get a deck's rendered body from the cache, or render it with `loader` and cache it.
+
+        Args:
+            user_id: Requesting user; entries are only served to the user they were rendered for
+            test_id: Test whose deck is requested
+            loader: Checks ownership and renders the body from the primary (exceptions propagate and nothing is cached)
+            part: Which body of the deck: "all" for the whole deck, or a page such as "200:100" (offset:limit)
+
+        Returns:
+            JSON body bytes
+        """
+        key = f"deck:{test_id}"
+        try:
+            version, value = self.backend.lookup(key, part)
+        except Exception as e:
+            logger.warning("Deck cache read failed: %s", e)
+            self.record("error")
+            # Without the current version the body cannot be stamped, so it is not cached
+            return loader()
+
+        # Read before rendering: a write committed after this bumps the version and retires the entry
+        stamp = f"{version}\n{user_id}\n".encode()
+        if value is not None and value.startswith(stamp):
+            self.record("hit")
+            return value[len(stamp):]
+        self.record("miss")
+
+        body = loader()
+        try:
+            self.backend.set(key, part, stamp + body, self.ttl)
+        except Exception as e:
+            logger.warning("Deck cache write failed: %s", e)
+        return body
+
+    def invalidate(self, test_id: int):
+        """Retire a test's cached deck and pages; call after the write that changed it has committed"""
+        try:
+            self.backend.invalidate(f"deck:{test_id}")
+        except Exception as e:
+            logger.warning("Deck cache invalidation failed for test %s: %s", test_id, e)
+
+
+class NullCache:
+    def lookup(self, key: str, field: str) -> Tuple[int, Optional[bytes]]:
+        return 0, None
+
+    def set(self, key: str, field: str, value: bytes, ttl: float):
+        pass
+
+    def invalidate(self, key: str):
+        pass
+
+
+def create_backend(url: str = DECK_CACHE_URL):
+    if url in ("", "off"):
+        return NullCache()
+    if url == "memory":
+        return MemoryCache()
+    if url.startswith("redis://"):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported DECK_CACHE_URL: {url}")
+
+
+deck_cache = DeckCache(create_backend())
@@ -0,0 +1,154 @@
+"""
+Streaming deck export/import formats (NDJSON and CSV).
+
+Both directions work row by row so memory stays flat however large the deck:
+imports are parsed lazily from the uploaded file and fed to the database as a
+CSV stream (PostgreSQL COPY FROM reads it through `CSVRowStream.read`), and
+exports are written as they are read from the database.
+"""
+
+import csv
+import io
+import json
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+
+EXPORT_COLUMNS = ("front", "back", "mastered")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+FALSE_VALUES = {"", "0", "false", "f", "no", "n"}
+
+
+class DeckFormatError(ValueError):
+    """Raised for malformed import rows; the message names the offending line"""
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """
+    Work out the deck format from an upload's filename or content type.
+
+    Args:
+        filename: Uploaded file name
+        content_type: Uploaded file content type
+
+    Returns:
+        "ndjson", "csv" or None if neither matches
+    """
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    for fmt, media_type in MEDIA_TYPES.items():
+        if (content_type or "").startswith(media_type):
+            return fmt
+    return None
+
+
+def parse_bool(value, line: int) -> bool:
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise DeckFormatError(f"Line {line}: invalid mastered value {value!r}")
+
+
+def validate_row(front, back, mastered, line: int) -> Tuple[str, str, bool]:
+    if not isinstance(front, str) or not front.strip() or not isinstance(back, str) or not back.strip():
+        raise DeckFormatError(f"Line {line}: 'front' and 'back' must be non-empty strings")
+    return front.strip(), back.strip(), parse_bool(mastered, line)
+
+
+def iter_import_rows(file: BinaryIO, fmt: str) -> Iterator[Tuple[str, str, bool]]:
+    """
+    Lazily parse an uploaded deck.
+
+    NDJSON: one {"front", "back", "mastered"?} object per line.
+    CSV: a header row naming at least `front` and `back` (optionally `mastered`).
+
+    Args:
+        file: Binary file object positioned at the start of the upload
+        fmt: "ndjson" or "csv"
+
+    Returns:
+        Iterator of (front, back, mastered) tuples
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "ndjson":
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    card = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise DeckFormatError(f"Line {line_number}: invalid JSON ({e.msg})")
+                if not isinstance(card, dict):
+                    raise DeckFormatError(f"Line {line_number}: expected a JSON object")
+                yield validate_row(card.get("front"), card.get("back"), card.get("mastered"), line_number)
+        else:
+            reader = csv.DictReader(text)
+            if not reader.fieldnames or not {"front", "back"}.issubset(reader.fieldnames):
+                raise DeckFormatError("Line 1: CSV header must include 'front' and 'back'")
+            for row in reader:
+                yield validate_row(row.get("front"), row.get("back"), row.get("mastered"), reader.line_num)
+    finally:
+        # Leave the underlying upload open; the caller owns it
+        text.detach()
+
+
+class CSVRowStream:
+    """Read-only file object rendering (front, back, mastered) rows as headerless CSV for COPY FROM"""
+
+    def __init__(self, rows: Iterable[Tuple[str, str, bool]], batch_rows: int = 500):
+        self.rows = iter(rows)
+        self.batch_rows = batch_rows
+        self.buffer = ""
+        self.count = 0
+        self.exhausted = False
+        self.error = None
+
+    def fill(self):
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        for _ in range(self.batch_rows):
+            row = next(self.rows, None)
+            if row is None:
+                self.exhausted = True
+                break
+            front, back, mastered = row
+            writer.writerow((front, back, "t" if mastered else "f"))
+            self.count += 1
+        self.buffer += out.getvalue()
+
+    def read(self, size: int = -1) -> str:
+        try:
+            while not self.exhausted and (size < 0 or len(self.buffer) < size):
+                self.fill()
+        except DeckFormatError as e:
+            # The driver may wrap exceptions raised inside COPY; keep the original for the caller
+            self.error = e
+            raise
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def format_rows(rows: Iterable[dict], fmt: str, header: bool = False) -> str:
+    """Render exported rows (dicts with EXPORT_COLUMNS) as NDJSON lines or CSV records"""
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({"front": row["front"], "back": row["back"], "mastered": bool(row["mastered"])}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow((row["front"], row["back"], "true" if row["mastered"] else "false"))
+    return out.getvalue()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Card embeddings for semantic search and related-card lookup.
+
+Cards are embedded with a local Ollama embedding model (EMBED_MODEL, default
+nomic-embed-text) in batches, L2-normalized and stored as float32 bytes in the
+flashcard_embeddings table; vector_index.py serves queries from them. Inserts
+never embed on the request path: with EMBEDDINGS_ENABLED=1 a running
+`worker.py` embeds new cards whenever its import queue is idle, and any cards
+without a vector (added while it was off, or with no worker) are picked up by:
+
+    uv run python embeddings.py backfill
+
+Set EMBED_MODEL=hash to use the deterministic `HashingEmbedder` instead of
+Ollama (tests, benchmarks and machines without a model).
+"""
+
+import argparse
+import hashlib
+import os
+import re
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+from database import save_flashcard_embeddings, get_flashcards_without_embeddings, get_flashcards_for_user
+from vector_index import get_index
+
+EMBEDDINGS_ENABLED = os.getenv("EMBEDDINGS_ENABLED", "0") == "1"
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class OllamaEmbedder:
+    def __init__(self, model: str = EMBED_MODEL):
+        self.name = model
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        import ollama
+        response = ollama.embed(model=self.name, input=list(texts))
+        return np.asarray(response["embeddings"], dtype=np.float32)
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashed bag of words; no model needed"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hash-{dim}"
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+                vectors[row, digest % self.dim] += 1.0 if (digest >> 63) else -1.0
+        return vectors
+
+
+embedder_override: Optional[Callable[[Sequence[str]], np.ndarray]] = None
+
+
+def set_embedder(embedder: Optional[Callable[[Sequence[str]], np.ndarray]]):
+    """Replace the configured embedder (e.g. with a stub in tests); None restores EMBED_MODEL"""
+    global embedder_override
+    embedder_override = embedder
+
+
+def get_embedder():
+    if embedder_override is not None:
+        return embedder_override
+    if EMBED_MODEL == "hash" or EMBED_MODEL.startswith("hash-"):
+        return HashingEmbedder(int(EMBED_MODEL.split("-")[1]) if "-" in EMBED_MODEL else 256)
+    return OllamaEmbedder(EMBED_MODEL)
+
+
+def embedder_name(embedder) -> str:
+    return getattr(embedder, "name", type(embedder).__name__)
+
+
+def embed_texts(texts: Sequence[str], embedder=None, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Embed texts in batches and L2-normalize the result.
+
+    Args:
+        texts: Texts to embed
+        embedder: Callable mapping a batch of texts to an (n, dim) array (defaults to get_embedder())
+        batch_size: Texts per embedding call
+
+    Returns:
+        float32 array of shape (len(texts), dim) with unit-length rows
+    """
+    embedder = embedder or get_embedder()
+    batches = [embedder(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    if not batches:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = np.vstack(batches).astype(np.float32, copy=False)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def card_text(front: str, back: str) -> str:
+    return f"{front}\n{back}"
+
+
+def embed_and_store(cards: List[Tuple[int, int, str, str]], embedder=None, batch_size: int = EMBED_BATCH_SIZE) -> int:
+    """
+    Embed cards and save their vectors.
+
+    Args:
+        cards: (flashcard_id, user_id, front, back) tuples
+        embedder: Embedder to use (defaults to get_embedder())
+        batch_size: Texts per embedding call
+
+    Returns:
+        Number of cards embedded
+    """
+    if not cards:
+        return 0
+    embedder = embedder or get_embedder()
+    vectors = embed_texts([card_text(front, back) for _, _, front, back in cards], embedder, batch_size)
+    model = embedder_name(embedder)
+    save_flashcard_embeddings([
+        (card_id, user_id, model, vectors.shape[1], vector.tobytes())
+        for (card_id, user_id, _, _), vector in zip(cards, vectors)
+    ])
+    return len(cards)
+
+
+def backfill(batch_size: int = EMBED_BATCH_SIZE, limit: Optional[int] = None) -> int:
+    """Embed every card that has no vector for the current model yet"""
+    embedder = get_embedder()
+    model = embedder_name(embedder)
+    total = 0
+    while limit is None or total < limit:
+        page = min(batch_size * 16, limit - total) if limit is not None else batch_size * 16
+        rows = get_flashcards_without_embeddings(model, page)
+        if not rows:
+            break
+        total += embed_and_store([(r['id'], r['user_id'], r['front'], r['back']) for r in rows], embedder, batch_size)
+        print(f"🧭 Embedded {total} cards with {model}")
+    return total
+
+
+def hydrate_hits(user_id, hits: List[Tuple[int, float]]) -> List[dict]:
+    """Attach card details to (flashcard_id, score) hits, dropping cards deleted since they were indexed"""
+    rows = {row['id']: row for row in get_flashcards_for_user(user_id, [card_id for card_id, _ in hits])}
+    return [dict(rows[card_id], score=score) for card_id, score in hits if card_id in rows]
+
+
+def semantic_search(user_id, query: str, k: int = 10) -> List[dict]:
+    """Find the user's cards closest in meaning to a free-text query"""
+    embedder = get_embedder()
+    index = get_index(embedder_name(embedder))
+    vector = embed_texts([query], embedder)[0]
+    # Over-fetch a little so cards deleted since indexing don't shrink the result
+    return hydrate_hits(user_id, index.search(vector, user_id, k + 5))[:k]
+
+
+def related_flashcards(user_id, flashcard_id: int, k: int = 10) -> Optional[List[dict]]:
+    """Find the user's cards most similar to one of their cards, or None if that card has no vector yet"""
+    index = get_index(embedder_name(get_embedder()))
+    vector = index.vector_for(flashcard_id)
+    if vector is None:
+        return None
+    return hydrate_hits(user_id, index.search(vector, user_id, k + 5, exclude=(flashcard_id,)))[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage flashcard embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Embed cards that have no vector for EMBED_MODEL yet")
+    backfill_parser.add_argument("--batch_size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding call")
+    backfill_parser.add_argument("--limit", type=int, default=None, help="Stop after this many cards")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        total = backfill(args.batch_size, args.limit)
+        print(f"✅ Backfill complete: {total} cards embedded")
+
+
+if __name__ == "__main__":
+    main()
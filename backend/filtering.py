@@ -0,0 +1,224 @@
+"""
+Pre-generation filtering for PDF and TXT imports.
+
+Removes running headers, footers, page numbers and copyright lines that repeat
+on every page, and skips chunks that are exact or near duplicates of chunks
+already sent to the LLM.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Tuple
+
+
+PAGE_NUMBER_PATTERN = re.compile(r'^[-–\s]*(page\s*)?\d+(\s*(of|/)\s*\d+)?[-–\s]*$', re.IGNORECASE)
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough LLM token estimate (about 4 characters per token for English text).
+
+    Args:
+        text: Text to estimate
+
+    Returns:
+        Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+
+def normalize_line(line: str) -> str:
+    """
+    Normalize a line so that running headers/footers compare equal across pages.
+
+    Digits are collapsed so "Page 3 of 40" and "Page 4 of 40" match.
+
+    Args:
+        line: Raw line of extracted text
+
+    Returns:
+        Normalized line
+    """
+    line = re.sub(r'\d+', '#', line.strip().lower())
+    return re.sub(r'\s+', ' ', line)
+
+
+def find_repeated_lines(pages: List[str], edge_lines: int = 3, min_page_fraction: float = 0.5,
+                        min_pages: int = 3) -> set:
+    """
+    Find header/footer lines by frequency analysis across pages.
+
+    Only the first and last `edge_lines` lines of each page are considered, so
+    repeated phrases in the body text are never stripped.
+
+    Args:
+        pages: Extracted text, one string per page
+        edge_lines: Number of lines at the top and bottom of each page to inspect
+        min_page_fraction: Fraction of pages a line must appear on to be boilerplate
+        min_pages: Minimum number of pages before frequency analysis applies
+
+    Returns:
+        Set of normalized lines considered boilerplate
+    """
+    if len(pages) < min_pages:
+        return set()
+
+    counts = {}
+    for page in pages:
+        lines = [line for line in page.split('\n') if line.strip()]
+        edges = set(normalize_line(line) for line in lines[:edge_lines] + lines[-edge_lines:])
+        for line in edges:
+            counts[line] = counts.get(line, 0) + 1
+
+    threshold = max(min_pages, min_page_fraction * len(pages))
+    return set(line for line, count in counts.items() if count >= threshold)
+
+
+def strip_boilerplate(pages: List[str], edge_lines: int = 3) -> Tuple[List[str], Dict]:
+    """
+    Remove repeated headers/footers and bare page numbers from each page.
+
+    Args:
+        pages: Extracted text, one string per page
+        edge_lines: Number of lines at the top and bottom of each page to inspect
+
+    Returns:
+        Tuple of (cleaned pages, statistics dictionary)
+    """
+    repeated = find_repeated_lines(pages, edge_lines)
+    cleaned_pages = []
+    lines_removed = 0
+    chars_removed = 0
+
+    for page in pages:
+        lines = page.split('\n')
+        non_empty = [i for i, line in enumerate(lines) if line.strip()]
+        edge_indexes = set(non_empty[:edge_lines] + non_empty[-edge_lines:])
+
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edge_indexes:
+                normalized = normalize_line(line)
+                if normalized in repeated or PAGE_NUMBER_PATTERN.match(line.strip()):
+                    lines_removed += 1
+                    chars_removed += len(line) + 1
+                    continue
+            kept.append(line)
+        cleaned_pages.append('\n'.join(kept))
+
+    stats = {
+        'pages': len(pages),
+        'distinct_boilerplate_lines': len(repeated),
+        'lines_removed': lines_removed,
+        'tokens_removed': (chars_removed + 3) // 4,
+    }
+    return cleaned_pages, stats
+
+
+def get_shingles(text: str, shingle_size: int = 5) -> set:
+    """
+    Hash overlapping word n-grams of a chunk.
+
+    Args:
+        text: Chunk text
+        shingle_size: Number of words per shingle
+
+    Returns:
+        Set of shingle hashes
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        return {hash(tuple(words))} if words else set()
+    return set(hash(tuple(words[i:i + shingle_size])) for i in range(len(words) - shingle_size + 1))
+
+
+def dedupe_chunks(chunks: List[str], threshold: float = 0.8, shingle_size: int = 5,
+                  sketch_size: int = 16) -> Tuple[List[str], Dict]:
+    """
+    Drop chunks that are exact or near duplicates of an earlier chunk.
+
+    Near duplicates are detected with word shingles: each kept chunk is indexed by
+    its `sketch_size` smallest shingle hashes, and only chunks sharing a sketch hash
+    are compared with exact Jaccard similarity, so cost stays close to linear.
+
+    Args:
+        chunks: Chunks in document order
+        threshold: Jaccard similarity at or above which a chunk is skipped
+        shingle_size: Number of words per shingle
+        sketch_size: Number of minimum hashes used to find candidates
+
+    Returns:
+        Tuple of (kept chunks, statistics dictionary)
+    """
+    seen_digests = set()
+    kept_shingles = []
+    sketch_index = {}
+    kept = []
+    exact_duplicates = 0
+    near_duplicates = 0
+    tokens_saved = 0
+
+    for chunk in chunks:
+        digest = hashlib.sha1(' '.join(chunk.split()).encode('utf-8')).digest()
+        if digest in seen_digests:
+            exact_duplicates += 1
+            tokens_saved += estimate_tokens(chunk)
+            continue
+
+        shingles = get_shingles(chunk, shingle_size)
+        sketch = sorted(shingles)[:sketch_size]
+        candidates = set()
+        for h in sketch:
+            candidates.update(sketch_index.get(h, ()))
+
+        is_near_duplicate = False
+        for candidate in candidates:
+            other = kept_shingles[candidate]
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= threshold:
+                is_near_duplicate = True
+                break
+
+        if is_near_duplicate:
+            near_duplicates += 1
+            tokens_saved += estimate_tokens(chunk)
+            continue
+
+        seen_digests.add(digest)
+        position = len(kept_shingles)
+        kept_shingles.append(shingles)
+        for h in sketch:
+            sketch_index.setdefault(h, []).append(position)
+        kept.append(chunk)
+
+    stats = {
+        'chunks_in': len(chunks),
+        'chunks_kept': len(kept),
+        'exact_duplicates': exact_duplicates,
+        'near_duplicates': near_duplicates,
+        'tokens_saved': tokens_saved,
+    }
+    return kept, stats
+
+
+def print_filter_report(boilerplate_stats: Dict, dedupe_stats: Dict):
+    """
+    Print how much LLM work the filter stage saved.
+
+    Args:
+        boilerplate_stats: Statistics from strip_boilerplate (may be empty)
+        dedupe_stats: Statistics from dedupe_chunks
+    """
+    if boilerplate_stats:
+        print(f"🧹 Removed {boilerplate_stats['lines_removed']} boilerplate lines "
+              f"({boilerplate_stats['distinct_boilerplate_lines']} distinct) from {boilerplate_stats['pages']} pages "
+              f"≈ {boilerplate_stats['tokens_removed']} tokens")
+
+    calls_saved = dedupe_stats['exact_duplicates'] + dedupe_stats['near_duplicates']
+    print(f"🧹 Skipped {calls_saved} duplicate chunks "
+          f"({dedupe_stats['exact_duplicates']} exact, {dedupe_stats['near_duplicates']} near) "
+          f"≈ {dedupe_stats['tokens_saved']} tokens")
+
+    total_tokens = dedupe_stats['tokens_saved'] + (boilerplate_stats or {}).get('tokens_removed', 0)
+    print(f"💰 Saved {calls_saved} LLM calls and ≈ {total_tokens} prompt tokens for this document")
@@ -5,20 +5,57 @@ import json
 import re
 import sys
 from tqdm import tqdm
-from database import execute_query, insert_subject, insert_test, get_existing_flashcard_fronts, insert_flashcards
-from chunking import chunk_text_intelligently, chunk_text_simple, print_chunking_info
+from database import execute_query, insert_subject, insert_test, get_existing_flashcard_fronts, insert_flashcards, enqueue_import_job
+from chunking import chunk_text_intelligently, chunk_text_simple, chunk_text_content_defined, print_chunking_info
+from incremental import incremental_import
+from instrumentation import ImportMetrics, run_with_profile
+from filtering import strip_boilerplate, dedupe_chunks, print_filter_report
+from text_cache import file_content_hash, get_cached_pages, store_cached_pages
+from import_plan import chunk_options, build_plan, print_plan, write_manifest, load_manifest, load_import_history, record_import_run
 
 # -------------------------
 # PDF Text Extraction
 # -------------------------
+def extract_pages_from_pdf(file_path: str, use_cache: bool = True) -> list[str]:
+    if not use_cache:
+        pages = []
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    pages.append(page_text)
+        return pages
+
+    # Only pages missing from the cache are extracted; progress is saved every batch
+    file_hash = file_content_hash(file_path)
+    page_count, cached = get_cached_pages(file_hash)
+    if page_count is None or len(cached) < page_count:
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+            missing = [i for i in range(page_count) if i not in cached]
+            if cached:
+                print(f"📦 {len(cached)}/{page_count} pages cached, extracting {len(missing)}")
+            batch = {}
+            for i in missing:
+                batch[i] = pdf.pages[i].extract_text() or ""
+                if len(batch) >= 25:
+                    store_cached_pages(file_hash, page_count, batch)
+                    cached.update(batch)
+                    batch = {}
+            if batch:
+                store_cached_pages(file_hash, page_count, batch)
+                cached.update(batch)
+    else:
+        print(f"📦 All {page_count} pages loaded from text cache")
+
+    return [cached[i] for i in range(page_count) if cached.get(i)]
+
 def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
+    return "".join(page_text + "\n" for page_text in extract_pages_from_pdf(file_path))
+
+def count_pdf_pages(file_path: str) -> int:
     with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
+        return len(pdf.pages)
 
 # Chunking functions are now imported from chunking.py
 
@@ -41,7 +78,8 @@ def check_ollama_available():
 # -------------------------
 # Generate flashcards per chunk
 # -------------------------
-def parse_flashcards(text_chunk: str, model: str = "llama3.1"):
+def parse_flashcards(text_chunk: str, model: str = "llama3.1", metrics: ImportMetrics = None):
+    metrics = metrics or ImportMetrics()
     prompt = f"""
 Turn the following study material into flashcards. Generate as many as possible (at least 5 per chunk).
 Respond ONLY in JSON as a list of objects with keys 'front' and 'back'.
@@ -51,39 +89,50 @@ Text:
 """
 
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with metrics.stage("ollama"):
+            response = ollama.chat(
+                model=model,
+                messages=[{"role": "user", "content": prompt}]
+            )
     except Exception as e:
+        metrics.count("ollama_errors")
         print(f"❌ ERROR: Failed to generate flashcards with Ollama!")
         print(f"   Error: {e}")
         print(f"   Make sure Ollama is running and the model '{model}' is available")
         return []
 
+    metrics.record_ollama_response(response)
+    metrics.count("prompt_chars", len(prompt))
     raw = response["message"]["content"]
 
     all_cards = []
 
-    try:
-        # Try parsing the whole thing as JSON first
-        all_cards.extend([(c["front"], c["back"]) for c in json.loads(raw)])
-    except Exception:
-        # Fallback: extract all JSON-looking arrays from the text
-        matches = re.findall(r"\[.*?\]", raw, re.DOTALL)
-        for m in matches:
-            try:
-                data = json.loads(m)
-                all_cards.extend([(c["front"], c["back"]) for c in data])
-            except Exception:
-                continue  # skip invalid blocks
+    with metrics.stage("parse"):
+        try:
+            # Try parsing the whole thing as JSON first
+            all_cards.extend([(c["front"], c["back"]) for c in json.loads(raw)])
+        except Exception:
+            # Fallback: extract all JSON-looking arrays from the text
+            metrics.count("parse_fallbacks")
+            matches = re.findall(r"\[.*?\]", raw, re.DOTALL)
+            for m in matches:
+                try:
+                    data = json.loads(m)
+                    all_cards.extend([(c["front"], c["back"]) for c in data])
+                except Exception:
+                    metrics.count("parse_failures")
+                    continue  # skip invalid blocks
 
+    metrics.count("cards_parsed", len(all_cards))
+    if not all_cards:
+        metrics.count("empty_chunks")
     return all_cards
 
 # -------------------------
 # Insert flashcards into DB
 # -------------------------
-def insert_flashcards_to_db(subject: str, test: str, flashcards: list[tuple[str,str]]):
+def insert_flashcards_to_db(subject: str, test: str, flashcards: list[tuple[str,str]], metrics: ImportMetrics = None):
+    metrics = metrics or ImportMetrics()
     if not flashcards:
         print("No flashcards to insert.")
         return
@@ -107,55 +156,156 @@ def insert_flashcards_to_db(subject: str, test: str, flashcards: list[tuple[str,
     if new_cards:
         insert_flashcards(test_id, new_cards)
 
+    metrics.count("cards_inserted", len(new_cards))
+    metrics.count("duplicates_skipped", len(flashcards) - len(new_cards))
+
     print(f"Added {len(new_cards)} new flashcards to {subject} - {test} (skipped {len(flashcards)-len(new_cards)} duplicates)")
 
+# -------------------------
+# Enqueue chunks for distributed workers
+# -------------------------
+def enqueue_chunks(subject: str, test: str, chunks: list[str], model: str, source: str = None) -> int:
+    # Use admin user ID (1) since this is a local import script
+    user_id = 1
+
+    subject_id = insert_subject(subject, user_id)
+    test_id = insert_test(test, subject_id)
+
+    job_id = enqueue_import_job(test_id, user_id, model, chunks, source)
+    print(f"Queued {len(chunks)} chunks as import job {job_id} for {subject} - {test}")
+    print(f"Start workers with: uv run python worker.py run")
+    print(f"Check progress with: uv run python worker.py status --job_id {job_id}")
+    return job_id
+
 # -------------------------
 # Main CLI
 # -------------------------
 def main():
     parser = argparse.ArgumentParser(description="Import PDF and generate flashcards")
     parser.add_argument("--file", required=True, help="Path to PDF file")
-    parser.add_argument("--subject", required=True, help="Subject name")
-    parser.add_argument("--test", required=True, help="Test name")
+    parser.add_argument("--subject", help="Subject name (not needed with --plan)")
+    parser.add_argument("--test", help="Test name (not needed with --plan)")
     parser.add_argument("--model", default="llama3.1", help="Ollama model (llama3.1 or mistral)")
     parser.add_argument("--chunk_size", type=int, default=1000, help="Target words per chunk")
     parser.add_argument("--overlap_size", type=int, default=100, help="Words to overlap between chunks")
     parser.add_argument("--use_simple_chunking", action="store_true", help="Use simple fixed-length chunking (not recommended)")
+    parser.add_argument("--enqueue", action="store_true", help="Queue chunks for worker.py instead of generating locally")
+    parser.add_argument("--no_filter", action="store_true", help="Keep headers/footers and duplicate chunks")
+    parser.add_argument("--no_cache", action="store_true", help="Always re-extract text instead of using the page cache")
+    parser.add_argument("--incremental", action="store_true", help="Use content-defined chunks and only regenerate chunks changed since the last import")
+    parser.add_argument("--keep_retired", action="store_true", help="With --incremental, keep cards from chunks removed from the document")
+    parser.add_argument("--plan", action="store_true", help="Only extract and chunk: estimate tokens, LLM calls and time, and write a chunk manifest (no Ollama or database needed)")
+    parser.add_argument("--verbose", action="store_true", help="With --plan, also list the estimated prompt tokens of every chunk")
+    parser.add_argument("--manifest", default=None, help="Chunk manifest to write with --plan (default: FILE.plan.json), or to reuse instead of extracting")
+    parser.add_argument("--report", default=None, help="Write a JSON report of per-stage timings and counters to this path")
+    parser.add_argument("--profile", nargs="?", const="import_profile", default=None, help="Capture cProfile/tracemalloc output to PREFIX.prof/.txt")
     args = parser.parse_args()
+    if args.incremental and (args.enqueue or args.use_simple_chunking):
+        parser.error("--incremental cannot be combined with --enqueue or --use_simple_chunking")
+    if not args.plan and not (args.subject and args.test):
+        parser.error("--subject and --test are required unless --plan is given")
 
-    # Check if Ollama is available before doing anything else
-    print("🔍 Checking if Ollama is available...")
-    if not check_ollama_available():
-        sys.exit(1)
+    metrics = ImportMetrics(source=args.file)
+    if args.profile:
+        run_with_profile(lambda: run_import(args, metrics), args.profile)
+    else:
+        run_import(args, metrics)
+
+    metrics.print_summary()
+    if not args.plan:
+        record_import_run(metrics, args.model)
+    if args.report:
+        metrics.write_report(args.report)
 
+def extract_and_chunk(args, metrics: ImportMetrics) -> list[str]:
+    """Extract, filter and chunk the PDF"""
     print(f"Reading PDF: {args.file}")
-    text = extract_text_from_pdf(args.file)
+    with metrics.stage("extract"):
+        pages = extract_pages_from_pdf(args.file, use_cache=not args.no_cache)
+    metrics.count("pages", len(pages))
+    boilerplate_stats = {}
+    if not args.no_filter:
+        with metrics.stage("filter"):
+            pages, boilerplate_stats = strip_boilerplate(pages)
+    text = "".join(page_text + "\n" for page_text in pages)
     if not text.strip():
         print("❌ ERROR: No text found in PDF!")
         sys.exit(1)
 
     total_words = len(text.split())
+    metrics.count("words", total_words)
     
     # Choose chunking strategy
-    if args.use_simple_chunking:
-        print(f"⚠️  Using simple chunking (not recommended)")
-        words = text.split()
-        chunks = list(chunk_text_simple(words, args.chunk_size))
-    else:
-        print(f"✅ Using intelligent chunking with overlap")
-        chunks = list(chunk_text_intelligently(text, args.chunk_size, args.overlap_size))
+    with metrics.stage("chunk"):
+        if args.incremental:
+            print(f"✅ Using content-defined chunking for incremental re-import")
+            chunks = list(chunk_text_content_defined(text, args.chunk_size))
+        elif args.use_simple_chunking:
+            print(f"⚠️  Using simple chunking (not recommended)")
+            words = text.split()
+            chunks = list(chunk_text_simple(words, args.chunk_size))
+        else:
+            print(f"✅ Using intelligent chunking with overlap")
+            chunks = list(chunk_text_intelligently(text, args.chunk_size, args.overlap_size))
 
     # Print chunking information
-    print_chunking_info(total_words, args.chunk_size, args.overlap_size, args.use_simple_chunking, chunks)
+    overlap_size = 0 if args.incremental else args.overlap_size
+    print_chunking_info(total_words, args.chunk_size, overlap_size, args.use_simple_chunking, chunks)
+
+    if not args.no_filter:
+        with metrics.stage("filter"):
+            chunks, dedupe_stats = dedupe_chunks(chunks)
+        metrics.count("duplicate_chunks_skipped", dedupe_stats['exact_duplicates'] + dedupe_stats['near_duplicates'])
+        print_filter_report(boilerplate_stats, dedupe_stats)
+    return chunks
+
+def run_import(args, metrics: ImportMetrics):
+    # Check if Ollama is available before doing anything else (workers need it when enqueueing; plans never call it)
+    if not args.enqueue and not args.plan:
+        print("🔍 Checking if Ollama is available...")
+        if not check_ollama_available():
+            sys.exit(1)
+
+    if args.manifest and not args.plan:
+        print(f"Reusing chunk manifest: {args.manifest}")
+        try:
+            chunks = load_manifest(args.manifest, file_content_hash(args.file), chunk_options(args))
+        except (OSError, ValueError) as e:
+            print(f"❌ ERROR: Cannot use chunk manifest: {e}")
+            sys.exit(1)
+    else:
+        chunks = extract_and_chunk(args, metrics)
+    metrics.count("chunks", len(chunks))
+
+    if args.plan:
+        plan = build_plan(args.file, file_content_hash(args.file), chunk_options(args), chunks, args.model,
+                          pages=count_pdf_pages(args.file), pages_with_text=metrics.counters["pages"],
+                          history=load_import_history(args.model))
+        print_plan(plan, verbose=args.verbose)
+        write_manifest(plan, args.manifest or f"{args.file}.plan.json")
+        return
+
+    if args.enqueue:
+        with metrics.stage("db"):
+            enqueue_chunks(args.subject, args.test, chunks, args.model, source=args.file)
+        return
+
+    if args.incremental:
+        incremental_import(args.subject, args.test, chunks,
+                           lambda chunk: parse_flashcards(chunk, model=args.model, metrics=metrics),
+                           retire_cards=not args.keep_retired)
+        print("Done!")
+        return
 
     all_flashcards = []
 
     # Use tqdm for progress bar
     for i, chunk in enumerate(tqdm(chunks, desc="Processing chunks")):
-        flashcards = parse_flashcards(chunk, model=args.model)
+        flashcards = parse_flashcards(chunk, model=args.model, metrics=metrics)
         all_flashcards.extend(flashcards)
 
-    insert_flashcards_to_db(args.subject, args.test, all_flashcards)
+    with metrics.stage("db"):
+        insert_flashcards_to_db(args.subject, args.test, all_flashcards, metrics=metrics)
     print("Done!")
 
 if __name__ == "__main__":
@@ -0,0 +1,283 @@
+"""
+Dry-run planning for the import scripts (--plan) and the on-disk chunk manifest.
+
+A plan extracts and chunks a document without Ollama or a database, estimates
+the prompt tokens of every chunk, and projects how long generation will take
+from the throughput of earlier imports. Every real import appends its Ollama
+token counts and timings to IMPORT_HISTORY_PATH (one JSON object per line), so
+projections are calibrated to the machine and model actually used.
+
+The plan is written as a chunk manifest file: the chunks themselves plus the
+options and source hash they were made from. Passing it back with --manifest
+makes a real run (local, --enqueue or --incremental) skip extraction,
+filtering and chunking.
+"""
+
+import json
+import math
+import os
+import statistics
+import time
+from typing import Dict, List, Optional
+from chunking import get_chunk_hash
+from instrumentation import ImportMetrics
+
+IMPORT_HISTORY_PATH = os.getenv("IMPORT_HISTORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "import_history.jsonl"))
+MANIFEST_VERSION = 1
+# Used until the history has prompt token counts for calibration
+DEFAULT_CHARS_PER_TOKEN = 4.0
+# Instructions parse_flashcards wraps around each chunk
+PROMPT_OVERHEAD_CHARS = 200
+# Projections use the most recent runs of the same model
+HISTORY_RUNS = 20
+
+
+def chunk_options(args) -> Dict:
+    """
+    The options that decide how a document is chunked, as recorded in the manifest.
+
+    Args:
+        args: Parsed arguments of import_pdf.py or import_txt.py
+
+    Returns:
+        Dictionary of chunking strategy, sizes and filtering
+    """
+    if args.incremental:
+        chunking, overlap_size = "content_defined", 0
+    elif args.use_simple_chunking:
+        chunking, overlap_size = "simple", 0
+    else:
+        chunking, overlap_size = "intelligent", args.overlap_size
+    return {
+        'chunking': chunking,
+        'chunk_size': args.chunk_size,
+        'overlap_size': overlap_size,
+        'filter': not args.no_filter,
+    }
+
+
+def record_import_run(metrics: ImportMetrics, model: str, path: str = None):
+    """
+    Append a finished import's Ollama throughput to the history file.
+
+    Runs that made no Ollama calls (e.g. --enqueue) are not recorded.
+
+    Args:
+        metrics: Metrics of the finished run
+        model: Ollama model used
+        path: History file path (defaults to IMPORT_HISTORY_PATH)
+    """
+    counters = metrics.counters
+    if not counters.get('ollama_calls'):
+        return
+    path = path or IMPORT_HISTORY_PATH
+    entry = {
+        'recorded_at': time.time(),
+        'model': model,
+        'source': metrics.source,
+        'ollama_calls': counters['ollama_calls'],
+        'prompt_chars': counters.get('prompt_chars', 0),
+        'prompt_tokens': counters.get('prompt_tokens', 0),
+        'completion_tokens': counters.get('completion_tokens', 0),
+        'ollama_seconds': metrics.stages.get('ollama', {}).get('seconds', 0.0),
+        'prompt_eval_seconds': counters.get('ollama_prompt_eval_ns', 0) / 1e9,
+        'eval_seconds': counters.get('ollama_eval_ns', 0) / 1e9,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def load_import_history(model: str, path: str = None) -> List[Dict]:
+    """
+    Read the recorded runs for a model, falling back to every model's runs.
+
+    Args:
+        model: Ollama model the import will use
+        path: History file path (defaults to IMPORT_HISTORY_PATH)
+
+    Returns:
+        Up to HISTORY_RUNS most recent runs, oldest first
+    """
+    path = path or IMPORT_HISTORY_PATH
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path) as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue  # skip a line cut short by an interrupted run
+    same_model = [run for run in runs if run.get('model') == model]
+    return (same_model or runs)[-HISTORY_RUNS:]
+
+
+def throughput_from_history(runs: List[Dict]) -> Optional[Dict]:
+    """
+    Derive per-call and per-token rates from recorded runs.
+
+    Prompt evaluation scales with the chunk's tokens; generation and the rest of
+    each call (model load, HTTP) are taken as a fixed cost per call.
+
+    Args:
+        runs: Recorded runs (see `load_import_history`)
+
+    Returns:
+        Dictionary of rates, or None without usable history
+    """
+    calls = sum(run['ollama_calls'] for run in runs)
+    if not calls:
+        return None
+    total = lambda key: sum(run.get(key, 0) for run in runs)
+    prompt_tokens = total('prompt_tokens')
+    prompt_chars = total('prompt_chars')
+    ollama_seconds = total('ollama_seconds')
+    prompt_eval_seconds = total('prompt_eval_seconds')
+    eval_seconds = total('eval_seconds')
+    if prompt_tokens and prompt_eval_seconds:
+        per_token = prompt_eval_seconds / prompt_tokens
+        per_call = max(ollama_seconds - prompt_eval_seconds, 0.0) / calls
+    else:
+        # Ollama reported no timings: time every call alike
+        per_token = 0.0
+        per_call = ollama_seconds / calls
+    return {
+        'runs': len(runs),
+        'calls': calls,
+        'tokens_per_char': prompt_tokens / prompt_chars if prompt_tokens and prompt_chars else 1 / DEFAULT_CHARS_PER_TOKEN,
+        'prompt_seconds_per_token': per_token,
+        'seconds_per_call': per_call,
+        'completion_tokens_per_call': total('completion_tokens') / calls,
+        'completion_tokens_per_sec': total('completion_tokens') / eval_seconds if eval_seconds else 0.0,
+    }
+
+
+def estimate_prompt_tokens(chunk: str, tokens_per_char: float = 1 / DEFAULT_CHARS_PER_TOKEN) -> int:
+    """
+    Estimate the prompt tokens of the Ollama call for a chunk.
+
+    Args:
+        chunk: Chunk text
+        tokens_per_char: Calibrated ratio from the history, or the default
+
+    Returns:
+        Estimated token count, including the instructions around the chunk
+    """
+    return math.ceil((len(chunk) + PROMPT_OVERHEAD_CHARS) * tokens_per_char)
+
+
+def build_plan(source: str, file_hash: str, options: Dict, chunks: List[str], model: str,
+               pages: Optional[int] = None, pages_with_text: Optional[int] = None,
+               history: List[Dict] = None) -> Dict:
+    """
+    Estimate what importing the chunks will cost.
+
+    Args:
+        source: Path of the document
+        file_hash: Content hash of the document
+        options: Chunking options the chunks were made with
+        chunks: Chunks that would be sent to the LLM
+        model: Ollama model the import will use
+        pages: Page count (None for text files)
+        pages_with_text: Pages that had extractable text
+        history: Recorded runs (see `load_import_history`)
+
+    Returns:
+        JSON-serializable plan, also used as the chunk manifest file
+    """
+    rates = throughput_from_history(history or [])
+    tokens_per_char = rates['tokens_per_char'] if rates else 1 / DEFAULT_CHARS_PER_TOKEN
+    entries = []
+    for index, chunk in enumerate(chunks):
+        entry = {
+            'index': index,
+            'hash': get_chunk_hash(chunk),
+            'words': len(chunk.split()),
+            'prompt_tokens': estimate_prompt_tokens(chunk, tokens_per_char),
+            'text': chunk,
+        }
+        if rates:
+            entry['projected_seconds'] = entry['prompt_tokens'] * rates['prompt_seconds_per_token'] + rates['seconds_per_call']
+        entries.append(entry)
+
+    return {
+        'version': MANIFEST_VERSION,
+        'created_at': time.time(),
+        'source': source,
+        'file_hash': file_hash,
+        'options': options,
+        'model': model,
+        'pages': pages,
+        'pages_with_text': pages_with_text,
+        'llm_calls': len(entries),
+        'prompt_tokens': sum(entry['prompt_tokens'] for entry in entries),
+        'completion_tokens': round(rates['completion_tokens_per_call'] * len(entries)) if rates else None,
+        'projected_seconds': sum(entry['projected_seconds'] for entry in entries) if rates else None,
+        'throughput': rates,
+        'chunks': entries,
+    }
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def print_plan(plan: Dict, verbose: bool = False):
+    tokens = [entry['prompt_tokens'] for entry in plan['chunks']]
+    print(f"\n🗺️  Import plan for {plan['source']} (model {plan['model']})")
+    if plan['pages'] is not None:
+        print(f"Pages: {plan['pages']} ({plan['pages_with_text']} with text)")
+    print(f"Chunks: {len(tokens)} → {plan['llm_calls']} LLM calls")
+    if tokens:
+        # The per-chunk estimates are in the manifest; a 10k-chunk list would bury the rest of the report
+        print(f"Estimated prompt tokens per chunk: min {min(tokens)}, median {statistics.median(tokens):.0f}, max {max(tokens)} "
+              f"({plan['prompt_tokens']} total)")
+        if verbose:
+            for entry in plan['chunks']:
+                print(f"   chunk {entry['index']}: {entry['prompt_tokens']} tokens, {entry['words']} words")
+    rates = plan['throughput']
+    if rates is None:
+        print("⏳ No import history yet: run one real import to calibrate time projections")
+        return
+    print(f"Expected completion tokens: ~{plan['completion_tokens']}")
+    print(f"⏳ Projected generation time: {format_duration(plan['projected_seconds'])} on one Ollama "
+          f"(divide by the number of worker.py processes with --enqueue)")
+    print(f"   Based on {rates['calls']} calls over the last {rates['runs']} runs: "
+          f"{rates['seconds_per_call']:.1f}s per call + {rates['prompt_seconds_per_token'] * 1000:.2f} ms per prompt token")
+
+
+def write_manifest(plan: Dict, path: str):
+    with open(path, "w") as f:
+        json.dump(plan, f, indent=1)
+    print(f"📝 Chunk manifest written to {path} (reuse it with --manifest {path})")
+
+
+def load_manifest(path: str, file_hash: str, options: Dict) -> List[str]:
+    """
+    Load the chunks of a manifest written by --plan.
+
+    Args:
+        path: Manifest file
+        file_hash: Content hash of the document being imported
+        options: Chunking options of the current run
+
+    Returns:
+        Chunk texts, in order
+
+    Raises:
+        ValueError: If the manifest is for another document or other chunking options
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"{path} has manifest version {manifest.get('version')}, expected {MANIFEST_VERSION}")
+    if manifest['file_hash'] != file_hash:
+        raise ValueError(f"{path} was planned from different content than {manifest['source']} has now; run --plan again")
+    if manifest['options'] != options:
+        raise ValueError(f"{path} was chunked with {manifest['options']}, but this run uses {options}")
+    return [entry['text'] for entry in manifest['chunks']]
@@ -0,0 +1,138 @@
+"""
+Incremental re-import of revised documents.
+
+Chunks produced by `chunk_text_content_defined` are hashed and compared with the
+manifest stored for the (subject, test). Only new or changed chunks are sent to
+the LLM; unchanged chunks reuse their existing cards, and chunks that disappeared
+from the document are retired together with the cards generated from them once
+every new chunk has been generated, so a failed run never leaves the deck with
+neither the old cards nor their replacements.
+"""
+
+from typing import Callable, Dict, List, Tuple
+from tqdm import tqdm
+from database import (
+    insert_subject,
+    insert_test,
+    get_flashcard_texts_by_id,
+    insert_flashcards,
+    update_flashcard_back,
+    get_chunk_manifest,
+    save_chunk_manifest_entry,
+    update_chunk_manifest_indexes,
+    retire_chunk_manifest_entries,
+)
+from chunking import get_chunk_hash
+
+
+def plan_incremental_import(chunks: List[str], manifest: Dict) -> Tuple[List[Tuple[int, str, str]], Dict[str, int], List[str]]:
+    """
+    Compare the current chunks with a stored manifest.
+
+    Args:
+        chunks: Content-defined chunks of the revised document
+        manifest: Stored manifest keyed by chunk hash
+
+    Returns:
+        Tuple of (new chunks as (index, hash, text), reused hash -> new index, retired hashes)
+    """
+    new_chunks = []
+    new_hashes = set()
+    reused = {}
+    for index, chunk in enumerate(chunks):
+        chunk_hash = get_chunk_hash(chunk)
+        if chunk_hash in manifest:
+            reused.setdefault(chunk_hash, index)
+        elif chunk_hash not in new_hashes:
+            new_hashes.add(chunk_hash)
+            new_chunks.append((index, chunk_hash, chunk))
+
+    retired = [chunk_hash for chunk_hash in manifest if chunk_hash not in reused]
+    return new_chunks, reused, retired
+
+
+def incremental_import(subject: str, test: str, chunks: List[str], generate: Callable[[str], list],
+                       retire_cards: bool = True, user_id: int = 1) -> Dict:
+    """
+    Regenerate cards only for chunks whose content changed since the last import.
+
+    Args:
+        subject: Subject name
+        test: Test name
+        chunks: Content-defined chunks of the document
+        generate: Function turning a chunk into a list of (front, back) tuples
+        retire_cards: Delete cards generated from chunks no longer in the document
+        user_id: Owner of the subject (admin user for local imports)
+
+    Returns:
+        Dictionary with counts of new, reused and retired chunks and cards
+    """
+    subject_id = insert_subject(subject, user_id)
+    test_id = insert_test(test, subject_id)
+
+    manifest = get_chunk_manifest(test_id)
+    new_chunks, reused, retired = plan_incremental_import(chunks, manifest)
+
+    print(f"♻️  {len(reused)} unchanged chunks reused, {len(new_chunks)} new or changed, {len(retired)} retired")
+
+    update_chunk_manifest_indexes(test_id, reused)
+
+    # Cards still listed by kept chunks are never deleted with a retired chunk
+    kept_card_ids = {card_id for chunk_hash in reused for card_id in manifest[chunk_hash]['card_ids']}
+    retiring = {card_id for chunk_hash in retired for card_id in manifest[chunk_hash]['card_ids']} - kept_card_ids
+
+    # Fronts of retiring cards don't count as duplicates: a regenerated card with the same
+    # front takes over the old card (and its mastered state) instead of being dropped,
+    # with its answer updated if the revised document changed it
+    texts = get_flashcard_texts_by_id(test_id)
+    existing_fronts = {front for card_id, (front, _) in texts.items() if card_id not in retiring}
+    retiring_by_front = {texts[card_id][0]: card_id for card_id in retiring if card_id in texts}
+
+    cards_added = 0
+    cards_updated = 0
+    failed_chunks = 0
+    for index, chunk_hash, chunk in tqdm(new_chunks, desc="Processing changed chunks"):
+        flashcards = generate(chunk)
+        if not flashcards:
+            # Leave it out of the manifest so the next run retries it
+            failed_chunks += 1
+            continue
+
+        new_cards = []
+        adopted_ids = []
+        for front, back in flashcards:
+            if front in existing_fronts:
+                continue
+            existing_fronts.add(front)
+            if front in retiring_by_front:
+                card_id = retiring_by_front[front]
+                if texts[card_id][1] != back:
+                    update_flashcard_back(card_id, back)
+                    cards_updated += 1
+                adopted_ids.append(card_id)
+            else:
+                new_cards.append((front, back))
+
+        card_ids = insert_flashcards(test_id, new_cards)
+        save_chunk_manifest_entry(test_id, chunk_hash, index, len(chunk.split()), adopted_ids + card_ids)
+        kept_card_ids.update(adopted_ids)
+        cards_added += len(card_ids)
+
+    if failed_chunks:
+        # Keep the retired chunks' cards until a run regenerates every new chunk
+        print(f"⚠️  {failed_chunks} chunks failed; keeping the {len(retired)} retired chunks' cards until a later run succeeds")
+        retired = []
+    cards_retired = retire_chunk_manifest_entries(test_id, retired, delete_cards=retire_cards, keep_card_ids=kept_card_ids)
+
+    stats = {
+        'chunks_reused': len(reused),
+        'chunks_generated': len(new_chunks) - failed_chunks,
+        'chunks_failed': failed_chunks,
+        'chunks_retired': len(retired),
+        'cards_added': cards_added,
+        'cards_updated': cards_updated,
+        'cards_retired': cards_retired,
+    }
+    print(f"Added {cards_added} new flashcards to {subject} - {test}, updated {cards_updated}, retired {cards_retired} "
+          f"(saved {len(reused)} LLM calls)")
+    return stats
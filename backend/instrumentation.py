@@ -0,0 +1,146 @@
+"""
+Per-stage timing, counters and profiling for the import pipeline.
+
+An `ImportMetrics` instance is threaded through the import scripts; it records
+wall time per stage (extract, filter, chunk, ollama, parse, db), counters for
+chunks, cards, duplicates and parse failures, and token counts reported by
+Ollama, then prints a summary table and writes a machine-readable JSON report.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+class ImportMetrics:
+    def __init__(self, source: str = None):
+        self.source = source
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Dict] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block of work and add it to the named stage.
+
+        Args:
+            name: Stage name (e.g. "extract", "ollama", "db")
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'max_seconds': 0.0})
+        stage['seconds'] += seconds
+        stage['calls'] += 1
+        stage['max_seconds'] = max(stage['max_seconds'], seconds)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_ollama_response(self, response):
+        """
+        Accumulate token counts and model-side durations from an Ollama chat response.
+
+        Args:
+            response: Response returned by `ollama.chat`
+        """
+        get = response.get if hasattr(response, "get") else lambda key, default=None: getattr(response, key, default)
+        self.count('ollama_calls')
+        self.count('prompt_tokens', get('prompt_eval_count') or 0)
+        self.count('completion_tokens', get('eval_count') or 0)
+        self.count('ollama_prompt_eval_ns', get('prompt_eval_duration') or 0)
+        self.count('ollama_eval_ns', get('eval_duration') or 0)
+        self.count('ollama_load_ns', get('load_duration') or 0)
+
+    def report(self) -> Dict:
+        """
+        Build the JSON-serializable report.
+
+        Returns:
+            Dictionary with total time, stages, counters and derived rates
+        """
+        total = time.perf_counter() - self.started
+        counters = dict(self.counters)
+        eval_seconds = counters.get('ollama_eval_ns', 0) / 1e9
+        derived = {
+            'cards_per_chunk': counters.get('cards_parsed', 0) / counters['chunks'] if counters.get('chunks') else 0.0,
+            'completion_tokens_per_sec': counters.get('completion_tokens', 0) / eval_seconds if eval_seconds else 0.0,
+            'chunks_per_sec': counters.get('chunks', 0) / total if total else 0.0,
+        }
+        return {
+            'source': self.source,
+            'total_seconds': total,
+            'stages': {
+                name: dict(stage, share=(stage['seconds'] / total if total else 0.0))
+                for name, stage in self.stages.items()
+            },
+            'counters': counters,
+            'derived': derived,
+        }
+
+    def print_summary(self):
+        report = self.report()
+        print(f"\n⏱️  Import took {report['total_seconds']:.2f}s")
+        print(f"{'stage':<12} {'seconds':>9} {'share':>7} {'calls':>7} {'max s':>8}")
+        for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            print(f"{name:<12} {stage['seconds']:>9.3f} {stage['share'] * 100:>6.1f}% {stage['calls']:>7} {stage['max_seconds']:>8.3f}")
+        for name, value in report['counters'].items():
+            if not name.endswith('_ns'):
+                print(f"  {name}: {value}")
+        derived = report['derived']
+        print(f"  cards/chunk: {derived['cards_per_chunk']:.1f}, "
+              f"completion tokens/s: {derived['completion_tokens_per_sec']:.1f}, "
+              f"chunks/s: {derived['chunks_per_sec']:.2f}")
+
+    def write_report(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"📊 Report written to {path}")
+
+
+def run_with_profile(fn: Callable[[], object], output_prefix: str, top: int = 25) -> Optional[object]:
+    """
+    Run a function under cProfile and tracemalloc.
+
+    Writes `<prefix>.prof` (load with `python -m pstats` or snakeviz) and
+    `<prefix>.txt` with the hottest functions and largest allocation sites.
+
+    Args:
+        fn: Zero-argument callable to run
+        output_prefix: Path prefix for the output files
+        top: Number of entries to include in the text summary
+
+    Returns:
+        The function's return value
+    """
+    profiler = cProfile.Profile()
+    tracemalloc.start(25)
+    profiler.enable()
+    try:
+        return fn()
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f"{output_prefix}.prof")
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top)
+        buffer.write(f"\nMemory: current {current / 1024 / 1024:.1f} MiB, peak {peak / 1024 / 1024:.1f} MiB\n")
+        buffer.write(f"Top {top} allocation sites:\n")
+        for stat in snapshot.statistics("lineno")[:top]:
+            buffer.write(f"  {stat}\n")
+        with open(f"{output_prefix}.txt", "w") as f:
+            f.write(buffer.getvalue())
+        print(f"🔬 Profile written to {output_prefix}.prof and {output_prefix}.txt (peak memory {peak / 1024 / 1024:.1f} MiB)")
@@ -1,9 +1,30 @@
-from fastapi import Body, FastAPI, HTTPException, Path, Depends
+from fastapi import Body, FastAPI, HTTPException, Path, Depends, File, Form, Header, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db, execute_query, insert_subject, insert_test, get_existing_flashcard_fronts, insert_flashcards
-from auth import authenticate_user, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
-from datetime import timedelta
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from database import get_backend, execute_prepared, read_prepared, mark_write, insert_subject, insert_test, get_existing_flashcard_fronts, insert_flashcards, create_document_import_job, get_import_job_status, get_import_job_cards, import_worker_seen_within, export_flashcards, import_flashcards, search_flashcards, get_flashcards_for_user, get_subject_tree
+from auth import authenticate_user, create_access_token, create_refresh_token, refresh_tokens, revoke_refresh_token, get_current_user, get_current_user_id, ACCESS_TOKEN_EXPIRE_MINUTES
+from datetime import datetime, timedelta
+from metrics import MetricsMiddleware, render_metrics
+from responses import CompressionMiddleware, FastJSONResponse, render_json
+from read_after_write import READ_AFTER_HEADER, ReadAfterWriteMiddleware
+from deck_cache import deck_cache
+from deck_io import MEDIA_TYPES, DeckFormatError, detect_format, iter_import_rows
+from review_events import review_buffer
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, TypedDict
+import asyncio
+import json
+import os
+import re
+import threading
+
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", str(50 * 1024 * 1024)))
+IMPORT_EVENTS_POLL_SECONDS = float(os.getenv("IMPORT_EVENTS_POLL_SECONDS", "1.0"))
+# /imports needs a running worker.py; uploads are refused with 503 when none has polled within this (0 skips the check)
+IMPORT_WORKER_TIMEOUT_SECONDS = float(os.getenv("IMPORT_WORKER_TIMEOUT_SECONDS", "900"))
+# Deck page size the web app requests (FLASHCARD_PAGE_SIZE in frontend/src/api/index.ts); only these pages are cached
+DECK_PAGE_SIZE = 200
 
 # Pydantic models for authentication
 class UserLogin(BaseModel):
@@ -13,6 +34,11 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: int = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class FlashcardCreate(BaseModel):
     front: str
@@ -23,16 +49,72 @@ class FlashcardCreate(BaseModel):
 class FlashcardsBatch(BaseModel):
     flashcards: list[FlashcardCreate]
 
-app = FastAPI()
+class ReviewEvent(BaseModel):
+    flashcard_id: int
+    result: Literal["correct", "incorrect", "skipped"]
+    latency_ms: int = Field(..., ge=0, le=3_600_000)
+
+class ReviewEventsBatch(BaseModel):
+    events: list[ReviewEvent] = Field(..., min_length=1, max_length=500)
+
+# Row projections returned as-is by the list endpoints (no per-row dict rebuilding)
+class TestRow(TypedDict):
+    id: int
+    subject_id: int
+    name: str
+    card_count: int
+    mastered_count: int
+    due_count: int
+
+class SubjectRow(TypedDict):
+    id: int
+    name: str
+    card_count: int
+    mastered_count: int
+    due_count: int
+    tests: list[TestRow]
+
+class FlashcardRow(TypedDict):
+    id: int
+    test_id: int
+    front: str
+    back: str
+    mastered: bool
+
+class FlashcardPage(TypedDict):
+    total: int
+    offset: int
+    cards: list[FlashcardRow]
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # or ["http://localhost:5173"]
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[READ_AFTER_HEADER],
 )
+app.add_middleware(ReadAfterWriteMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# The schema is verified lazily on the first database access (see database.ensure_schema),
+# so importing this module opens no connection
+@app.on_event("startup")
+def warm_database():
+    """Load the DB driver and verify the schema off the request path where the server runs lifespan events"""
+    threading.Thread(target=get_backend, daemon=True).start()
+
+@app.on_event("shutdown")
+def flush_review_events():
+    """Write out buffered review events before the process exits"""
+    review_buffer.close()
 
-init_db()
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics for this process"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # Authentication endpoints
 @app.post("/login", response_model=Token)
@@ -49,7 +131,27 @@ async def login(user: UserLogin):
     access_token = create_access_token(
         data={"sub": str(user_data["id"])}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = create_refresh_token(user_data["id"])
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@app.post("/token/refresh", response_model=Token)
+def refresh_access_token(request: RefreshRequest):
+    """Exchange a refresh token for a new access token and refresh token (no password check)"""
+    tokens = refresh_tokens(request.refresh_token)
+    if tokens is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token, refresh_token = tokens
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@app.post("/logout", status_code=204)
+def logout(request: RefreshRequest):
+    """Revoke a refresh token and the tokens rotated from it"""
+    revoke_refresh_token(request.refresh_token)
+    return Response(status_code=204)
 
 @app.get("/me")
 async def read_users_me(current_user: dict = Depends(get_current_user)):
@@ -57,26 +159,33 @@ async def read_users_me(current_user: dict = Depends(get_current_user)):
     return current_user
 
 @app.post("/upload_flashcards")
-async def upload_flashcards_batch(batch: FlashcardsBatch, current_user: dict = Depends(get_current_user)):
-    """Upload multiple flashcards created locally"""
+def upload_flashcards_batch(batch: FlashcardsBatch, current_user: dict = Depends(get_current_user)):
+    """Upload multiple flashcards created locally (one insert per test; new cards are embedded later by the worker)"""
     try:
+        cards_by_test = {}
+        for card_data in batch.flashcards:
+            cards_by_test.setdefault((card_data.subject, card_data.test), []).append((card_data.front, card_data.back))
+        
         uploaded_count = 0
         skipped_count = 0
-        
-        for card_data in batch.flashcards:
-            # Create subject and test
-            subject_id = insert_subject(card_data.subject, current_user["id"])
-            test_id = insert_test(card_data.test, subject_id)
+        for (subject, test), cards in cards_by_test.items():
+            subject_id = insert_subject(subject, current_user["id"])
+            test_id = insert_test(test, subject_id)
             
-            # Check if flashcard already exists
+            # Skip cards whose front the test (or an earlier card in this batch) already has
             existing_fronts = get_existing_flashcard_fronts(test_id)
+            new_cards = []
+            for front, back in cards:
+                if front in existing_fronts:
+                    skipped_count += 1
+                else:
+                    existing_fronts.add(front)
+                    new_cards.append((front, back))
             
-            if card_data.front not in existing_fronts:
-                insert_flashcards(test_id, [(card_data.front, card_data.back)])
-                uploaded_count += 1
-            else:
-                skipped_count += 1
+            insert_flashcards(test_id, new_cards)
+            uploaded_count += len(new_cards)
         
+        mark_write()
         return {
             "message": f"Uploaded {uploaded_count} new flashcards, skipped {skipped_count} duplicates",
             "uploaded": uploaded_count,
@@ -91,50 +200,286 @@ async def upload_flashcards_batch(batch: FlashcardsBatch, current_user: dict = D
 
 @app.get("/subjects")
 def get_subjects(current_user: dict = Depends(get_current_user)):
-    rows = execute_query("SELECT * FROM subjects WHERE user_id = %s", (current_user["id"],))
-    return [{"id": row['id'], "name": row['name']} for row in rows]
+    """All of the user's subjects with their tests and card counts (total, mastered, due)"""
+    rows: list[SubjectRow] = get_subject_tree(current_user["id"])
+    return FastJSONResponse(rows)
 
 @app.get("/subjects/{subject_id}/tests")
 def get_tests(subject_id: int = Path(...), current_user: dict = Depends(get_current_user)):
     # Verify the subject belongs to the user
-    subject = execute_query("SELECT id FROM subjects WHERE id = %s AND user_id = %s", (subject_id, current_user["id"]), fetch_one=True)
+    subject = read_prepared("subject_for_user", (subject_id, current_user["id"]), fetch_one=True)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    rows = execute_query("SELECT * FROM tests WHERE subject_id = %s", (subject_id,))
-    return [{"id": row['id'], "subject_id": row['subject_id'], "name": row['name']} for row in rows]
+    rows: list[TestRow] = read_prepared("tests_for_subject", (subject_id,))
+    return FastJSONResponse(rows)
 
-@app.get("/tests/{test_id}/flashcards")
-def get_flashcards(test_id: int = Path(...), current_user: dict = Depends(get_current_user)):
-    # Verify the test belongs to the user through the subject
-    test = execute_query("""
-        SELECT t.id FROM tests t 
-        JOIN subjects s ON t.subject_id = s.id 
-        WHERE t.id = %s AND s.user_id = %s
-    """, (test_id, current_user["id"]), fetch_one=True)
+def get_test_for_user(test_id: int, user_id: int) -> dict:
+    """Get a test, verifying it belongs to the user through its subject"""
+    test = read_prepared("test_for_user", (test_id, user_id), fetch_one=True)
     
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
-    
-    rows = execute_query("SELECT * FROM flashcards WHERE test_id = %s", (test_id,))
-    return [{"id": row['id'], "test_id": row['test_id'], "front": row['front'], "back": row['back'], "mastered": bool(row['mastered'])} for row in rows]
+    return test
+
+def read_deck(name: str, params: tuple, fetch_one: bool = False):
+    """Deck reads go to the primary when the deck cache is on: a replica's rows can already be stale when cached"""
+    if deck_cache.enabled:
+        return execute_prepared(name, params, fetch_one=fetch_one)
+    return read_prepared(name, params, fetch_one=fetch_one)
+
+@app.get("/tests/{test_id}/flashcards")
+def get_flashcards(
+    test_id: int = Path(...),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    user_id: int = Depends(get_current_user_id),
+):
+    """A test's whole deck, or with `limit` one page of it in card order, served from the deck cache when it has not changed (see deck_cache.py)"""
+    if limit is None:
+        def render_deck() -> bytes:
+            get_test_for_user(test_id, user_id)
+            rows: list[FlashcardRow] = read_deck("deck", (test_id,))
+            return render_json(rows)
+
+        return Response(deck_cache.load(user_id, test_id, render_deck), media_type="application/json")
+
+    # Only the web app's page-aligned pages are cached, so arbitrary offset:limit pairs can't fill the cache
+    cached = limit == DECK_PAGE_SIZE and offset % DECK_PAGE_SIZE == 0
+    read = read_deck if cached else read_prepared
+
+    def render_page() -> bytes:
+        test = read("test_for_user", (test_id, user_id), fetch_one=True)
+        if not test:
+            raise HTTPException(status_code=404, detail="Test not found")
+        rows: list[FlashcardRow] = read("deck_page", (test_id, limit, offset))
+        page: FlashcardPage = {"total": test['card_count'], "offset": offset, "cards": rows}
+        return render_json(page)
+
+    if not cached:
+        return Response(render_page(), media_type="application/json")
+    return Response(deck_cache.load(user_id, test_id, render_page, part=f"{offset}:{limit}"), media_type="application/json")
+
+@app.get("/search")
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    current_user: dict = Depends(get_current_user),
+):
+    """Ranked full-text search across all of the user's flashcards"""
+    rows = search_flashcards(current_user["id"], q, limit, offset)
+    return FastJSONResponse({
+        "query": q,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(rows) > limit,
+        "results": rows[:limit],
+    })
+
+def require_embeddings():
+    """Import the embeddings module, or fail with 503 when semantic search is off or numpy is not installed"""
+    if os.getenv("EMBEDDINGS_ENABLED", "0") != "1":
+        raise HTTPException(status_code=503, detail="Semantic search is not enabled (set EMBEDDINGS_ENABLED=1)")
+    # Imported on first use: numpy and the vector index are not needed for cold starts
+    try:
+        import embeddings
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"Semantic search needs the embeddings extra (uv sync --extra embeddings): {e}")
+    return embeddings
+
+@app.get("/search/semantic")
+def semantic_search(
+    q: str = Query(..., min_length=1, max_length=500),
+    k: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+):
+    """Concept search across the user's cards by embedding similarity"""
+    embeddings = require_embeddings()
+    try:
+        results = embeddings.semantic_search(current_user["id"], q, k)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Embedding model unavailable: {e}")
+    return FastJSONResponse({"query": q, "results": results})
+
+@app.get("/flashcards/{flashcard_id}/related")
+def related_flashcards(
+    flashcard_id: int = Path(...),
+    k: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+):
+    """Cards from any of the user's decks that are closest in meaning to this one"""
+    embeddings = require_embeddings()
+    if not get_flashcards_for_user(current_user["id"], [flashcard_id]):
+        raise HTTPException(status_code=404, detail="Flashcard not found")
+    results = embeddings.related_flashcards(current_user["id"], flashcard_id, k)
+    if results is None:
+        raise HTTPException(status_code=409, detail="Flashcard has not been embedded yet")
+    return FastJSONResponse({"id": flashcard_id, "results": results})
+
+@app.get("/tests/{test_id}/export")
+def export_deck(
+    test_id: int = Path(...),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream every card in a test as NDJSON or CSV without buffering the deck"""
+    test = get_test_for_user(test_id, current_user["id"])
+    filename = re.sub(r"[^\w.-]+", "_", test['name']) or f"test-{test_id}"
+    return StreamingResponse(
+        export_flashcards(test_id, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+@app.post("/tests/{test_id}/import")
+async def import_deck(
+    test_id: int = Path(...),
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user),
+):
+    """Bulk-load an NDJSON or CSV deck into a test, skipping cards whose front it already has"""
+    await run_in_threadpool(get_test_for_user, test_id, current_user["id"])
+    fmt = detect_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Upload a .ndjson/.jsonl or .csv file")
+
+    # The multipart parser spools large uploads to disk, and rows are parsed lazily into the bulk load
+    try:
+        staged, inserted = await run_in_threadpool(import_flashcards, test_id, iter_import_rows(file.file, fmt))
+    except DeckFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    mark_write()
+    return {"staged": staged, "inserted": inserted, "skipped": staged - inserted}
 
 @app.patch("/flashcards/{flashcard_id}/mastered")
 def update_mastered(flashcard_id: int, mastered: bool = Body(...), current_user: dict = Depends(get_current_user)):
     # Verify the flashcard belongs to the user
-    flashcard = execute_query("""
-        SELECT f.id FROM flashcards f
-        JOIN tests t ON f.test_id = t.id
-        JOIN subjects s ON t.subject_id = s.id
-        WHERE f.id = %s AND s.user_id = %s
-    """, (flashcard_id, current_user["id"]), fetch_one=True)
+    flashcard = execute_prepared("flashcard_for_user", (flashcard_id, current_user["id"]), fetch_one=True)
     
     if not flashcard:
         raise HTTPException(status_code=404, detail="Flashcard not found")
     
-    execute_query("UPDATE flashcards SET mastered=%s WHERE id=%s", (mastered, flashcard_id), fetch_all=False)
+    execute_prepared("set_mastered", (mastered, flashcard_id), fetch_all=False)
+    deck_cache.invalidate(flashcard['test_id'])
+    mark_write()
     return {"id": flashcard_id, "mastered": mastered}
 
+@app.post("/reviews", status_code=202)
+def record_reviews(batch: ReviewEventsBatch, user_id: int = Depends(get_current_user_id)):
+    """Record study review events; they are written to the database in batches shortly afterwards"""
+    reviewed_at = datetime.utcnow()
+    rows = [(event.flashcard_id, user_id, event.result, event.latency_ms, reviewed_at) for event in batch.events]
+    if not review_buffer.submit(rows):
+        raise HTTPException(status_code=503, detail="Too many review events pending, retry shortly", headers={"Retry-After": "2"})
+    return {"accepted": len(rows)}
+
+# Background document imports (processed by worker.py)
+def get_import_job_for_user(job_id: int, user_id: int):
+    jobs = get_import_job_status(job_id)
+    if not jobs or jobs[0]['user_id'] != user_id:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return jobs[0]
+
+def import_progress(job: dict) -> dict:
+    return {
+        "id": job['id'],
+        "test_id": job['test_id'],
+        "source": job['source'],
+        "status": job['status'],
+        "error": job['error'],
+        "chunks": {
+            "total": job['total'],
+            "pending": job['pending'],
+            "running": job['running'] + job['expired'],
+            "done": job['done'],
+            "failed": job['failed'],
+        },
+        "cards_created": job['cards_created'],
+        "finished": job['status'] == 'failed' or (
+            job['status'] == 'chunked' and job['pending'] + job['running'] + job['expired'] == 0
+        ),
+    }
+
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+@app.post("/imports", status_code=202)
+async def create_import(
+    file: UploadFile = File(...),
+    subject: str = Form(...),
+    test: str = Form(...),
+    model: str = Form("llama3.1"),
+    chunk_size: int = Form(1000),
+    overlap_size: int = Form(100),
+    current_user: dict = Depends(get_current_user),
+):
+    """Queue an uploaded PDF or TXT for background flashcard generation"""
+    filename = file.filename or ""
+    if not filename.lower().endswith((".pdf", ".txt")):
+        raise HTTPException(status_code=400, detail="Only .pdf and .txt files are supported")
+
+    document = await file.read(MAX_IMPORT_BYTES + 1)
+    if len(document) > MAX_IMPORT_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+    if not document:
+        raise HTTPException(status_code=400, detail="File is empty")
+    if IMPORT_WORKER_TIMEOUT_SECONDS > 0 and not await run_in_threadpool(import_worker_seen_within, IMPORT_WORKER_TIMEOUT_SECONDS):
+        raise HTTPException(status_code=503, detail="No import worker is running (start one with: python worker.py run)")
+
+    def enqueue():
+        subject_id = insert_subject(subject, current_user["id"])
+        test_id = insert_test(test, subject_id)
+        return create_document_import_job(test_id, current_user["id"], model, filename, document, chunk_size, overlap_size)
+
+    job_id = await run_in_threadpool(enqueue)
+    mark_write()
+    return {"id": job_id, "status": "queued"}
+
+@app.get("/imports/{job_id}")
+def get_import(job_id: int = Path(...), current_user: dict = Depends(get_current_user)):
+    return import_progress(get_import_job_for_user(job_id, current_user["id"]))
+
+@app.get("/imports/{job_id}/events")
+async def stream_import_events(
+    job_id: int = Path(...),
+    last_event_id: Optional[int] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream import progress and newly created cards as server-sent events"""
+    job = await run_in_threadpool(get_import_job_for_user, job_id, current_user["id"])
+
+    async def events():
+        last_card_id = max(last_event_id or 0, job['baseline_card_id'])
+        last_progress = None
+        while True:
+            jobs = await run_in_threadpool(get_import_job_status, job_id)
+            progress = import_progress(jobs[0])
+
+            cards = await run_in_threadpool(get_import_job_cards, job_id, last_card_id)
+            for card in cards:
+                last_card_id = card['id']
+                yield format_sse("card", {"id": card['id'], "front": card['front'], "back": card['back']}, card['id'])
+
+            if progress != last_progress:
+                yield format_sse("progress", progress)
+                last_progress = progress
+
+            if progress['finished']:
+                yield format_sse("done", progress)
+                return
+
+            await asyncio.sleep(IMPORT_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Removed reset_db endpoint for production safety
 
 if __name__ == "__main__":
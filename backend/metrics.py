@@ -0,0 +1,210 @@
+"""
+Request-level metrics and DB query accounting for the API.
+
+`MetricsMiddleware` records per-endpoint latency, response size, DB queries,
+DB time and connection-acquire time per request; `database.py` reports each
+query and connection through `record_query` / `record_connect`. Everything is
+exposed in Prometheus text format by `render_metrics()` (served on /metrics),
+and requests slower than SLOW_REQUEST_SECONDS log the queries they ran.
+
+Metrics are per process; with several uvicorn workers, scrape each one or run
+a single worker behind the scraper.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+MAX_LOGGED_QUERIES = 200
+
+logger = logging.getLogger("studybuddy.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], List] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, (bucket_counts, total, count) in sorted(self.series.items()):
+                base = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels))
+                prefix = base + "," if base else ""
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+                suffix = f"{{{base}}}" if base else ""
+                lines.append(f"{self.name}_sum{suffix} {total}")
+                lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self, kind: str = "counter") -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {kind}"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                base = ",".join(f'{name}="{escape_label(v)}"' for name, v in zip(self.label_names, labels))
+                lines.append(f"{self.name}{{{base}}} {value}" if base else f"{self.name} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, *labels: str):
+        with self.lock:
+            self.values[labels] = value
+
+    def render(self, kind: str = "gauge") -> List[str]:
+        return super().render(kind)
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"), LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS)
+REQUEST_QUERIES = Histogram("http_request_db_queries", "DB queries executed per request", ("method", "route"), COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Time spent executing DB queries per request", ("method", "route"), LATENCY_BUCKETS)
+REQUEST_CONNECTIONS = Histogram("http_request_db_connections", "DB connections acquired per request", ("method", "route"), COUNT_BUCKETS)
+DB_CONNECT_TIME = Histogram("db_connection_acquire_seconds", "Time to acquire a DB connection", (), LATENCY_BUCKETS)
+DB_QUERIES = Counter("db_queries_total", "DB queries executed")
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests slower than SLOW_REQUEST_SECONDS", ("method", "route"))
+IN_PROGRESS = Gauge("http_requests_in_progress", "Requests currently being served")
+REVIEW_EVENTS = Counter("review_events_total", "Review events by outcome (accepted, rejected, written, discarded, dropped)", ("outcome",))
+REVIEW_BUFFER_PENDING = Gauge("review_buffer_pending", "Review events buffered and not yet written")
+REVIEW_FLUSH_TIME = Histogram("review_flush_seconds", "Time to write one batch of review events", (), LATENCY_BUCKETS)
+DECK_CACHE_LOOKUPS = Counter("deck_cache_lookups_total", "Deck cache lookups by result (hit, miss, error)", ("result",))
+DECK_CACHE_HIT_RATIO = Gauge("deck_cache_hit_ratio", "Fraction of deck cache lookups served from the cache since start")
+DECK_CACHE_BYTES = Gauge("deck_cache_bytes", "Bytes held by the in-process deck cache")
+DECK_CACHE_EVICTIONS = Counter("deck_cache_evictions_total", "Decks evicted from the in-process cache to stay within its size limit")
+
+REGISTRY = [REQUEST_LATENCY, RESPONSE_SIZE, REQUEST_QUERIES, REQUEST_DB_TIME, REQUEST_CONNECTIONS,
+            DB_CONNECT_TIME, DB_QUERIES, SLOW_REQUESTS, IN_PROGRESS, REVIEW_EVENTS, REVIEW_BUFFER_PENDING, REVIEW_FLUSH_TIME,
+            DECK_CACHE_LOOKUPS, DECK_CACHE_HIT_RATIO, DECK_CACHE_BYTES, DECK_CACHE_EVICTIONS]
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries: List[Tuple[str, float]] = []
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.connections = 0
+        self.connect_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def record_query(sql, seconds: float):
+    """Account a DB query against the current request (no-op outside requests)"""
+    DB_QUERIES.inc()
+    stats = current_request.get()
+    if stats is None:
+        return
+    stats.query_count += 1
+    stats.db_seconds += seconds
+    if len(stats.queries) < MAX_LOGGED_QUERIES:
+        text = sql.decode("utf-8", "replace") if isinstance(sql, bytes) else str(sql)
+        stats.queries.append((" ".join(text.split())[:300], seconds))
+
+
+def record_connect(seconds: float):
+    """Account a DB connection acquisition"""
+    DB_CONNECT_TIME.observe(seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.connections += 1
+        stats.connect_seconds += seconds
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are measured to their last byte"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = {"code": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                status["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        IN_PROGRESS.inc(1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.inc(-1)
+            current_request.reset(token)
+
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe(elapsed, method, route_path, str(status["code"]))
+            RESPONSE_SIZE.observe(status["bytes"], method, route_path)
+            REQUEST_QUERIES.observe(stats.query_count, method, route_path)
+            REQUEST_DB_TIME.observe(stats.db_seconds, method, route_path)
+            REQUEST_CONNECTIONS.observe(stats.connections, method, route_path)
+
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                SLOW_REQUESTS.inc(1, method, route_path)
+                query_lines = "\n".join(f"    {seconds * 1000:8.2f} ms  {sql}" for sql, seconds in stats.queries)
+                logger.warning(
+                    "Slow request %s %s (%s) took %.0f ms: %d queries, %.0f ms DB, %d connections (%.0f ms acquiring)\n%s",
+                    method, scope["path"], route_path, elapsed * 1000, stats.query_count,
+                    stats.db_seconds * 1000, stats.connections, stats.connect_seconds * 1000, query_lines,
+                )
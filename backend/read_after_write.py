@@ -0,0 +1,102 @@
+"""
+Read-your-writes across API processes and read replicas.
+
+After a request writes, `database.mark_write` records the primary's WAL position
+(LSN) and `ReadAfterWriteMiddleware` returns it in the X-Read-After response
+header. Clients send their latest position back in the same request header, and
+reads are then only routed to replicas that have replayed at least that far
+(see `storage_postgres.execute_read`); otherwise they go to the primary.
+
+The marker travels with the client, so it holds across uvicorn workers and
+serverless instances; nothing is kept per process. Without read replicas no
+position is recorded and the header is never sent.
+"""
+
+from contextvars import ContextVar
+from typing import Optional
+
+READ_AFTER_HEADER = "X-Read-After"
+HEADER_KEY = READ_AFTER_HEADER.lower().encode("latin-1")
+
+
+class ReadPosition:
+    """Per-request state, mutated in place so writes made in threadpool endpoints are seen by the middleware"""
+
+    __slots__ = ("required", "written")
+
+    def __init__(self, required: Optional[int] = None):
+        self.required = required
+        self.written: Optional[int] = None
+
+
+current_position: ContextVar[Optional[ReadPosition]] = ContextVar("read_after_write", default=None)
+
+
+def parse_lsn(text: Optional[str]) -> Optional[int]:
+    """Parse a PostgreSQL LSN ("16/B374D848") into an integer; None if missing or malformed"""
+    if not text:
+        return None
+    high, sep, low = text.strip().partition("/")
+    if not sep or len(high) > 8 or len(low) > 8:
+        return None
+    try:
+        return (int(high, 16) << 32) | int(low, 16)
+    except ValueError:
+        return None
+
+
+def format_lsn(value: int) -> str:
+    return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}"
+
+
+def record_write(lsn: Optional[int]):
+    """Remember the WAL position of a write made during the current request"""
+    position = current_position.get()
+    if position is None or lsn is None:
+        return
+    if position.written is None or lsn > position.written:
+        position.written = lsn
+
+
+def required_position() -> Optional[int]:
+    """The WAL position a replica must have replayed to serve the current request's reads"""
+    position = current_position.get()
+    if position is None:
+        return None
+    if position.written is None:
+        return position.required
+    if position.required is None:
+        return position.written
+    return max(position.required, position.written)
+
+
+class ReadAfterWriteMiddleware:
+    """Pure ASGI middleware reading the client's X-Read-After header and returning the position of its writes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        required = None
+        for key, value in scope["headers"]:
+            if key == HEADER_KEY:
+                required = parse_lsn(value.decode("latin-1"))
+                break
+        position = ReadPosition(required)
+        token = current_position.set(position)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and position.written is not None:
+                headers = list(message.get("headers", []))
+                headers.append((HEADER_KEY, format_lsn(required_position()).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_position.reset(token)
@@ -0,0 +1,145 @@
+"""
+Write-behind buffer for study review events (POST /reviews).
+
+Each flip or grade is appended to an in-process buffer and acknowledged
+straight away; a background thread writes the buffer to the review_events
+table in multi-row INSERTs once REVIEW_FLUSH_SIZE events are waiting or
+REVIEW_FLUSH_SECONDS have passed, whichever comes first. Request handlers never
+touch the database.
+
+When the database is slow or down, failed batches go back to the front of the
+buffer and are retried with exponential backoff. The buffer holds at most
+REVIEW_MAX_PENDING events (including a batch being written); beyond that
+`submit` refuses new events so clients back off (503 + Retry-After) instead of
+the process growing without bound. The buffer is flushed on graceful shutdown
+(see main.py); events still buffered if the process is killed are lost.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+from metrics import REVIEW_BUFFER_PENDING, REVIEW_EVENTS, REVIEW_FLUSH_TIME
+
+REVIEW_FLUSH_SIZE = int(os.getenv("REVIEW_FLUSH_SIZE", "500"))
+REVIEW_FLUSH_SECONDS = float(os.getenv("REVIEW_FLUSH_SECONDS", "1.0"))
+REVIEW_MAX_PENDING = int(os.getenv("REVIEW_MAX_PENDING", "50000"))
+REVIEW_MAX_BATCH = 2000
+MAX_BACKOFF_SECONDS = 30.0
+
+logger = logging.getLogger("studybuddy.reviews")
+
+# (flashcard_id, user_id, result, latency_ms, reviewed_at)
+ReviewRow = Tuple[int, int, str, int, datetime]
+
+
+def default_writer(rows: List[ReviewRow]) -> int:
+    from database import insert_review_events
+    return insert_review_events(rows)
+
+
+class ReviewBuffer:
+    def __init__(self, writer: Optional[Callable[[List[ReviewRow]], int]] = None,
+                 flush_size: int = REVIEW_FLUSH_SIZE, flush_seconds: float = REVIEW_FLUSH_SECONDS,
+                 max_pending: int = REVIEW_MAX_PENDING):
+        self.writer = writer or default_writer
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.pending: List[ReviewRow] = []
+        self.in_flight = 0
+        self.failures = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+
+    def submit(self, rows: Sequence[ReviewRow]) -> bool:
+        """Buffer events for writing; returns False (nothing buffered) if the buffer is full or closed"""
+        with self.condition:
+            if self.closed or len(self.pending) + self.in_flight + len(rows) > self.max_pending:
+                REVIEW_EVENTS.inc(len(rows), "rejected")
+                REVIEW_BUFFER_PENDING.set(len(self.pending) + self.in_flight)
+                return False
+            self.pending.extend(rows)
+            REVIEW_EVENTS.inc(len(rows), "accepted")
+            REVIEW_BUFFER_PENDING.set(len(self.pending) + self.in_flight)
+            if self.thread is None:
+                # Started on first use so importing main stays free of background threads
+                self.thread = threading.Thread(target=self.run, name="review-writer", daemon=True)
+                self.thread.start()
+            elif len(self.pending) >= self.flush_size:
+                self.condition.notify()
+        return True
+
+    def take_batch(self) -> Optional[List[ReviewRow]]:
+        """Wait for a flush threshold and claim the next batch; None once closed and drained"""
+        with self.condition:
+            if self.failures:
+                # Back off after a failed write, whatever the buffer size
+                delay = min(self.flush_seconds * 2 ** self.failures, MAX_BACKOFF_SECONDS)
+                deadline = time.monotonic() + delay
+                while not self.closed and time.monotonic() < deadline:
+                    self.condition.wait(deadline - time.monotonic())
+            else:
+                deadline = time.monotonic() + self.flush_seconds
+                while not self.closed and len(self.pending) < self.flush_size and time.monotonic() < deadline:
+                    self.condition.wait(deadline - time.monotonic())
+            if not self.pending:
+                return None if self.closed else []
+            batch, self.pending = self.pending[:REVIEW_MAX_BATCH], self.pending[REVIEW_MAX_BATCH:]
+            self.in_flight = len(batch)
+            return batch
+
+    def write(self, batch: List[ReviewRow]) -> bool:
+        """Write one batch, putting it back at the front of the buffer if the write fails"""
+        start = time.perf_counter()
+        try:
+            written = self.writer(batch)
+        except Exception as e:
+            with self.condition:
+                self.pending[:0] = batch
+                self.in_flight = 0
+                REVIEW_BUFFER_PENDING.set(len(self.pending))
+                self.failures += 1
+            logger.warning("Writing %d review events failed (attempt %d, %d buffered): %s",
+                           len(batch), self.failures, len(self.pending), e)
+            return False
+        REVIEW_FLUSH_TIME.observe(time.perf_counter() - start)
+        with self.condition:
+            self.in_flight = 0
+            self.failures = 0
+            REVIEW_BUFFER_PENDING.set(len(self.pending))
+        REVIEW_EVENTS.inc(written, "written")
+        if written < len(batch):
+            # Cards deleted since, or not owned by the submitting user
+            REVIEW_EVENTS.inc(len(batch) - written, "discarded")
+        return True
+
+    def run(self):
+        while True:
+            batch = self.take_batch()
+            if batch is None:
+                return
+            if batch and not self.write(batch) and self.closed:
+                return
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting events and write out what is buffered (called on graceful shutdown)"""
+        with self.condition:
+            self.closed = True
+            self.failures = 0
+            self.condition.notify_all()
+            thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+        with self.condition:
+            dropped, self.pending = self.pending, []
+            REVIEW_BUFFER_PENDING.set(self.in_flight)
+        if dropped:
+            logger.error("Dropping %d buffered review events at shutdown: the database is unavailable", len(dropped))
+            REVIEW_EVENTS.inc(len(dropped), "dropped")
+
+
+review_buffer = ReviewBuffer()
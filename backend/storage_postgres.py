@@ -0,0 +1,775 @@
+"""
+PostgreSQL storage backend (psycopg2).
+
+Holds the connection handling, schema and the queries that rely on
+PostgreSQL-only features (execute_values, arrays, FOR UPDATE SKIP LOCKED).
+Selected by database.py unless DATABASE_URL is a sqlite:/// URL.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+from functools import lru_cache
+import psycopg2
+import psycopg2.pool
+from psycopg2.extras import RealDictCursor, execute_values
+from metrics import record_query, record_connect
+from database import execute_query, PREPARED_QUERIES, UNPREPARED_QUERIES, SCHEMA_VERSION
+from deck_io import CSVRowStream
+from read_after_write import parse_lsn
+
+class TimedCursor(RealDictCursor):
+    """RealDictCursor that reports every statement to the request metrics"""
+    
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, time.perf_counter() - start)
+    
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(query, time.perf_counter() - start)
+    
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+def get_db_connection():
+    """Get a new PostgreSQL connection"""
+    database_url = os.getenv("DATABASE_URL")
+    
+    if not database_url:
+        raise Exception("DATABASE_URL environment variable is required. Please set it to your PostgreSQL connection string.")
+    
+    start = time.perf_counter()
+    conn = psycopg2.connect(database_url, cursor_factory=TimedCursor)
+    record_connect(time.perf_counter() - start)
+    return conn
+
+# Serverless instances handle one request at a time and may be frozen between them, so they
+# connect per query by default instead of holding pooled connections open
+SERVERLESS = bool(os.getenv("VERCEL"))
+
+# Pooled primary connections for the prepared-statement registry (0 disables it)
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "0" if SERVERLESS else "10"))
+
+primary_pool = None
+primary_pool_lock = threading.Lock()
+
+# Names from PREPARED_QUERIES already prepared on each pooled connection
+prepared_names = weakref.WeakKeyDictionary()
+prepared_names_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def prepare_statement(name):
+    """The PREPARE for a registry query, with its %s placeholders numbered ($1, $2, ...)"""
+    numbers = itertools.count(1)
+    query = re.sub(r"%s", lambda match: f"${next(numbers)}", PREPARED_QUERIES[name])
+    return f"PREPARE {name} AS {query}"
+
+@lru_cache(maxsize=None)
+def execute_statement(name, param_count):
+    """The EXECUTE for a registry query"""
+    if not param_count:
+        return f"EXECUTE {name}"
+    return f"EXECUTE {name} ({', '.join(['%s'] * param_count)})"
+
+def open_pool(url, size):
+    """A connection pool that opens connections on demand, up to size, and keeps the ones it opened"""
+    pool = psycopg2.pool.ThreadedConnectionPool(0, size, url, cursor_factory=TimedCursor)
+    # minconn is only read when the pool is built (connections opened up front) and in putconn
+    # (returned connections beyond it are closed); raising it afterwards keeps the startup lazy
+    # without closing connections opened under load
+    pool.minconn = size
+    return pool
+
+def run_prepared(conn, name, params):
+    """Run a registry query by name on a pooled connection, preparing it there on first use; returns the cursor"""
+    if name in UNPREPARED_QUERIES:
+        cur = conn.cursor()
+        cur.execute(PREPARED_QUERIES[name], params)
+        return cur
+    with prepared_names_lock:
+        names = prepared_names.setdefault(conn, set())
+        is_prepared = name in names
+    cur = conn.cursor()
+    if not is_prepared:
+        cur.execute(prepare_statement(name))
+        with prepared_names_lock:
+            names.add(name)
+    cur.execute(execute_statement(name, len(params or ())), params)
+    return cur
+
+def get_primary_pool():
+    global primary_pool
+    if primary_pool is None:
+        with primary_pool_lock:
+            if primary_pool is None:
+                database_url = os.getenv("DATABASE_URL")
+                if not database_url:
+                    raise Exception("DATABASE_URL environment variable is required. Please set it to your PostgreSQL connection string.")
+                primary_pool = open_pool(database_url, DATABASE_POOL_SIZE)
+    return primary_pool
+
+def execute_prepared(name, params=None, fetch_one=False, fetch_all=True):
+    """Run a PREPARED_QUERIES statement by name on a pooled primary connection (like execute_query)"""
+    if DATABASE_POOL_SIZE <= 0:
+        return execute_query(PREPARED_QUERIES[name], params, fetch_one=fetch_one, fetch_all=fetch_all)
+    pool = get_primary_pool()
+    # A second attempt on a fresh connection covers pooled connections the server has since closed
+    for attempt in range(2):
+        start = time.perf_counter()
+        try:
+            conn = pool.getconn()
+        except psycopg2.pool.PoolError:
+            # Every pooled connection is busy: run unprepared on a connection of its own
+            return execute_query(PREPARED_QUERIES[name], params, fetch_one=fetch_one, fetch_all=fetch_all)
+        record_connect(time.perf_counter() - start)
+        broken = False
+        try:
+            cur = run_prepared(conn, name, params)
+            if fetch_one:
+                result = cur.fetchone()
+            elif fetch_all:
+                result = cur.fetchall()
+            else:
+                result = cur.rowcount
+            conn.commit()
+            return result
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            if attempt or conn.closed == 0:
+                raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=broken or conn.closed != 0)
+
+# Read replicas (comma-separated URLs); see execute_read
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()]
+DATABASE_READ_POOL_SIZE = int(os.getenv("DATABASE_READ_POOL_SIZE", "0" if SERVERLESS else "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("DATABASE_REPLICA_MAX_LAG_SECONDS", "1.0"))
+REPLICA_CHECK_SECONDS = 1.0
+REPLICA_RETRY_SECONDS = 10.0
+
+logger = logging.getLogger("studybuddy.database")
+
+# Replay lag in seconds; 0 when the replica has replayed everything it received (an idle
+# primary would otherwise look like growing lag) or when the server is not a standby at all.
+# lsn is the WAL position replayed so far, compared against the client's X-Read-After marker.
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag,
+    COALESCE(pg_last_wal_replay_lsn(), pg_current_wal_lsn())::text AS lsn
+"""
+
+class Replica:
+    """A read replica with its own connection pool, lag tracking and failure backoff"""
+    
+    def __init__(self, url):
+        self.url = url
+        self.pool = None
+        self.lag = 0.0
+        self.replayed = 0
+        self.checked_at = float("-inf")
+        self.down_until = 0.0
+        self.lock = threading.Lock()
+        self.pool_lock = threading.Lock()
+    
+    def get_connection(self):
+        start = time.perf_counter()
+        if DATABASE_READ_POOL_SIZE <= 0:
+            conn = psycopg2.connect(self.url, cursor_factory=TimedCursor)
+        else:
+            if self.pool is None:
+                with self.pool_lock:
+                    if self.pool is None:
+                        self.pool = open_pool(self.url, DATABASE_READ_POOL_SIZE)
+            conn = self.pool.getconn()
+        record_connect(time.perf_counter() - start)
+        return conn
+    
+    def release(self, conn, broken=False):
+        if self.pool is None:
+            conn.close()
+            return
+        self.pool.putconn(conn, close=broken or conn.closed != 0)
+    
+    def mark_down(self, error):
+        self.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+        logger.warning("Read replica unavailable, using the primary for %.0fs: %s", REPLICA_RETRY_SECONDS, error)
+    
+    def usable(self, min_position=None):
+        """Whether the replica is up, within REPLICA_MAX_LAG_SECONDS and has replayed min_position (re-checked at most every REPLICA_CHECK_SECONDS)"""
+        now = time.monotonic()
+        if now < self.down_until:
+            return False
+        if now - self.checked_at >= REPLICA_CHECK_SECONDS and self.lock.acquire(blocking=False):
+            # One thread refreshes; the others use the last reading meanwhile
+            try:
+                self.checked_at = now
+                row = self.run(REPLICA_LAG_QUERY, None, True)
+                self.lag = float(row['lag'])
+                self.replayed = parse_lsn(row['lsn']) or 0
+            except psycopg2.Error as e:
+                self.mark_down(e)
+                return False
+            finally:
+                self.lock.release()
+        if min_position is not None and self.replayed < min_position:
+            return False
+        return self.lag <= REPLICA_MAX_LAG_SECONDS
+    
+    def run(self, query, params, fetch_one, prepared=False):
+        conn = self.get_connection()
+        broken = False
+        try:
+            if prepared and self.pool is not None:
+                cur = run_prepared(conn, query, params)
+            else:
+                # Without a pool, preparing on a one-off connection would only add a round trip
+                cur = conn.cursor()
+                cur.execute(PREPARED_QUERIES[query] if prepared else query, params)
+            result = cur.fetchone() if fetch_one else cur.fetchall()
+            # End the read-only transaction so the pooled connection doesn't hold a snapshot
+            conn.rollback()
+            return result
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken)
+
+replicas = [Replica(url) for url in DATABASE_READ_URLS]
+replica_order = itertools.count()
+
+def write_position():
+    """The primary's current WAL position after a write; None without replicas, where reads always see the primary"""
+    if not replicas:
+        return None
+    return parse_lsn(execute_query("SELECT pg_current_wal_lsn()::text AS lsn", fetch_one=True)['lsn'])
+
+def execute_read(query, params=None, fetch_one=False, prepared=False, min_position=None):
+    """Run a read-only query on a usable replica (round robin) that has replayed min_position, falling back to the primary; with prepared=True, query is a PREPARED_QUERIES name"""
+    if replicas:
+        start = next(replica_order)
+        for offset in range(len(replicas)):
+            replica = replicas[(start + offset) % len(replicas)]
+            if not replica.usable(min_position):
+                continue
+            try:
+                return replica.run(query, params, fetch_one, prepared)
+            except psycopg2.pool.PoolError:
+                # Pool exhausted: not a replica fault, just overflow to the next one or the primary
+                continue
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                replica.mark_down(e)
+    if prepared:
+        return execute_prepared(query, params, fetch_one=fetch_one)
+    return execute_query(query, params, fetch_one=fetch_one)
+
+def init_db():
+    """Initialize database tables"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    # PostgreSQL schema
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        hashed_password VARCHAR(255) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+    
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS subjects (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users(id),
+        UNIQUE(user_id, name)
+    )""")
+    
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tests (
+        id SERIAL PRIMARY KEY,
+        subject_id INTEGER,
+        name VARCHAR(255) NOT NULL,
+        FOREIGN KEY(subject_id) REFERENCES subjects(id),
+        UNIQUE(subject_id, name)
+    )""")
+    
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS flashcards (
+        id SERIAL PRIMARY KEY,
+        test_id INTEGER,
+        front TEXT NOT NULL,
+        back TEXT NOT NULL,
+        mastered BOOLEAN DEFAULT FALSE,
+        FOREIGN KEY(test_id) REFERENCES tests(id)
+    )""")
+    
+    # Per-test counters for deck statistics (see database.get_subject_tree), maintained by the
+    # statement-level trigger below so every write path (COPY imports, retirement, deletes) keeps them exact
+    cur.execute("ALTER TABLE tests ADD COLUMN IF NOT EXISTS card_count INTEGER NOT NULL DEFAULT 0")
+    cur.execute("ALTER TABLE tests ADD COLUMN IF NOT EXISTS mastered_count INTEGER NOT NULL DEFAULT 0")
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION apply_flashcard_counts() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE tests t SET card_count = t.card_count + d.total, mastered_count = t.mastered_count + d.mastered
+            FROM (SELECT test_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE mastered) AS mastered
+                  FROM new_rows GROUP BY test_id) d
+            WHERE t.id = d.test_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE tests t SET card_count = t.card_count - d.total, mastered_count = t.mastered_count - d.mastered
+            FROM (SELECT test_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE mastered) AS mastered
+                  FROM old_rows GROUP BY test_id) d
+            WHERE t.id = d.test_id;
+        ELSE
+            UPDATE tests t SET card_count = t.card_count + d.total, mastered_count = t.mastered_count + d.mastered
+            FROM (SELECT test_id, SUM(total) AS total, SUM(mastered) AS mastered FROM (
+                      SELECT test_id, 1 AS total, CASE WHEN mastered THEN 1 ELSE 0 END AS mastered FROM new_rows
+                      UNION ALL
+                      SELECT test_id, -1, CASE WHEN mastered THEN -1 ELSE 0 END FROM old_rows
+                  ) changes GROUP BY test_id) d
+            WHERE t.id = d.test_id AND (d.total <> 0 OR d.mastered <> 0);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""")
+    for event, transition in (("INSERT", "NEW TABLE AS new_rows"), ("DELETE", "OLD TABLE AS old_rows"),
+                              ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows")):
+        cur.execute(f"DROP TRIGGER IF EXISTS flashcards_counts_{event.lower()} ON flashcards")
+        cur.execute(f"""
+        CREATE TRIGGER flashcards_counts_{event.lower()} AFTER {event} ON flashcards
+        REFERENCING {transition} FOR EACH STATEMENT EXECUTE FUNCTION apply_flashcard_counts()""")
+    # Recount from scratch (first run, or to repair drift); blocks card writes until this commits
+    cur.execute("LOCK TABLE flashcards IN SHARE MODE")
+    cur.execute("""
+    UPDATE tests t SET card_count = c.total, mastered_count = c.mastered
+    FROM (SELECT tests.id, COUNT(f.id) AS total, COUNT(f.id) FILTER (WHERE f.mastered) AS mastered
+          FROM tests LEFT JOIN flashcards f ON f.test_id = tests.id GROUP BY tests.id) c
+    WHERE t.id = c.id AND (t.card_count <> c.total OR t.mastered_count <> c.mastered)""")
+    
+    # Decks are read (and paged) in card order: see the deck and deck_page queries
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_test_id ON flashcards (test_id, id)")
+    
+    # Full-text search (see search_flashcards): weighted so matches on the question rank above the answer
+    cur.execute("""
+    ALTER TABLE flashcards ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', front), 'A') || setweight(to_tsvector('english', back), 'B')
+    ) STORED""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_search ON flashcards USING GIN (search_vector)")
+    
+    # Distributed import work queue (see worker.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        test_id INTEGER NOT NULL,
+        model VARCHAR(100) NOT NULL,
+        source VARCHAR(255),
+        status VARCHAR(20) NOT NULL DEFAULT 'chunked',
+        document BYTEA,
+        chunk_size INTEGER,
+        overlap_size INTEGER,
+        baseline_card_id INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker_id VARCHAR(255),
+        lease_expires_at TIMESTAMP,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id),
+        FOREIGN KEY(test_id) REFERENCES tests(id)
+    )""")
+    
+    cur.execute("ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0")
+    
+    # Cards generated by an import job, so its event stream only shows that job's cards
+    cur.execute("ALTER TABLE flashcards ADD COLUMN IF NOT EXISTS import_job_id INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_import_job ON flashcards (import_job_id, id) WHERE import_job_id IS NOT NULL")
+    
+    # Last time each worker polled the queue (see main.create_import)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_workers (
+        worker_id VARCHAR(255) PRIMARY KEY,
+        seen_at TIMESTAMP NOT NULL
+    )""")
+    
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_chunks (
+        id SERIAL PRIMARY KEY,
+        job_id INTEGER NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker_id VARCHAR(255),
+        lease_expires_at TIMESTAMP,
+        cards_created INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(job_id) REFERENCES import_jobs(id) ON DELETE CASCADE,
+        UNIQUE(job_id, chunk_index)
+    )""")
+    
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_import_chunks_status ON import_chunks (status, lease_expires_at)")
+    
+    # Content-defined chunk hashes per test, for incremental re-imports
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chunk_manifests (
+        id SERIAL PRIMARY KEY,
+        test_id INTEGER NOT NULL,
+        chunk_hash CHAR(64) NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        word_count INTEGER NOT NULL,
+        card_ids INTEGER[] NOT NULL DEFAULT '{}',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(test_id) REFERENCES tests(id),
+        UNIQUE(test_id, chunk_hash)
+    )""")
+    
+    # Card embeddings for semantic search (float32 bytes; see embeddings.py / vector_index.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS flashcard_embeddings (
+        seq BIGSERIAL PRIMARY KEY,
+        flashcard_id INTEGER NOT NULL REFERENCES flashcards(id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL,
+        model VARCHAR(100) NOT NULL,
+        dim INTEGER NOT NULL,
+        vector BYTEA NOT NULL
+    )""")
+    # One vector per card and model (tables created before this had one per card)
+    cur.execute("ALTER TABLE flashcard_embeddings DROP CONSTRAINT IF EXISTS flashcard_embeddings_flashcard_id_key")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_flashcard_embeddings_card_model ON flashcard_embeddings (flashcard_id, model)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flashcard_embeddings_model_seq ON flashcard_embeddings (model, seq)")
+    
+    # Study review history, written in batches by review_events.ReviewBuffer. No foreign key:
+    # history outlives deleted cards, and ownership is checked when a batch is written
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS review_events (
+        id BIGSERIAL PRIMARY KEY,
+        flashcard_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        result VARCHAR(16) NOT NULL,
+        latency_ms INTEGER NOT NULL,
+        reviewed_at TIMESTAMP NOT NULL
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_review_events_card ON review_events (flashcard_id, reviewed_at)")
+    
+    # Refresh tokens (auth.py): only a SHA-256 of each token is stored; rotation revokes a token
+    # and issues its successor in the same family, so reuse of a revoked token revokes the family
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS refresh_tokens (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        token_hash CHAR(64) NOT NULL UNIQUE,
+        family_id CHAR(32) NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        revoked_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens (family_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens (user_id, expires_at)")
+    
+    cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    cur.execute("INSERT INTO schema_version (version) SELECT %s WHERE NOT EXISTS (SELECT 1 FROM schema_version WHERE version = %s)",
+                (SCHEMA_VERSION, SCHEMA_VERSION))
+    
+    conn.commit()
+    conn.close()
+
+def insert_flashcards(test_id, flashcards, import_job_id=None):
+    """Insert flashcards for a test and return their IDs"""
+    if not flashcards:
+        return []
+    
+    query = "INSERT INTO flashcards (test_id, front, back, import_job_id) VALUES %s RETURNING id"
+    params = [(test_id, front, back, import_job_id) for front, back in flashcards]
+    
+    cur = None
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        rows = execute_values(cur, query, params, fetch=True)
+        conn.commit()
+        return [row['id'] for row in rows]
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur:
+            cur.close()
+        conn.close()
+
+def claim_document_import_job(worker_id, lease_seconds=600, max_attempts=3):
+    """Claim the next uploaded document awaiting extraction, or None if there is none (the document itself is read separately)"""
+    query = """
+        WITH next AS (
+            SELECT id FROM import_jobs
+            WHERE (status = 'queued' OR (status = 'extracting' AND lease_expires_at < NOW()))
+              AND attempts < %s
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE import_jobs j
+        SET status = 'extracting',
+            worker_id = %s,
+            attempts = j.attempts + 1,
+            lease_expires_at = NOW() + %s * INTERVAL '1 second'
+        FROM next
+        WHERE j.id = next.id
+        RETURNING j.id, j.source, j.chunk_size, j.overlap_size, j.attempts
+    """
+    return execute_query(query, (max_attempts, worker_id, lease_seconds), fetch_one=True)
+
+def claim_import_chunk(worker_id, lease_seconds=600, max_attempts=3):
+    """Claim the next pending (or lease-expired) chunk for a worker, or None if the queue is empty"""
+    query = """
+        WITH next AS (
+            SELECT id FROM import_chunks
+            WHERE (status = 'pending' OR (status = 'running' AND lease_expires_at < NOW()))
+              AND attempts < %s
+            ORDER BY job_id, chunk_index
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE import_chunks c
+        SET status = 'running',
+            worker_id = %s,
+            attempts = c.attempts + 1,
+            lease_expires_at = NOW() + %s * INTERVAL '1 second',
+            updated_at = NOW()
+        FROM next, import_jobs j
+        WHERE c.id = next.id AND j.id = c.job_id
+        RETURNING c.id, c.job_id, c.chunk_index, c.content, c.attempts, j.test_id, j.model
+    """
+    return execute_query(query, (max_attempts, worker_id, lease_seconds), fetch_one=True)
+
+def get_chunk_manifest(test_id):
+    """Get the stored chunk manifest for a test, keyed by chunk hash"""
+    query = "SELECT chunk_hash, chunk_index, word_count, card_ids FROM chunk_manifests WHERE test_id = %s"
+    results = execute_query(query, (test_id,))
+    return {row['chunk_hash']: row for row in results}
+
+def save_chunk_manifest_entry(test_id, chunk_hash, chunk_index, word_count, card_ids):
+    """Record (or replace) the cards generated from a chunk"""
+    query = """
+        INSERT INTO chunk_manifests (test_id, chunk_hash, chunk_index, word_count, card_ids)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (test_id, chunk_hash) DO UPDATE
+        SET chunk_index = EXCLUDED.chunk_index, word_count = EXCLUDED.word_count,
+            card_ids = EXCLUDED.card_ids, updated_at = NOW()
+    """
+    execute_query(query, (test_id, chunk_hash, chunk_index, word_count, list(card_ids)), fetch_all=False)
+
+def update_chunk_manifest_indexes(test_id, chunk_indexes):
+    """Update the position of reused chunks in the revised document"""
+    if not chunk_indexes:
+        return
+    
+    query = """
+        UPDATE chunk_manifests m SET chunk_index = v.chunk_index, updated_at = NOW()
+        FROM (VALUES %s) AS v(test_id, chunk_hash, chunk_index)
+        WHERE m.test_id = v.test_id AND m.chunk_hash = v.chunk_hash
+    """
+    params = [(test_id, chunk_hash, chunk_index) for chunk_hash, chunk_index in chunk_indexes.items()]
+    
+    cur = None
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        execute_values(cur, query, params)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur:
+            cur.close()
+        conn.close()
+
+def retire_chunk_manifest_entries(test_id, chunk_hashes, delete_cards=True, keep_card_ids=()):
+    """Remove chunks that no longer exist in the document, optionally deleting their cards (except keep_card_ids); returns cards deleted"""
+    if not chunk_hashes:
+        return 0
+    
+    cur = None
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM chunk_manifests WHERE test_id = %s AND chunk_hash = ANY(%s) RETURNING card_ids",
+            (test_id, list(chunk_hashes)),
+        )
+        card_ids = [card_id for row in cur.fetchall() for card_id in row['card_ids'] if card_id not in keep_card_ids]
+        deleted = 0
+        if delete_cards and card_ids:
+            cur.execute("DELETE FROM flashcards WHERE test_id = %s AND id = ANY(%s)", (test_id, card_ids))
+            deleted = cur.rowcount
+        conn.commit()
+        return deleted
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur:
+            cur.close()
+        conn.close()
+
+class QueueWriter:
+    """File object for COPY TO: hands each chunk to the consumer through a bounded queue"""
+    
+    def __init__(self, max_chunks=16):
+        self.queue = queue.Queue(max_chunks)
+        self.cancelled = threading.Event()
+    
+    def write(self, data):
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(data, timeout=1)
+                return
+            except queue.Full:
+                continue
+        raise IOError("export cancelled by the client")
+    
+    def finish(self, item):
+        try:
+            self.write(item)
+        except IOError:
+            pass
+
+EXPORT_DONE = object()
+
+def export_flashcards(test_id, fmt):
+    """Stream a test's cards as NDJSON or CSV (bytes chunks) straight from COPY TO"""
+    if fmt == "ndjson":
+        # json_build_object escapes control characters, so with these quote/delimiter bytes CSV mode emits the JSON verbatim
+        select = "SELECT json_build_object('front', front, 'back', back, 'mastered', mastered)::text FROM flashcards WHERE test_id = %s ORDER BY id"
+        options = "FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02'"
+    else:
+        select = "SELECT front, back, CASE WHEN mastered THEN 'true' ELSE 'false' END AS mastered FROM flashcards WHERE test_id = %s ORDER BY id"
+        options = "FORMAT csv, HEADER"
+    
+    writer = QueueWriter()
+    
+    def copy():
+        conn = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.copy_expert(cur.mogrify(f"COPY ({select}) TO STDOUT WITH ({options})", (test_id,)).decode(), writer)
+            conn.rollback()
+            writer.finish(EXPORT_DONE)
+        except Exception as e:
+            writer.finish(e)
+        finally:
+            if conn:
+                conn.close()
+    
+    threading.Thread(target=copy, daemon=True).start()
+    try:
+        while True:
+            item = writer.queue.get()
+            if item is EXPORT_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        writer.cancelled.set()
+
+def import_flashcards(test_id, rows):
+    """Bulk-load (front, back, mastered) rows via COPY into a staging table, skipping duplicate fronts; returns (staged, inserted)"""
+    stream = CSVRowStream(rows)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TEMP TABLE flashcard_import (
+                ord BIGSERIAL,
+                front TEXT NOT NULL,
+                back TEXT NOT NULL,
+                mastered BOOLEAN NOT NULL
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert("COPY flashcard_import (front, back, mastered) FROM STDIN WITH (FORMAT csv)", stream)
+        # First occurrence of each front wins; fronts already in the test are skipped
+        cur.execute("""
+            INSERT INTO flashcards (test_id, front, back, mastered)
+            SELECT %s, s.front, s.back, s.mastered FROM (
+                SELECT DISTINCT ON (front) ord, front, back, mastered FROM flashcard_import ORDER BY front, ord
+            ) s
+            WHERE NOT EXISTS (SELECT 1 FROM flashcards f WHERE f.test_id = %s AND f.front = s.front)
+            ORDER BY s.ord
+        """, (test_id, test_id))
+        inserted = cur.rowcount
+        conn.commit()
+        return stream.count, inserted
+    except Exception as e:
+        conn.rollback()
+        raise stream.error or e
+    finally:
+        cur.close()
+        conn.close()
+
+def search_flashcards(user_id, query, limit=20, offset=0):
+    """Ranked full-text search over a user's cards via the GIN-indexed search_vector; fetches limit + 1 rows so callers can tell if there are more"""
+    return execute_query("""
+        SELECT f.id, f.test_id, t.name AS test_name, s.id AS subject_id, s.name AS subject_name,
+               f.front, f.back, f.mastered, ts_rank_cd(f.search_vector, q) AS rank
+        FROM flashcards f
+        JOIN tests t ON f.test_id = t.id
+        JOIN subjects s ON t.subject_id = s.id
+        CROSS JOIN websearch_to_tsquery('english', %s) q
+        WHERE f.search_vector @@ q AND s.user_id = %s
+        ORDER BY rank DESC, f.id
+        LIMIT %s OFFSET %s
+    """, (query, user_id, limit + 1, offset))
+
+def insert_review_events(rows):
+    """Write (flashcard_id, user_id, result, latency_ms, reviewed_at) rows in one multi-row INSERT, skipping cards the user does not own"""
+    if not rows:
+        return 0
+    
+    query = """
+        INSERT INTO review_events (flashcard_id, user_id, result, latency_ms, reviewed_at)
+        SELECT v.flashcard_id, v.user_id, v.result, v.latency_ms, v.reviewed_at
+        FROM (VALUES %s) AS v (flashcard_id, user_id, result, latency_ms, reviewed_at)
+        JOIN flashcards f ON f.id = v.flashcard_id
+        JOIN tests t ON f.test_id = t.id
+        JOIN subjects s ON t.subject_id = s.id AND s.user_id = v.user_id
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        execute_values(cur, query, rows, page_size=len(rows))
+        inserted = cur.rowcount
+        conn.commit()
+        return inserted
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
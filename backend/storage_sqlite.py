@@ -0,0 +1,615 @@
+"""
+Embedded SQLite storage backend for local and single-user deployments.
+
+Selected by database.py when DATABASE_URL is a sqlite:/// URL, e.g.
+`sqlite:///study.db` (relative) or `sqlite:////var/lib/studybuddy/study.db`.
+Each thread keeps one connection open in WAL mode with tuned pragmas, so
+queries cost microseconds instead of a network round trip. Queries written
+for psycopg2 (`%s` placeholders, dict rows) run unchanged through the
+connection wrapper; only the statements relying on PostgreSQL-only features
+are reimplemented here.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+from metrics import record_query, record_connect
+from database import execute_query, SCHEMA_VERSION
+from deck_io import format_rows
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+thread_state = threading.local()
+
+# Return BOOLEAN and TIMESTAMP columns as bool / datetime, like psycopg2 does (and store datetime parameters in the same format)
+sqlite3.register_converter("BOOLEAN", lambda value: value not in (b"0", b""))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+
+def get_database_path() -> str:
+    database_url = os.getenv("DATABASE_URL", "")
+    path = database_url[len("sqlite:///"):] if database_url.startswith("sqlite:///") else database_url[len("sqlite:"):]
+    return path or "study.db"
+
+
+def dict_row_factory(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    """Cursor accepting psycopg2-style `%s` placeholders"""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self.cursor = cursor
+
+    def execute(self, query, params=None):
+        start = time.perf_counter()
+        try:
+            self.cursor.execute(query.replace("%s", "?"), params or ())
+            return self
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+    def executemany(self, query, params_list):
+        start = time.perf_counter()
+        try:
+            self.cursor.executemany(query.replace("%s", "?"), params_list)
+            return self
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.cursor.close()
+
+
+class SQLiteConnection:
+    """Per-thread connection; close() only ends the transaction so the connection is reused"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def cursor(self):
+        return SQLiteCursor(self.conn.cursor())
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def begin_immediate(self):
+        """Take the write lock up front, for read-then-write sequences such as queue claims"""
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def close(self):
+        if self.conn.in_transaction:
+            self.conn.rollback()
+
+
+def get_db_connection():
+    """Get this thread's SQLite connection, opening it on first use"""
+    start = time.perf_counter()
+    conn = getattr(thread_state, "conn", None)
+    if conn is None or getattr(thread_state, "path", None) != get_database_path():
+        path = get_database_path()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        raw = sqlite3.connect(path, timeout=5, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        raw.row_factory = dict_row_factory
+        for pragma in PRAGMAS:
+            raw.execute(pragma)
+        conn = thread_state.conn = SQLiteConnection(raw)
+        thread_state.path = path
+    record_connect(time.perf_counter() - start)
+    return conn
+
+
+def init_db():
+    """Initialize database tables"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        hashed_password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS subjects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users(id),
+        UNIQUE(user_id, name)
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subject_id INTEGER,
+        name TEXT NOT NULL,
+        FOREIGN KEY(subject_id) REFERENCES subjects(id),
+        UNIQUE(subject_id, name)
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS flashcards (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        test_id INTEGER,
+        front TEXT NOT NULL,
+        back TEXT NOT NULL,
+        mastered BOOLEAN DEFAULT 0,
+        FOREIGN KEY(test_id) REFERENCES tests(id)
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_test_id ON flashcards (test_id)")
+
+    # Per-test counters for deck statistics (see database.get_subject_tree), kept exact by triggers
+    cur.execute("PRAGMA table_info(tests)")
+    test_columns = {row['name'] for row in cur.fetchall()}
+    for column in ("card_count", "mastered_count"):
+        if column not in test_columns:
+            cur.execute(f"ALTER TABLE tests ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS flashcards_counts_insert AFTER INSERT ON flashcards BEGIN
+        UPDATE tests SET card_count = card_count + 1, mastered_count = mastered_count + (new.mastered IS TRUE)
+        WHERE id = new.test_id;
+    END""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS flashcards_counts_delete AFTER DELETE ON flashcards BEGIN
+        UPDATE tests SET card_count = card_count - 1, mastered_count = mastered_count - (old.mastered IS TRUE)
+        WHERE id = old.test_id;
+    END""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS flashcards_counts_update AFTER UPDATE OF test_id, mastered ON flashcards BEGIN
+        UPDATE tests SET card_count = card_count - 1, mastered_count = mastered_count - (old.mastered IS TRUE)
+        WHERE id = old.test_id;
+        UPDATE tests SET card_count = card_count + 1, mastered_count = mastered_count + (new.mastered IS TRUE)
+        WHERE id = new.test_id;
+    END""")
+    cur.execute("""
+    UPDATE tests SET
+        card_count = (SELECT COUNT(*) FROM flashcards f WHERE f.test_id = tests.id),
+        mastered_count = (SELECT COUNT(*) FROM flashcards f WHERE f.test_id = tests.id AND f.mastered)""")
+
+    # Full-text search (see search_flashcards): external-content FTS5 index kept in sync by triggers
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'flashcards_fts'")
+    fts_exists = cur.fetchone() is not None
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+        front, back, content='flashcards', content_rowid='id', tokenize='porter unicode61'
+    )""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO flashcards_fts (rowid, front, back) VALUES (new.id, new.front, new.back);
+    END""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+        INSERT INTO flashcards_fts (flashcards_fts, rowid, front, back) VALUES ('delete', old.id, old.front, old.back);
+    END""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF front, back ON flashcards BEGIN
+        INSERT INTO flashcards_fts (flashcards_fts, rowid, front, back) VALUES ('delete', old.id, old.front, old.back);
+        INSERT INTO flashcards_fts (rowid, front, back) VALUES (new.id, new.front, new.back);
+    END""")
+    if not fts_exists:
+        cur.execute("INSERT INTO flashcards_fts (flashcards_fts) VALUES ('rebuild')")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        test_id INTEGER NOT NULL,
+        model TEXT NOT NULL,
+        source TEXT,
+        status TEXT NOT NULL DEFAULT 'chunked',
+        document BLOB,
+        chunk_size INTEGER,
+        overlap_size INTEGER,
+        baseline_card_id INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker_id TEXT,
+        lease_expires_at TIMESTAMP,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id),
+        FOREIGN KEY(test_id) REFERENCES tests(id)
+    )""")
+
+    cur.execute("PRAGMA table_info(import_jobs)")
+    if "attempts" not in {row['name'] for row in cur.fetchall()}:
+        cur.execute("ALTER TABLE import_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    # Cards generated by an import job, so its event stream only shows that job's cards
+    cur.execute("PRAGMA table_info(flashcards)")
+    if "import_job_id" not in {row['name'] for row in cur.fetchall()}:
+        cur.execute("ALTER TABLE flashcards ADD COLUMN import_job_id INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_import_job ON flashcards (import_job_id, id) WHERE import_job_id IS NOT NULL")
+
+    # Last time each worker polled the queue (see main.create_import)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_workers (
+        worker_id TEXT PRIMARY KEY,
+        seen_at TIMESTAMP NOT NULL
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_chunks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id INTEGER NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker_id TEXT,
+        lease_expires_at TIMESTAMP,
+        cards_created INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(job_id) REFERENCES import_jobs(id) ON DELETE CASCADE,
+        UNIQUE(job_id, chunk_index)
+    )""")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_import_chunks_status ON import_chunks (status, lease_expires_at)")
+
+    # card_ids is a JSON array here (INTEGER[] in PostgreSQL)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chunk_manifests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        test_id INTEGER NOT NULL,
+        chunk_hash TEXT NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        word_count INTEGER NOT NULL,
+        card_ids TEXT NOT NULL DEFAULT '[]',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(test_id) REFERENCES tests(id),
+        UNIQUE(test_id, chunk_hash)
+    )""")
+
+    # Card embeddings for semantic search (float32 bytes; see embeddings.py / vector_index.py)
+    create_embeddings = """
+    CREATE TABLE IF NOT EXISTS flashcard_embeddings (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        flashcard_id INTEGER NOT NULL REFERENCES flashcards(id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL,
+        model TEXT NOT NULL,
+        dim INTEGER NOT NULL,
+        vector BLOB NOT NULL
+    )"""
+    cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'flashcard_embeddings'")
+    existing = cur.fetchone()
+    if existing and "flashcard_id INTEGER NOT NULL UNIQUE" in existing['sql']:
+        # Tables created before vectors were kept per model had one per card: rebuild without that constraint
+        cur.execute("ALTER TABLE flashcard_embeddings RENAME TO flashcard_embeddings_old")
+        cur.execute(create_embeddings)
+        cur.execute("INSERT INTO flashcard_embeddings SELECT seq, flashcard_id, user_id, model, dim, vector FROM flashcard_embeddings_old")
+        cur.execute("DROP TABLE flashcard_embeddings_old")
+    else:
+        cur.execute(create_embeddings)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_flashcard_embeddings_card_model ON flashcard_embeddings (flashcard_id, model)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flashcard_embeddings_model_seq ON flashcard_embeddings (model, seq)")
+
+    # Study review history, written in batches by review_events.ReviewBuffer (no foreign key, as in PostgreSQL)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS review_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        flashcard_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        result TEXT NOT NULL,
+        latency_ms INTEGER NOT NULL,
+        reviewed_at TIMESTAMP NOT NULL
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_review_events_card ON review_events (flashcard_id, reviewed_at)")
+
+    # Refresh tokens (auth.py), stored as SHA-256 hashes as in PostgreSQL
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS refresh_tokens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        token_hash TEXT NOT NULL UNIQUE,
+        family_id TEXT NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        revoked_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens (family_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens (user_id, expires_at)")
+
+    cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    cur.execute("INSERT INTO schema_version (version) SELECT %s WHERE NOT EXISTS (SELECT 1 FROM schema_version WHERE version = %s)",
+                (SCHEMA_VERSION, SCHEMA_VERSION))
+
+    conn.commit()
+    conn.close()
+
+
+def insert_flashcards(test_id, flashcards, import_job_id=None):
+    """Insert flashcards for a test and return their IDs"""
+    if not flashcards:
+        return []
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        ids = []
+        for front, back in flashcards:
+            cur.execute("INSERT INTO flashcards (test_id, front, back, import_job_id) VALUES (%s, %s, %s, %s)",
+                        (test_id, front, back, import_job_id))
+            ids.append(cur.lastrowid)
+        conn.commit()
+        return ids
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+
+def claim_document_import_job(worker_id, lease_seconds=600, max_attempts=3):
+    """Claim the next uploaded document awaiting extraction, or None if there is none (the document itself is read separately)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        conn.begin_immediate()
+        cur.execute("""
+            SELECT id, source, chunk_size, overlap_size, attempts + 1 AS attempts FROM import_jobs
+            WHERE (status = 'queued' OR (status = 'extracting' AND lease_expires_at < CURRENT_TIMESTAMP))
+              AND attempts < %s
+            ORDER BY id
+            LIMIT 1
+        """, (max_attempts,))
+        job = cur.fetchone()
+        if job is not None:
+            cur.execute("""
+                UPDATE import_jobs
+                SET status = 'extracting', worker_id = %s, attempts = attempts + 1,
+                    lease_expires_at = datetime('now', %s)
+                WHERE id = %s
+            """, (worker_id, f"+{int(lease_seconds)} seconds", job['id']))
+        conn.commit()
+        return job
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+
+def claim_import_chunk(worker_id, lease_seconds=600, max_attempts=3):
+    """Claim the next pending (or lease-expired) chunk for a worker, or None if the queue is empty"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        conn.begin_immediate()
+        cur.execute("""
+            SELECT c.id, c.job_id, c.chunk_index, c.content, c.attempts + 1 AS attempts, j.test_id, j.model
+            FROM import_chunks c
+            JOIN import_jobs j ON j.id = c.job_id
+            WHERE (c.status = 'pending' OR (c.status = 'running' AND c.lease_expires_at < CURRENT_TIMESTAMP))
+              AND c.attempts < %s
+            ORDER BY c.job_id, c.chunk_index
+            LIMIT 1
+        """, (max_attempts,))
+        chunk = cur.fetchone()
+        if chunk is not None:
+            cur.execute("""
+                UPDATE import_chunks
+                SET status = 'running', worker_id = %s, attempts = attempts + 1,
+                    lease_expires_at = datetime('now', %s), updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (worker_id, f"+{int(lease_seconds)} seconds", chunk['id']))
+        conn.commit()
+        return chunk
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_chunk_manifest(test_id):
+    """Get the stored chunk manifest for a test, keyed by chunk hash"""
+    query = "SELECT chunk_hash, chunk_index, word_count, card_ids FROM chunk_manifests WHERE test_id = %s"
+    results = execute_query(query, (test_id,))
+    return {row['chunk_hash']: dict(row, card_ids=json.loads(row['card_ids'])) for row in results}
+
+
+def save_chunk_manifest_entry(test_id, chunk_hash, chunk_index, word_count, card_ids):
+    """Record (or replace) the cards generated from a chunk"""
+    query = """
+        INSERT INTO chunk_manifests (test_id, chunk_hash, chunk_index, word_count, card_ids)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (test_id, chunk_hash) DO UPDATE
+        SET chunk_index = excluded.chunk_index, word_count = excluded.word_count,
+            card_ids = excluded.card_ids, updated_at = CURRENT_TIMESTAMP
+    """
+    execute_query(query, (test_id, chunk_hash, chunk_index, word_count, json.dumps(list(card_ids))), fetch_all=False)
+
+
+def update_chunk_manifest_indexes(test_id, chunk_indexes):
+    """Update the position of reused chunks in the revised document"""
+    if not chunk_indexes:
+        return
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.executemany(
+            "UPDATE chunk_manifests SET chunk_index = %s, updated_at = CURRENT_TIMESTAMP WHERE test_id = %s AND chunk_hash = %s",
+            [(chunk_index, test_id, chunk_hash) for chunk_hash, chunk_index in chunk_indexes.items()],
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+
+def retire_chunk_manifest_entries(test_id, chunk_hashes, delete_cards=True, keep_card_ids=()):
+    """Remove chunks that no longer exist in the document, optionally deleting their cards (except keep_card_ids); returns cards deleted"""
+    if not chunk_hashes:
+        return 0
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        hashes = list(chunk_hashes)
+        placeholders = ", ".join(["%s"] * len(hashes))
+        cur.execute(f"SELECT card_ids FROM chunk_manifests WHERE test_id = %s AND chunk_hash IN ({placeholders})",
+                    [test_id] + hashes)
+        card_ids = [card_id for row in cur.fetchall() for card_id in json.loads(row['card_ids']) if card_id not in keep_card_ids]
+        cur.execute(f"DELETE FROM chunk_manifests WHERE test_id = %s AND chunk_hash IN ({placeholders})",
+                    [test_id] + hashes)
+        deleted = 0
+        if delete_cards and card_ids:
+            cur.executemany("DELETE FROM flashcards WHERE test_id = %s AND id = %s", [(test_id, card_id) for card_id in card_ids])
+            deleted = cur.rowcount
+        conn.commit()
+        return deleted
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+
+def export_flashcards(test_id, fmt, page_size=1000):
+    """Stream a test's cards as NDJSON or CSV (bytes chunks), one keyset page at a time"""
+    last_id = 0
+    header = fmt == "csv"
+    while True:
+        rows = execute_query(
+            "SELECT id, front, back, mastered FROM flashcards WHERE test_id = %s AND id > %s ORDER BY id LIMIT %s",
+            (test_id, last_id, page_size),
+        )
+        if rows or header:
+            yield format_rows(rows, fmt, header).encode("utf-8")
+            header = False
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def import_flashcards(test_id, rows, batch_size=1000):
+    """Bulk-load (front, back, mastered) rows through a staging table, skipping duplicate fronts; returns (staged, inserted)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS flashcard_import (front TEXT NOT NULL, back TEXT NOT NULL, mastered BOOLEAN NOT NULL)")
+        cur.execute("DELETE FROM flashcard_import")
+        rows = iter(rows)
+        staged = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            cur.executemany("INSERT INTO flashcard_import (front, back, mastered) VALUES (%s, %s, %s)", batch)
+            staged += len(batch)
+        # First occurrence of each front wins; fronts already in the test are skipped
+        cur.execute("""
+            INSERT INTO flashcards (test_id, front, back, mastered)
+            SELECT %s, front, back, mastered FROM flashcard_import
+            WHERE rowid IN (SELECT MIN(rowid) FROM flashcard_import GROUP BY front)
+              AND front NOT IN (SELECT front FROM flashcards WHERE test_id = %s)
+            ORDER BY rowid
+        """, (test_id, test_id))
+        inserted = cur.rowcount
+        cur.execute("DELETE FROM flashcard_import")
+        conn.commit()
+        return staged, inserted
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
+
+
+def search_flashcards(user_id, query, limit=20, offset=0):
+    """Ranked full-text search over a user's cards via FTS5; fetches limit + 1 rows so callers can tell if there are more"""
+    # Quote each term so user input is never parsed as FTS5 query syntax (terms are ANDed)
+    terms = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+    if not terms:
+        return []
+    return execute_query("""
+        SELECT f.id, f.test_id, t.name AS test_name, s.id AS subject_id, s.name AS subject_name,
+               f.front, f.back, f.mastered, -bm25(flashcards_fts, 2.0, 1.0) AS rank
+        FROM flashcards_fts
+        JOIN flashcards f ON f.id = flashcards_fts.rowid
+        JOIN tests t ON f.test_id = t.id
+        JOIN subjects s ON t.subject_id = s.id
+        WHERE flashcards_fts MATCH %s AND s.user_id = %s
+        ORDER BY rank DESC, f.id
+        LIMIT %s OFFSET %s
+    """, (terms, user_id, limit + 1, offset))
+
+
+def insert_review_events(rows):
+    """Write (flashcard_id, user_id, result, latency_ms, reviewed_at) rows in one multi-row INSERT, skipping cards the user does not own"""
+    if not rows:
+        return 0
+
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+    query = f"""
+        INSERT INTO review_events (flashcard_id, user_id, result, latency_ms, reviewed_at)
+        WITH v (flashcard_id, user_id, result, latency_ms, reviewed_at) AS (VALUES {values})
+        SELECT v.flashcard_id, v.user_id, v.result, v.latency_ms, v.reviewed_at
+        FROM v
+        JOIN flashcards f ON f.id = v.flashcard_id
+        JOIN tests t ON f.test_id = t.id
+        JOIN subjects s ON t.subject_id = s.id AND s.user_id = v.user_id
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        params = []
+        for flashcard_id, user_id, result, latency_ms, reviewed_at in rows:
+            params.extend((flashcard_id, user_id, result, latency_ms, reviewed_at.isoformat(" ")))
+        cur.execute(query, params)
+        inserted = cur.rowcount
+        conn.commit()
+        return inserted
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        cur.close()
+        conn.close()
@@ -0,0 +1,358 @@
+"""
+API and storage tests on the embedded SQLite backend (no PostgreSQL needed):
+the import work queue, deck counters, full-text search, schema migrations,
+refresh-token rotation, deck export/import, the review buffer and deck-cache
+invalidation.
+
+Run: uv run pytest test_api.py
+"""
+
+import io
+import json
+import time
+
+import pytest
+
+import main
+from deck_cache import MemoryCache
+
+
+def upload(client, headers, cards, subject="Biology", test="Cells"):
+    body = {"flashcards": [{"front": front, "back": back, "subject": subject, "test": test} for front, back in cards]}
+    response = client.post("/upload_flashcards", json=body, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def first_test(client, headers):
+    return client.get("/subjects", headers=headers).json()[0]["tests"][0]
+
+
+def deck(client, headers, test_id):
+    return client.get(f"/tests/{test_id}/flashcards", headers=headers).json()
+
+
+# -------------------------
+# Import work queue
+# -------------------------
+def test_chunk_claims_lease_and_retry(db):
+    test_id = db.insert_test("Cells", db.insert_subject("Biology", 1))
+    job_id = db.enqueue_import_job(test_id, 1, "model", ["first chunk", "second chunk"])
+
+    first = db.claim_import_chunk("worker-a")
+    second = db.claim_import_chunk("worker-b")
+    assert (first['chunk_index'], second['chunk_index']) == (0, 1)
+    assert db.claim_import_chunk("worker-c") is None
+
+    # Only the lease holder can complete a chunk
+    assert not db.complete_import_chunk(first['id'], "worker-b", 1)
+    assert db.complete_import_chunk(first['id'], "worker-a", 1)
+
+    # A failed chunk is retried until max_attempts, then marked failed
+    assert db.fail_import_chunk(second['id'], "worker-b", "boom", max_attempts=2)
+    retry = db.claim_import_chunk("worker-c", max_attempts=2)
+    assert (retry['id'], retry['attempts']) == (second['id'], 2)
+    assert db.fail_import_chunk(retry['id'], "worker-c", "boom again", max_attempts=2)
+    assert db.claim_import_chunk("worker-d", max_attempts=2) is None
+
+    status = db.get_import_job_status(job_id)[0]
+    assert (status['done'], status['failed'], status['cards_created']) == (1, 1, 1)
+
+
+def test_expired_chunk_lease_is_reclaimed_then_reaped(db):
+    test_id = db.insert_test("Cells", db.insert_subject("Biology", 1))
+    db.enqueue_import_job(test_id, 1, "model", ["only chunk"])
+
+    claimed = db.claim_import_chunk("crashed-worker", max_attempts=1)
+    db.execute_query("UPDATE import_chunks SET lease_expires_at = %s WHERE id = %s",
+                     ("2000-01-01 00:00:00", claimed['id']), fetch_all=False)
+
+    # Its one attempt is used up, so nobody reclaims it and the reaper fails it
+    assert db.claim_import_chunk("worker", max_attempts=1) is None
+    assert db.reap_expired_import_chunks(max_attempts=1) == 1
+    assert db.get_import_job_status()[0]['failed'] == 1
+
+
+def test_document_claim_gives_up_after_max_attempts(db):
+    test_id = db.insert_test("Cells", db.insert_subject("Biology", 1))
+    job_id = db.create_document_import_job(test_id, 1, "model", "notes.txt", b"Cells are small.")
+
+    for attempt in range(1, 3):
+        job = db.claim_document_import_job(f"worker-{attempt}", max_attempts=2)
+        assert (job['id'], job['attempts']) == (job_id, attempt)
+        assert 'document' not in job
+        assert db.get_import_job_document(job_id, f"worker-{attempt}") == b"Cells are small."
+        db.execute_query("UPDATE import_jobs SET lease_expires_at = %s", ("2000-01-01 00:00:00",), fetch_all=False)
+
+    assert db.claim_document_import_job("worker-3", max_attempts=2) is None
+    assert db.reap_expired_import_jobs(max_attempts=2) == 1
+    assert db.get_import_job_status(job_id)[0]['status'] == "failed"
+
+
+def test_imports_need_a_running_worker(client, auth, db):
+    headers, _ = auth
+    files = {"file": ("notes.txt", b"Cells are small.", "text/plain")}
+    form = {"subject": "Biology", "test": "Cells"}
+    assert client.post("/imports", files=files, data=form, headers=headers).status_code == 503
+
+    db.record_worker_heartbeat("worker")
+    response = client.post("/imports", files=files, data=form, headers=headers)
+    assert response.status_code == 202
+    assert client.get(f"/imports/{response.json()['id']}", headers=headers).status_code == 200
+
+
+# -------------------------
+# Deck counters and full-text search (triggers)
+# -------------------------
+def test_deck_counters_follow_every_write(client, auth, db):
+    headers, _ = auth
+    upload(client, headers, [("What is a cell?", "The unit of life"), ("What is DNA?", "Genetic material")])
+    test = first_test(client, headers)
+    assert (test["card_count"], test["mastered_count"], test["due_count"]) == (2, 0, 2)
+
+    card_id = deck(client, headers, test["id"])[0]["id"]
+    assert client.patch(f"/flashcards/{card_id}/mastered", json=True, headers=headers).status_code == 200
+    test = first_test(client, headers)
+    assert (test["card_count"], test["mastered_count"], test["due_count"]) == (2, 1, 1)
+
+    db.execute_query("DELETE FROM flashcards WHERE id = %s", (card_id,), fetch_all=False)
+    test = first_test(client, headers)
+    assert (test["card_count"], test["mastered_count"]) == (1, 0)
+
+
+def test_search_ranks_front_matches_and_follows_updates(client, auth, db):
+    headers, _ = auth
+    upload(client, headers, [("What is mitosis?", "Cell division"), ("What is a ribosome?", "Builds proteins during mitosis")])
+
+    results = client.get("/search", params={"q": "mitosis"}, headers=headers).json()["results"]
+    assert [row["front"] for row in results] == ["What is mitosis?", "What is a ribosome?"]
+
+    # Syntax characters are searched as text, not parsed as FTS5 queries
+    assert client.get("/search", params={"q": 'mitosis" OR "'}, headers=headers).status_code == 200
+
+    db.execute_query("UPDATE flashcards SET back = %s WHERE front = %s", ("Makes meiosis", "What is a ribosome?"), fetch_all=False)
+    results = client.get("/search", params={"q": "mitosis"}, headers=headers).json()["results"]
+    assert [row["front"] for row in results] == ["What is mitosis?"]
+
+
+# -------------------------
+# Schema migrations
+# -------------------------
+def test_outdated_schema_is_upgraded_in_place(db, monkeypatch):
+    test_id = db.insert_test("Cells", db.insert_subject("Biology", 1))
+    db.insert_flashcards(test_id, [("What is a cell?", "The unit of life")])
+
+    # Roll the file back to a schema 8 database: no import attempts or card job ids yet
+    db.execute_query("DROP INDEX idx_flashcards_import_job", fetch_all=False)
+    db.execute_query("ALTER TABLE flashcards DROP COLUMN import_job_id", fetch_all=False)
+    db.execute_query("ALTER TABLE import_jobs DROP COLUMN attempts", fetch_all=False)
+    db.execute_query("DELETE FROM schema_version", fetch_all=False)
+    db.execute_query("INSERT INTO schema_version (version) VALUES (8)", fetch_all=False)
+    monkeypatch.setattr(db, "schema_ready", False)
+
+    assert db.read_schema_version(db.select_backend()) == 8
+    db.get_backend()
+    assert db.read_schema_version(db.select_backend()) == db.SCHEMA_VERSION
+
+    columns = {row['name'] for row in db.execute_query("PRAGMA table_info(flashcards)")}
+    assert "import_job_id" in columns
+    assert db.execute_query("SELECT card_count FROM tests WHERE id = %s", (test_id,), fetch_one=True)['card_count'] == 1
+    assert db.claim_document_import_job("worker") is None
+
+
+# -------------------------
+# Refresh tokens
+# -------------------------
+def test_refresh_tokens_rotate_and_reuse_revokes_the_session(client, auth, monkeypatch):
+    _, refresh_token = auth
+    rotated = client.post("/token/refresh", json={"refresh_token": refresh_token})
+    assert rotated.status_code == 200
+    newer = rotated.json()["refresh_token"]
+    assert client.get("/me", headers={"Authorization": f"Bearer {rotated.json()['access_token']}"}).status_code == 200
+
+    # Within the grace period a replayed token is refused but the session survives (two tabs refreshing)
+    assert client.post("/token/refresh", json={"refresh_token": refresh_token}).status_code == 401
+    newest = client.post("/token/refresh", json={"refresh_token": newer}).json()["refresh_token"]
+
+    # After it, replaying a rotated token revokes every token of the login
+    monkeypatch.setattr("auth.REFRESH_REUSE_GRACE_SECONDS", -1)
+    assert client.post("/token/refresh", json={"refresh_token": refresh_token}).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": newest}).status_code == 401
+
+
+def test_logout_revokes_the_refresh_token(client, auth):
+    _, refresh_token = auth
+    assert client.post("/logout", json={"refresh_token": refresh_token}).status_code == 204
+    assert client.post("/token/refresh", json={"refresh_token": refresh_token}).status_code == 401
+
+
+# -------------------------
+# Deck export / import
+# -------------------------
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_import_round_trip(client, auth, fmt):
+    headers, _ = auth
+    cards = [("Plain question", "Plain answer"), ('Quotes "and", commas', "Line one\nline two"), ("Unicode ✓", "Ünïcödé")]
+    upload(client, headers, cards, test="Source")
+    upload(client, headers, [("Plain question", "Already here")], test="Target")
+    tests = {test["name"]: test["id"] for test in client.get("/subjects", headers=headers).json()[0]["tests"]}
+
+    exported = client.get(f"/tests/{tests['Source']}/export", params={"format": fmt}, headers=headers)
+    assert exported.status_code == 200
+    files = {"file": (f"deck.{fmt}", io.BytesIO(exported.content), "application/octet-stream")}
+    result = client.post(f"/tests/{tests['Target']}/import", files=files, headers=headers).json()
+    assert result == {"staged": 3, "inserted": 2, "skipped": 1}
+
+    target = {card["front"]: card["back"] for card in deck(client, headers, tests["Target"])}
+    assert target == {"Plain question": "Already here", **dict(cards[1:])}
+
+
+def test_import_rejects_malformed_rows(client, auth):
+    headers, _ = auth
+    upload(client, headers, [("Question", "Answer")])
+    test_id = first_test(client, headers)["id"]
+    files = {"file": ("deck.ndjson", io.BytesIO(b'{"front": "no back"}\n'), "application/x-ndjson")}
+    assert client.post(f"/tests/{test_id}/import", files=files, headers=headers).status_code == 400
+
+
+# -------------------------
+# Review buffer
+# -------------------------
+def test_reviews_are_buffered_and_written_in_batches(client, auth, db):
+    headers, _ = auth
+    upload(client, headers, [("Question", "Answer")])
+    card_id = deck(client, headers, first_test(client, headers)["id"])[0]["id"]
+
+    events = [{"flashcard_id": card_id, "result": "correct", "latency_ms": 1200},
+              {"flashcard_id": card_id + 1000, "result": "incorrect", "latency_ms": 800}]
+    response = client.post("/reviews", json={"events": events}, headers=headers)
+    assert (response.status_code, response.json()) == (202, {"accepted": 2})
+
+    main.review_buffer.close()
+    rows = db.execute_query("SELECT flashcard_id, result, latency_ms FROM review_events")
+    # Events for cards the user doesn't own are discarded by the batch insert
+    assert [(row['flashcard_id'], row['result'], row['latency_ms']) for row in rows] == [(card_id, "correct", 1200)]
+
+
+def test_review_buffer_retries_a_failed_write():
+    from review_events import ReviewBuffer
+
+    written = []
+
+    def flaky_writer(rows):
+        if not written:
+            written.append(None)
+            raise RuntimeError("database unavailable")
+        written.extend(rows)
+        return len(rows)
+
+    buffer = ReviewBuffer(writer=flaky_writer, flush_seconds=0.01)
+    assert buffer.submit([(1, 1, "correct", 100, None)])
+    deadline = time.monotonic() + 5
+    while len(written) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    buffer.close()
+    assert written[1:] == [(1, 1, "correct", 100, None)]
+    assert not buffer.pending
+
+
+def test_review_buffer_gauge_tracks_requeued_and_dropped_events():
+    from metrics import REVIEW_BUFFER_PENDING
+    from review_events import ReviewBuffer
+
+    def failing_writer(rows):
+        raise RuntimeError("database unavailable")
+
+    buffer = ReviewBuffer(writer=failing_writer, flush_seconds=0.01)
+    assert buffer.submit([(1, 1, "correct", 100, None)] * 2)
+    deadline = time.monotonic() + 5
+    while not buffer.failures and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The failed batch is back in the buffer and still counted
+    assert REVIEW_BUFFER_PENDING.values[()] == 2
+    buffer.close(timeout=1)
+    assert REVIEW_BUFFER_PENDING.values[()] == 0
+
+
+def test_full_review_buffer_rejects_with_503(client, auth, monkeypatch):
+    headers, _ = auth
+    from review_events import ReviewBuffer
+
+    monkeypatch.setattr(main, "review_buffer", ReviewBuffer(max_pending=1))
+    events = [{"flashcard_id": 1, "result": "skipped", "latency_ms": 0}] * 2
+    response = client.post("/reviews", json={"events": events}, headers=headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+# -------------------------
+# Deck cache
+# -------------------------
+@pytest.fixture
+def memory_deck_cache(monkeypatch):
+    from deck_cache import deck_cache
+
+    monkeypatch.setattr(deck_cache, "backend", MemoryCache())
+    return deck_cache
+
+
+def test_deck_cache_is_invalidated_by_writes(client, auth, memory_deck_cache):
+    headers, _ = auth
+    upload(client, headers, [("Question", "Answer")])
+    test_id = first_test(client, headers)["id"]
+
+    first = client.get(f"/tests/{test_id}/flashcards", headers=headers)
+    hits = memory_deck_cache.hits
+    assert client.get(f"/tests/{test_id}/flashcards", headers=headers).content == first.content
+    assert memory_deck_cache.hits == hits + 1
+
+    card_id = json.loads(first.content)[0]["id"]
+    client.patch(f"/flashcards/{card_id}/mastered", json=True, headers=headers)
+    assert deck(client, headers, test_id)[0]["mastered"] is True
+
+    upload(client, headers, [("Second question", "Second answer")])
+    assert len(deck(client, headers, test_id)) == 2
+
+
+def test_deck_cache_only_stores_aligned_pages(client, auth, memory_deck_cache):
+    headers, _ = auth
+    upload(client, headers, [(f"Question {i}", "Answer") for i in range(5)])
+    test_id = first_test(client, headers)["id"]
+
+    for offset, limit in ((0, main.DECK_PAGE_SIZE), (3, main.DECK_PAGE_SIZE), (0, 2)):
+        page = client.get(f"/tests/{test_id}/flashcards", params={"offset": offset, "limit": limit}, headers=headers).json()
+        assert page["total"] == 5
+        assert len(page["cards"]) == min(limit, 5 - offset)
+
+    entries = memory_deck_cache.backend.entries
+    assert [list(fields) for fields in entries.values()] == [[f"0:{main.DECK_PAGE_SIZE}"]]
+
+
+def test_deck_of_another_user_is_not_found(client, auth, db):
+    headers, _ = auth
+    other_subject = db.insert_subject("Private", 1)
+    db.execute_query("INSERT INTO users (username, email, hashed_password) VALUES ('other', 'other@example.com', 'x')", fetch_all=False)
+    db.execute_query("UPDATE subjects SET user_id = 2 WHERE id = %s", (other_subject,), fetch_all=False)
+    test_id = db.insert_test("Secret", other_subject)
+    assert client.get(f"/tests/{test_id}/flashcards", headers=headers).status_code == 404
+
+
+# -------------------------
+# Response compression
+# -------------------------
+def test_compressible_responses_vary_on_accept_encoding(client, auth):
+    headers, _ = auth
+    upload(client, headers, [(f"Question {i}", "A fairly long answer " * 5) for i in range(50)])
+    test_id = first_test(client, headers)["id"]
+
+    compressed = client.get(f"/tests/{test_id}/flashcards", headers={**headers, "Accept-Encoding": "gzip"})
+    identity = client.get(f"/tests/{test_id}/flashcards", headers={**headers, "Accept-Encoding": "identity"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "content-encoding" not in identity.headers
+    assert compressed.json() == identity.json()
+    for response in (compressed, identity):
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    # Too small to compress for anyone, so nothing to vary on
+    small = client.get("/me", headers={**headers, "Accept-Encoding": "identity"})
+    assert "Accept-Encoding" not in small.headers.get("Vary", "")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Cold-start import budget for the API.
+Imports main.py in a fresh interpreter under `python -X importtime` and fails
+if it exceeds the budget or pulls in modules that should load on first use.
+
+Run: uv run python test_import_time.py
+"""
+
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "800"))
+
+# Loaded lazily by auth.py / database.py; importing main must not pull them in
+DEFERRED_MODULES = ("psycopg2", "passlib", "bcrypt", "jose", "cryptography", "fitz", "ollama", "numpy")
+
+def measure_imports(module="main"):
+    """Import a module in a fresh interpreter; return {module: (self_ms, cumulative_ms)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return timings
+
+def test_import_time_budget():
+    """Importing main stays within IMPORT_TIME_BUDGET_MS"""
+    timings = measure_imports()
+    total_ms = timings["main"][1]
+    print(f"⏱️  import main: {total_ms:.1f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    for name, (_, cumulative_ms) in sorted(timings.items(), key=lambda item: -item[1][1])[1:11]:
+        print(f"   {cumulative_ms:8.1f} ms  {name}")
+    assert total_ms <= IMPORT_TIME_BUDGET_MS, f"import main took {total_ms:.1f} ms, budget is {IMPORT_TIME_BUDGET_MS:.0f} ms"
+
+def test_heavy_modules_deferred():
+    """Importing main does not load the DB driver, password hashing, JWT or embedding libraries"""
+    loaded = {name.split(".")[0] for name in measure_imports()}
+    eager = sorted(loaded.intersection(DEFERRED_MODULES))
+    assert not eager, f"imported eagerly by main: {', '.join(eager)}"
+    print("✅ Heavy modules are deferred")
+
+if __name__ == "__main__":
+    failed = False
+    for test in (test_heavy_modules_deferred, test_import_time_budget):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"❌ {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
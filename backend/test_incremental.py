@@ -0,0 +1,49 @@
+"""
+Incremental re-imports against SQLite (see incremental.py).
+
+Run: uv run pytest test_incremental.py
+"""
+
+from incremental import incremental_import
+
+
+def deck(db, test_id):
+    rows = db.execute_query("SELECT id, front, back, mastered FROM flashcards WHERE test_id = %s ORDER BY id", (test_id,))
+    return {row['front']: row for row in rows}
+
+
+def generator(answers):
+    """Generate one card per chunk, answered from `answers` (chunk -> back)"""
+    return lambda chunk: [(f"What is {chunk.split()[0]}?", answers[chunk])]
+
+
+def test_changed_answer_updates_adopted_card(db):
+    chunks = ["alpha first version", "beta unchanged"]
+    answers = {"alpha first version": "old answer", "beta unchanged": "beta answer"}
+    incremental_import("Subject", "Test", chunks, generator(answers))
+    test_id = db.insert_test("Test", db.insert_subject("Subject", 1))
+
+    card = deck(db, test_id)["What is alpha?"]
+    db.execute_query("UPDATE flashcards SET mastered = TRUE WHERE id = %s", (card['id'],), fetch_all=False)
+
+    # The revised chunk regenerates the same question with a new answer
+    chunks = ["alpha second version", "beta unchanged"]
+    answers["alpha second version"] = "new answer"
+    stats = incremental_import("Subject", "Test", chunks, generator(answers))
+
+    updated = deck(db, test_id)["What is alpha?"]
+    assert updated['id'] == card['id']
+    assert updated['back'] == "new answer"
+    assert updated['mastered']
+    assert stats['chunks_reused'] == 1
+    assert stats['cards_updated'] == 1
+    assert stats['cards_retired'] == 0
+
+
+def test_failed_chunk_keeps_retired_cards(db):
+    incremental_import("Subject", "Test", ["alpha one", "beta two"], generator({"alpha one": "a", "beta two": "b"}))
+    test_id = db.insert_test("Test", db.insert_subject("Subject", 1))
+
+    stats = incremental_import("Subject", "Test", ["alpha one", "gamma three"], lambda chunk: [])
+    assert stats['chunks_failed'] == 1
+    assert set(deck(db, test_id)) == {"What is alpha?", "What is beta?"}
@@ -0,0 +1,135 @@
+"""
+Persistent page-level cache for text extracted from PDFs.
+
+Pages are keyed by the SHA-256 of the file's content and the page number, so
+re-running an import on an unchanged PDF (e.g. while tuning --chunk_size or
+--model) skips pdfplumber entirely, and a partially cached file only extracts
+the missing pages. The cache lives in a local SQLite file and is capped in size,
+evicting least recently used pages first.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+TEXT_CACHE_PATH = os.getenv("TEXT_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pdf_text.db"))
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+
+def get_cache_connection(path: str = None) -> sqlite3.Connection:
+    """
+    Open the cache database, creating it if needed.
+
+    Args:
+        path: Cache file path (defaults to TEXT_CACHE_PATH)
+
+    Returns:
+        SQLite connection
+    """
+    path = path or TEXT_CACHE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS files (
+        file_hash TEXT PRIMARY KEY,
+        page_count INTEGER NOT NULL
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS pages (
+        file_hash TEXT NOT NULL,
+        page_number INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (file_hash, page_number)
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_last_used ON pages (last_used)")
+    return conn
+
+
+def file_content_hash(source: Union[str, BinaryIO]) -> str:
+    """
+    Hash a file path or binary stream by content.
+
+    Args:
+        source: Path to a file, or a seekable binary stream (rewound afterwards)
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def get_cached_pages(file_hash: str, path: str = None) -> Tuple[Optional[int], Dict[int, str]]:
+    """
+    Look up the cached pages of a file and mark them as recently used.
+
+    Args:
+        file_hash: Content hash of the PDF
+        path: Cache file path
+
+    Returns:
+        Tuple of (page count or None if the file was never seen, page number -> text)
+    """
+    conn = get_cache_connection(path)
+    try:
+        row = conn.execute("SELECT page_count FROM files WHERE file_hash = ?", (file_hash,)).fetchone()
+        if row is None:
+            return None, {}
+        pages = dict(conn.execute("SELECT page_number, text FROM pages WHERE file_hash = ?", (file_hash,)).fetchall())
+        conn.execute("UPDATE pages SET last_used = ? WHERE file_hash = ?", (time.time(), file_hash))
+        conn.commit()
+        return row[0], pages
+    finally:
+        conn.close()
+
+
+def store_cached_pages(file_hash: str, page_count: int, pages: Dict[int, str], path: str = None,
+                       max_bytes: int = None):
+    """
+    Store extracted pages and evict least recently used pages over the size cap.
+
+    Args:
+        file_hash: Content hash of the PDF
+        page_count: Total number of pages in the PDF
+        pages: Page number -> extracted text ("" for pages without text)
+        path: Cache file path
+        max_bytes: Size cap in bytes of stored text (defaults to TEXT_CACHE_MAX_BYTES)
+    """
+    max_bytes = TEXT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    conn = get_cache_connection(path)
+    try:
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO files (file_hash, page_count) VALUES (?, ?)", (file_hash, page_count))
+        conn.executemany(
+            "INSERT OR REPLACE INTO pages (file_hash, page_number, text, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(file_hash, number, text, len(text.encode("utf-8")), now) for number, text in pages.items()],
+        )
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total > max_bytes:
+            to_free = total - max_bytes
+            evict = []
+            for rowid, size in conn.execute("SELECT rowid, size FROM pages ORDER BY last_used"):
+                if to_free <= 0:
+                    break
+                evict.append((rowid,))
+                to_free -= size
+            conn.executemany("DELETE FROM pages WHERE rowid = ?", evict)
+            conn.execute("DELETE FROM files WHERE file_hash NOT IN (SELECT DISTINCT file_hash FROM pages)")
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,232 @@
+"""
+Memory-mapped float32 vector index for semantic search.
+
+Vectors live in an append-only file per embedding model under
+EMBEDDING_INDEX_DIR (default backend/.cache/embeddings, or the temp directory on
+Vercel where the bundle is read-only), memory-mapped so a process only pages in
+what it scans and several workers on one host share the page cache. Before each
+query the index pulls rows added to flashcard_embeddings since its last sync,
+so the database stays the source of truth and the files can be deleted at any
+time.
+
+Sequence numbers are allocated when a row is inserted but become visible when
+its transaction commits, so concurrent writers (parallel uploads, a running
+backfill) can commit a lower seq after a higher one was synced. Every
+SYNC_RESCAN_SECONDS the index also compares the last SYNC_RESCAN_SEQS sequence
+numbers with the ones it holds and appends any it missed.
+
+Queries are a blocked matrix-vector product (cosine similarity on unit-length
+rows) masked to the user's cards, followed by an argpartition top-k.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# The deployed bundle is read-only on Vercel; only the temp directory is writable there
+DEFAULT_INDEX_DIR = (os.path.join(tempfile.gettempdir(), "studybuddy-embeddings") if os.getenv("VERCEL")
+                     else os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings"))
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", DEFAULT_INDEX_DIR)
+SYNC_BATCH = 5000
+# Late commits are looked for this far behind the newest synced seq, at most this often
+SYNC_RESCAN_SEQS = int(os.getenv("EMBEDDING_SYNC_RESCAN_SEQS", "20000"))
+SYNC_RESCAN_SECONDS = float(os.getenv("EMBEDDING_SYNC_RESCAN_SECONDS", "10"))
+SCAN_BLOCK_ROWS = 32768
+
+logger = logging.getLogger("studybuddy.vector_index")
+
+
+class VectorIndex:
+    def __init__(self, model: str, directory: str = EMBEDDING_INDEX_DIR):
+        slug = re.sub(r"[^\w.-]+", "_", model)
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            fallback = os.path.join(tempfile.gettempdir(), "studybuddy-embeddings")
+            logger.warning("Embedding index directory %s is not writable (%s); using %s", directory, e, fallback)
+            directory = fallback
+            os.makedirs(directory, exist_ok=True)
+        self.model = model
+        self.paths = {name: os.path.join(directory, f"{slug}.{name}") for name in ("vectors", "ids", "users", "meta", "lock")}
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.dim = 0
+        self.count = 0
+        self.last_seq = 0
+        # Seqs appended within SYNC_RESCAN_SEQS of last_seq, so a rescan can tell which ones are missing
+        self.recent_seqs = set()
+        self.rescanned_at = float("-inf")
+        self.vectors: Optional[np.ndarray] = None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.users = np.zeros(0, dtype=np.int64)
+        self.live = np.zeros(0, dtype=bool)
+        self.positions: Dict[int, int] = {}
+
+    def read_meta(self) -> Dict:
+        try:
+            with open(self.paths["meta"]) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'dim': 0, 'count': 0, 'last_seq': 0, 'recent_seqs': []}
+
+    def load(self):
+        """Pick up rows appended to the files (by this or another process) since the last load"""
+        meta = self.read_meta()
+        if meta['count'] < self.count or (self.dim and meta['dim'] != self.dim):
+            # Files were deleted or rebuilt underneath us: start over
+            self.reset()
+        if meta['count'] > self.count:
+            start, end = self.count, meta['count']
+            new_ids = np.fromfile(self.paths["ids"], dtype=np.int64, count=end - start, offset=start * 8)
+            new_users = np.fromfile(self.paths["users"], dtype=np.int64, count=end - start, offset=start * 8)
+            self.track(new_ids, new_users)
+            self.dim = meta['dim']
+            self.count = end
+            self.vectors = np.memmap(self.paths["vectors"], dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        self.last_seq = max(self.last_seq, meta['last_seq'])
+        self.recent_seqs.update(meta.get('recent_seqs', []))
+
+    def track(self, new_ids: np.ndarray, new_users: np.ndarray):
+        """Append id/owner arrays; a re-embedded card supersedes its older row"""
+        base = len(self.ids)
+        self.ids = np.concatenate([self.ids, new_ids])
+        self.users = np.concatenate([self.users, new_users])
+        self.live = np.concatenate([self.live, np.ones(len(new_ids), dtype=bool)])
+        for offset, card_id in enumerate(new_ids.tolist()):
+            previous = self.positions.get(card_id)
+            if previous is not None:
+                self.live[previous] = False
+            self.positions[card_id] = base + offset
+
+    def append_rows(self, rows: List[Dict]):
+        """Append flashcard_embeddings rows (see `append`)"""
+        if not rows:
+            return
+        self.append(
+            np.array([row['flashcard_id'] for row in rows], dtype=np.int64),
+            np.array([row['user_id'] for row in rows], dtype=np.int64),
+            np.vstack([np.frombuffer(row['vector'], dtype=np.float32) for row in rows]),
+            [row['seq'] for row in rows],
+        )
+
+    def append(self, ids: np.ndarray, users: np.ndarray, vectors: np.ndarray, seqs: Sequence[int]):
+        """Append rows to the files; the caller holds the file lock and has called load()"""
+        if len(ids) == 0:
+            return
+        last_seq = max(self.last_seq, max(seqs))
+        recent_seqs = sorted(seq for seq in self.recent_seqs.union(seqs) if seq > last_seq - SYNC_RESCAN_SEQS)
+        if self.dim and vectors.shape[1] != self.dim:
+            raise ValueError(f"Index for {self.model} holds {self.dim}-dim vectors, got {vectors.shape[1]}")
+        for name, array in (("vectors", vectors.astype(np.float32)), ("ids", ids.astype(np.int64)), ("users", users.astype(np.int64))):
+            row_bytes = array.itemsize * (array.shape[1] if array.ndim == 2 else 1)
+            with open(self.paths[name], "ab") as f:
+                # Drop any tail left by an append that crashed before updating meta
+                f.truncate(self.count * row_bytes)
+                f.write(np.ascontiguousarray(array).tobytes())
+        # Written last, so a crash mid-append leaves the previous count authoritative
+        with open(self.paths["meta"] + ".tmp", "w") as f:
+            json.dump({'dim': vectors.shape[1], 'count': self.count + len(ids), 'last_seq': last_seq, 'recent_seqs': recent_seqs}, f)
+        os.replace(self.paths["meta"] + ".tmp", self.paths["meta"])
+        self.recent_seqs = set(recent_seqs)
+        self.load()
+
+    def sync(self):
+        """Append vectors stored in the database since the last sync, and ones that committed late"""
+        from database import get_flashcard_embeddings_since
+
+        with self.lock, open(self.paths["lock"], "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.load()
+            if time.monotonic() - self.rescanned_at >= SYNC_RESCAN_SECONDS:
+                self.rescan()
+            while True:
+                rows = get_flashcard_embeddings_since(self.model, self.last_seq, SYNC_BATCH)
+                if not rows:
+                    break
+                self.append_rows(rows)
+                if len(rows) < SYNC_BATCH:
+                    break
+
+    def rescan(self):
+        """Append rows behind last_seq that were not committed yet when their seq range was synced"""
+        from database import get_flashcard_embedding_seqs, get_flashcard_embeddings_by_seq
+
+        stored = get_flashcard_embedding_seqs(self.model, max(self.last_seq - SYNC_RESCAN_SEQS, 0), self.last_seq)
+        missed = sorted(seq for seq in stored if seq not in self.recent_seqs)
+        for start in range(0, len(missed), SYNC_BATCH):
+            self.append_rows(get_flashcard_embeddings_by_seq(self.model, missed[start:start + SYNC_BATCH]))
+        self.rescanned_at = time.monotonic()
+
+    def vector_for(self, card_id: int) -> Optional[np.ndarray]:
+        with self.lock:
+            position = self.positions.get(card_id)
+            return None if position is None else np.array(self.vectors[position])
+
+    def search(self, query: np.ndarray, user_id: int, k: int = 10, exclude: Tuple[int, ...] = ()) -> List[Tuple[int, float]]:
+        """
+        Find the user's cards most similar to a query vector.
+
+        Args:
+            query: Unit-length query vector
+            user_id: Only this user's cards are considered
+            k: Number of results
+            exclude: Card IDs to leave out (e.g. the card itself for related-card lookup)
+
+        Returns:
+            (flashcard_id, cosine similarity) pairs, best first
+        """
+        with self.lock:
+            return self.search_locked(query, user_id, k, exclude)
+
+    def search_locked(self, query: np.ndarray, user_id: int, k: int, exclude: Tuple[int, ...]) -> List[Tuple[int, float]]:
+        if self.count == 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        mask = self.live & (self.users == user_id)
+        if exclude:
+            mask &= ~np.isin(self.ids, np.asarray(exclude, dtype=np.int64))
+        if not mask.any():
+            return []
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) * 4 < self.count:
+            # Few candidates: gather just their rows rather than scanning the whole file
+            positions = candidates
+            scores = np.concatenate([
+                self.vectors[candidates[i:i + SCAN_BLOCK_ROWS]] @ query for i in range(0, len(candidates), SCAN_BLOCK_ROWS)
+            ])
+        else:
+            positions = np.arange(self.count)
+            scores = np.empty(self.count, dtype=np.float32)
+            for start in range(0, self.count, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, self.count)
+                scores[start:end] = self.vectors[start:end] @ query
+            scores[~mask] = -np.inf
+
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[positions[i]]), float(scores[i])) for i in top]
+
+
+indexes: Dict[str, VectorIndex] = {}
+indexes_lock = threading.Lock()
+
+
+def get_index(model: str) -> VectorIndex:
+    """Get this process's index for an embedding model, synced with the database"""
+    with indexes_lock:
+        index = indexes.get(model)
+        if index is None:
+            index = indexes[model] = VectorIndex(model)
+    index.sync()
+    return index
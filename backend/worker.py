@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Distributed flashcard generation worker for StudyBuddy.
+
+Chunks are enqueued with `import_pdf.py --enqueue` or uploaded through
+`POST /imports` (which the worker extracts and chunks first); any number of workers,
+on any number of machines pointed at the same DATABASE_URL, claim them with
+`SELECT ... FOR UPDATE SKIP LOCKED` and write the generated cards back.
+
+Usage:
+    uv run python worker.py run --model llama3.1
+    uv run python worker.py status [--job_id 3]
+"""
+
+import argparse
+import io
+import os
+import socket
+import sys
+import time
+from database import (
+    claim_document_import_job,
+    get_import_job_document,
+    add_import_chunks,
+    fail_document_import_job,
+    reap_expired_import_jobs,
+    record_worker_heartbeat,
+    claim_import_chunk,
+    complete_import_chunk,
+    fail_import_chunk,
+    reap_expired_import_chunks,
+    get_import_job_status,
+    get_existing_flashcard_fronts,
+    insert_flashcards,
+)
+from import_pdf import check_ollama_available, parse_flashcards, extract_pages_from_pdf
+from chunking import chunk_text_intelligently
+from filtering import strip_boilerplate, dedupe_chunks, print_filter_report
+
+# Cards embedded per idle pass when EMBEDDINGS_ENABLED=1 (new cards are never embedded on the request path)
+EMBED_PASS_LIMIT = 256
+
+# How often a running worker records that it is alive (POST /imports refuses uploads when none is)
+HEARTBEAT_SECONDS = 30.0
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# -------------------------
+# Extract and chunk an uploaded document
+# -------------------------
+def process_document(job: dict, worker_id: str) -> int:
+    """Turn an uploaded document into queued chunks and return how many were queued"""
+    document = get_import_job_document(job['id'], worker_id)
+    if document is None:
+        print(f"⚠️  Lease on import job {job['id']} expired before its document was read")
+        return 0
+    try:
+        boilerplate_stats = {}
+        if (job['source'] or '').lower().endswith('.pdf'):
+            pages, boilerplate_stats = strip_boilerplate(extract_pages_from_pdf(io.BytesIO(document)))
+            text = "".join(page_text + "\n" for page_text in pages)
+        else:
+            text = document.decode('utf-8')
+        if not text.strip():
+            raise Exception("no text found in document")
+
+        chunks = list(chunk_text_intelligently(text, job['chunk_size'] or 1000, job['overlap_size'] or 100))
+        chunks, dedupe_stats = dedupe_chunks(chunks)
+        print_filter_report(boilerplate_stats, dedupe_stats)
+    except Exception as e:
+        fail_document_import_job(job['id'], str(e))
+        print(f"❌ Import job {job['id']} ({job['source']}) failed during extraction: {e}")
+        return 0
+
+    if not add_import_chunks(job['id'], worker_id, chunks):
+        print(f"⚠️  Lease on import job {job['id']} expired before extraction finished")
+        return 0
+    print(f"📄 Import job {job['id']} ({job['source']}): queued {len(chunks)} chunks")
+    return len(chunks)
+
+# -------------------------
+# Process a single claimed chunk
+# -------------------------
+def process_chunk(chunk: dict, worker_id: str, model: str = None, max_attempts: int = 3) -> int:
+    """Generate cards for a claimed chunk and return how many were inserted"""
+    try:
+        flashcards = parse_flashcards(chunk['content'], model=model or chunk['model'])
+        if not flashcards:
+            raise Exception("no flashcards generated")
+
+        existing_fronts = get_existing_flashcard_fronts(chunk['test_id'])
+        new_cards = []
+        for front, back in flashcards:
+            if front not in existing_fronts:
+                existing_fronts.add(front)
+                new_cards.append((front, back))
+
+        insert_flashcards(chunk['test_id'], new_cards, import_job_id=chunk['job_id'])
+    except Exception as e:
+        fail_import_chunk(chunk['id'], worker_id, str(e), max_attempts)
+        print(f"❌ Chunk {chunk['job_id']}/{chunk['chunk_index']} failed (attempt {chunk['attempts']}): {e}")
+        return 0
+
+    if not complete_import_chunk(chunk['id'], worker_id, len(new_cards)):
+        print(f"⚠️  Lease on chunk {chunk['job_id']}/{chunk['chunk_index']} expired before completion")
+    else:
+        print(f"✅ Chunk {chunk['job_id']}/{chunk['chunk_index']}: added {len(new_cards)} flashcards "
+              f"(skipped {len(flashcards) - len(new_cards)} duplicates)")
+    return len(new_cards)
+
+# -------------------------
+# Embed cards added since the last pass
+# -------------------------
+def embed_new_cards(limit: int = EMBED_PASS_LIMIT) -> int:
+    """Embed up to `limit` cards that have no vector yet (EMBEDDINGS_ENABLED=1) and return how many were embedded"""
+    if os.getenv("EMBEDDINGS_ENABLED", "0") != "1":
+        return 0
+    try:
+        # Imported here: numpy is the optional embeddings extra
+        from embeddings import backfill
+        return backfill(limit=limit)
+    except Exception as e:
+        print(f"⚠️  Embedding new cards failed (retrying when idle again): {e}")
+        return 0
+
+# -------------------------
+# Worker loop
+# -------------------------
+def run_worker(worker_id: str, model: str = None, lease_seconds: int = 600, max_attempts: int = 3,
+               poll_interval: float = 5.0, exit_when_empty: bool = False):
+    print(f"👷 Worker {worker_id} started (lease {lease_seconds}s, max {max_attempts} attempts)")
+    last_heartbeat = float("-inf")
+    while True:
+        if time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+            record_worker_heartbeat(worker_id)
+            last_heartbeat = time.monotonic()
+
+        job = claim_document_import_job(worker_id, lease_seconds, max_attempts)
+        if job is not None:
+            process_document(job, worker_id)
+            continue
+
+        chunk = claim_import_chunk(worker_id, lease_seconds, max_attempts)
+        if chunk is None:
+            reaped = reap_expired_import_chunks(max_attempts)
+            if reaped:
+                print(f"🧹 Marked {reaped} abandoned chunks as failed")
+            reaped = reap_expired_import_jobs(max_attempts)
+            if reaped:
+                print(f"🧹 Marked {reaped} documents that crashed extraction as failed")
+            if embed_new_cards():
+                continue
+            if exit_when_empty:
+                print("Queue is empty, exiting.")
+                return
+            time.sleep(poll_interval)
+            continue
+
+        process_chunk(chunk, worker_id, model, max_attempts)
+
+# -------------------------
+# Status report
+# -------------------------
+def print_status(job_id: int = None):
+    jobs = get_import_job_status(job_id)
+    if not jobs:
+        print("No import jobs found.")
+        return
+
+    print(f"{'job':>5} {'test':>5} {'status':>10} {'total':>6} {'pending':>8} {'running':>8} {'expired':>8} {'done':>6} {'failed':>7} {'cards':>7}  source")
+    for job in jobs:
+        print(f"{job['id']:>5} {job['test_id']:>5} {job['status']:>10} {job['total']:>6} {job['pending']:>8} {job['running']:>8} "
+              f"{job['expired']:>8} {job['done']:>6} {job['failed']:>7} {job['cards_created']:>7}  {job['source'] or ''}")
+
+# -------------------------
+# Main CLI
+# -------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Distributed flashcard generation worker")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Claim and process queued chunks")
+    run_parser.add_argument("--model", default=None, help="Override the Ollama model recorded on the job")
+    run_parser.add_argument("--worker_id", default=default_worker_id(), help="Identifier recorded on claimed chunks")
+    run_parser.add_argument("--lease_seconds", type=int, default=600, help="Seconds before a claimed chunk can be reclaimed")
+    run_parser.add_argument("--max_attempts", type=int, default=3, help="Attempts before a chunk or uploaded document is marked failed")
+    run_parser.add_argument("--poll_interval", type=float, default=5.0, help="Seconds to sleep when the queue is empty")
+    run_parser.add_argument("--exit_when_empty", action="store_true", help="Stop once no work is left")
+
+    status_parser = subparsers.add_parser("status", help="Show import job progress")
+    status_parser.add_argument("--job_id", type=int, default=None, help="Only show this job")
+
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print_status(args.job_id)
+        return
+
+    print("🔍 Checking if Ollama is available...")
+    if not check_ollama_available():
+        sys.exit(1)
+
+    try:
+        run_worker(args.worker_id, args.model, args.lease_seconds, args.max_attempts,
+                   args.poll_interval, args.exit_when_empty)
+    except KeyboardInterrupt:
+        print("\nWorker stopped.")
+
+if __name__ == "__main__":
+    main()
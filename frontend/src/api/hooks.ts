@@ -3,4 +3,8 @@ export {
   useTests,
   useFlashcards,
   useUpdateMastery,
+  useSearchFlashcards,
+  useRecordReview,
 } from "./index";
+export { FLASHCARD_PAGE_SIZE, rememberReadAfter } from "./index";
+export type { DeckCounts, Flashcard, FlashcardPage, ReviewResult, SubjectSummary, TestSummary } from "./index";
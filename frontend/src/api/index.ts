@@ -1,77 +1,218 @@
-import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation, useQuery, useQueryClient, type InfiniteData } from "@tanstack/react-query";
 
 // Get API base URL from environment variable or fallback to localhost
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localhost:8000";
 
+// WAL position of this browser's last write, sent back so the API only reads from replicas that have it
+const READ_AFTER_HEADER = 'X-Read-After';
+
+// Compare two PostgreSQL LSNs ("16/B374D848")
+const lsnAfter = (a: string, b: string | null): boolean => {
+  if (!b) return true;
+  const [aHigh, aLow] = a.split('/').map((part) => parseInt(part, 16));
+  const [bHigh, bLow] = b.split('/').map((part) => parseInt(part, 16));
+  return aHigh !== bHigh ? aHigh > bHigh : aLow > bLow;
+};
+
+// Keep the newest X-Read-After a write response carried (shared across tabs, like the token)
+export const rememberReadAfter = (res: Response): Response => {
+  const position = res.headers.get(READ_AFTER_HEADER);
+  if (position && lsnAfter(position, localStorage.getItem('readAfter'))) {
+    localStorage.setItem('readAfter', position);
+  }
+  return res;
+};
+
 // Helper function to get auth headers
-const getAuthHeaders = () => {
+const getAuthHeaders = (): Record<string, string> => {
   const token = localStorage.getItem('token');
+  const readAfter = localStorage.getItem('readAfter');
   return {
     'Authorization': token ? `Bearer ${token}` : '',
     'Content-Type': 'application/json',
+    ...(readAfter ? { [READ_AFTER_HEADER]: readAfter } : {}),
   };
 };
 
-// Fetch subjects
+// Card counts kept up to date by the backend (due = not yet mastered)
+export interface DeckCounts {
+  card_count: number;
+  mastered_count: number;
+  due_count: number;
+}
+
+export interface TestSummary extends DeckCounts {
+  id: number;
+  subject_id: number;
+  name: string;
+}
+
+export interface SubjectSummary extends DeckCounts {
+  id: number;
+  name: string;
+  tests: TestSummary[];
+}
+
+const fetchSubjects = (): Promise<SubjectSummary[]> =>
+  fetch(`${API_BASE_URL}/subjects`, {
+    headers: getAuthHeaders(),
+  }).then((res) => {
+    if (!res.ok) throw new Error('Failed to fetch subjects');
+    return res.json();
+  });
+
+// Fetch subjects, each with its tests and card counts
 export const useSubjects = () =>
   useQuery({
     queryKey: ["subjects"],
-    queryFn: () =>
-      fetch(`${API_BASE_URL}/subjects`, {
-        headers: getAuthHeaders(),
-      }).then((res) => {
-        if (!res.ok) throw new Error('Failed to fetch subjects');
-        return res.json();
-      }),
+    queryFn: fetchSubjects,
   });
 
-// Fetch tests for a subject
+// Tests for a subject, read from the subjects tree (no extra request)
 export const useTests = (subjectId: number) =>
   useQuery({
-    queryKey: ["tests", subjectId],
-    queryFn: () =>
-      fetch(`${API_BASE_URL}/subjects/${subjectId}/tests`, {
-        headers: getAuthHeaders(),
-      }).then((res) => {
-        if (!res.ok) throw new Error('Failed to fetch tests');
-        return res.json();
-      }),
-    enabled: !!subjectId, // only fetch if subjectId exists
+    queryKey: ["subjects"],
+    queryFn: fetchSubjects,
+    select: (subjects: SubjectSummary[]) =>
+      subjects.find((s) => s.id === subjectId)?.tests ?? [],
+    enabled: !!subjectId, // only needed once a subject is selected
   });
 
-// Fetch flashcards for a test
+export interface Flashcard {
+  id: number;
+  test_id: number;
+  front: string;
+  back: string;
+  mastered: boolean;
+}
+
+// One page of a deck, in card order
+export interface FlashcardPage {
+  total: number;
+  offset: number;
+  cards: Flashcard[];
+}
+
+export const FLASHCARD_PAGE_SIZE = 200;
+
+// Fetch a test's flashcards a page at a time (fetchNextPage loads the next one)
 export const useFlashcards = (testId: number) =>
-  useQuery({
+  useInfiniteQuery({
     queryKey: ["flashcards", testId],
-    queryFn: () =>
-      fetch(`${API_BASE_URL}/tests/${testId}/flashcards`, {
+    queryFn: ({ pageParam }): Promise<FlashcardPage> =>
+      fetch(`${API_BASE_URL}/tests/${testId}/flashcards?offset=${pageParam}&limit=${FLASHCARD_PAGE_SIZE}`, {
         headers: getAuthHeaders(),
       }).then((res) => {
         if (!res.ok) throw new Error('Failed to fetch flashcards');
         return res.json();
       }),
+    initialPageParam: 0,
+    getNextPageParam: (lastPage: FlashcardPage) => {
+      const next = lastPage.offset + lastPage.cards.length;
+      return lastPage.cards.length > 0 && next < lastPage.total ? next : undefined;
+    },
     enabled: !!testId,
   });
 
-// ... your existing useSubjects, useTests, useFlashcards
+// Apply a card's new mastery to the subjects tree counts
+const adjustMasteredCounts = (subjects: SubjectSummary[], testId: number, delta: number): SubjectSummary[] =>
+  subjects.map((subject) => {
+    if (!subject.tests.some((test) => test.id === testId)) return subject;
+    return {
+      ...subject,
+      mastered_count: subject.mastered_count + delta,
+      due_count: subject.due_count - delta,
+      tests: subject.tests.map((test) =>
+        test.id === testId
+          ? { ...test, mastered_count: test.mastered_count + delta, due_count: test.due_count - delta }
+          : test
+      ),
+    };
+  });
+
+type MasteryUpdate = { flashcardId: number; mastered: boolean };
 
-// Update flashcard mastery
+// Update flashcard mastery; the cached pages and counts change right away and roll back if the request fails
 export const useUpdateMastery = () => {
   const queryClient = useQueryClient();
 
   return useMutation({
-    mutationFn: ({ flashcardId, mastered }: { flashcardId: number; mastered: boolean }) =>
+    mutationFn: ({ flashcardId, mastered }: MasteryUpdate) =>
       fetch(`${API_BASE_URL}/flashcards/${flashcardId}/mastered`, {
         method: "PATCH",
         headers: getAuthHeaders(),
         body: JSON.stringify(mastered),
-      }).then((res) => {
+      }).then(rememberReadAfter).then((res) => {
         if (!res.ok) throw new Error('Failed to update flashcard');
         return res.json();
       }),
-    onSuccess: () => {
-      // Invalidate all flashcards queries to refetch the updated data
-      queryClient.invalidateQueries({ queryKey: ["flashcards"] });
+    onMutate: async ({ flashcardId, mastered }: MasteryUpdate) => {
+      // Keep in-flight page loads from overwriting the optimistic update
+      await queryClient.cancelQueries({ queryKey: ["flashcards"] });
+      const previousFlashcards = queryClient.getQueriesData<InfiniteData<FlashcardPage>>({ queryKey: ["flashcards"] });
+      const previousSubjects = queryClient.getQueryData<SubjectSummary[]>(["subjects"]);
+
+      const changed = previousFlashcards
+        .flatMap(([, data]) => data?.pages ?? [])
+        .flatMap((page) => page.cards)
+        .find((card) => card.id === flashcardId && card.mastered !== mastered);
+      queryClient.setQueriesData<InfiniteData<FlashcardPage>>({ queryKey: ["flashcards"] }, (data) => {
+        if (!data) return data;
+        return {
+          ...data,
+          pages: data.pages.map((page) => {
+            const index = page.cards.findIndex((card) => card.id === flashcardId);
+            if (index === -1) return page;
+            const cards = page.cards.slice();
+            cards[index] = { ...cards[index], mastered };
+            return { ...page, cards };
+          }),
+        };
+      });
+      if (changed && previousSubjects) {
+        queryClient.setQueryData(["subjects"], adjustMasteredCounts(previousSubjects, changed.test_id, mastered ? 1 : -1));
+      }
+      return { previousFlashcards, previousSubjects };
+    },
+    onError: (_error, _update, context) => {
+      context?.previousFlashcards.forEach(([queryKey, data]) => queryClient.setQueryData(queryKey, data));
+      if (context?.previousSubjects) {
+        queryClient.setQueryData(["subjects"], context.previousSubjects);
+      }
     },
   });
 };
+
+// Full-text search across all of the user's flashcards
+export const useSearchFlashcards = (query: string, limit = 20, offset = 0) =>
+  useQuery({
+    queryKey: ["search", query, limit, offset],
+    queryFn: () =>
+      fetch(
+        `${API_BASE_URL}/search?${new URLSearchParams({ q: query, limit: String(limit), offset: String(offset) })}`,
+        { headers: getAuthHeaders() }
+      ).then((res) => {
+        if (!res.ok) throw new Error('Failed to search flashcards');
+        return res.json();
+      }),
+    enabled: query.trim().length > 0,
+  });
+
+export type ReviewResult = "correct" | "incorrect" | "skipped";
+
+// Record a study review; fire-and-forget, the server buffers and writes in batches
+export const useRecordReview = () =>
+  useMutation({
+    mutationFn: (event: { flashcardId: number; result: ReviewResult; latencyMs: number }) =>
+      fetch(`${API_BASE_URL}/reviews`, {
+        method: "POST",
+        headers: getAuthHeaders(),
+        body: JSON.stringify({
+          events: [{ flashcard_id: event.flashcardId, result: event.result, latency_ms: Math.round(event.latencyMs) }],
+        }),
+        keepalive: true, // still delivered if the page is closed mid-session
+      }).then((res) => {
+        if (!res.ok) throw new Error('Failed to record review');
+        return res.json();
+      }),
+  });
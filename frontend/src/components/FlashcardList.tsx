@@ -1,36 +1,139 @@
-import { type FC } from "react";
+import { type FC, memo, useCallback, useEffect, useState } from "react";
 import { Link } from "react-router-dom";
 import { Button } from "./ui/button";
-import { useUpdateMastery } from "../api/hooks";
+import { useUpdateMastery, type Flashcard } from "../api/hooks";
 
-interface Flashcard {
-  id: number;
-  front: string;
-  back: string;
-  mastered: boolean;
-}
+// Rows have a fixed height so only the ones in view need to be rendered
+const ROW_HEIGHT = 72;
+// Rows rendered above and below the visible ones, so fast scrolling doesn't show gaps
+const OVERSCAN = 8;
+// Start loading the next page when the visible rows get this close to the last loaded card
+const LOAD_AHEAD = 40;
 
 interface FlashcardListProps {
   flashcards: Flashcard[];
+  totalCount: number;
+  hasMore: boolean;
+  isLoadingMore: boolean;
+  onLoadMore: () => void;
   subjectName: string;
   testName: string;
   onStudy: (startIndex: number) => void;
   onBack: () => void;
 }
 
+// Range of row indexes [start, end) visible in a scroll container, plus overscan
+const useVisibleRows = (container: HTMLDivElement | null, rowCount: number) => {
+  const [scrollTop, setScrollTop] = useState(0);
+  const [viewportHeight, setViewportHeight] = useState(0);
+
+  useEffect(() => {
+    if (!container) return;
+    const onScroll = () => setScrollTop(container.scrollTop);
+    const observer = new ResizeObserver(() => setViewportHeight(container.clientHeight));
+    setViewportHeight(container.clientHeight);
+    container.addEventListener("scroll", onScroll, { passive: true });
+    observer.observe(container);
+    return () => {
+      container.removeEventListener("scroll", onScroll);
+      observer.disconnect();
+    };
+  }, [container]);
+
+  const start = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+  const end = Math.min(rowCount, Math.ceil((scrollTop + viewportHeight) / ROW_HEIGHT) + OVERSCAN);
+  return { start, end };
+};
+
+interface FlashcardRowProps {
+  card: Flashcard;
+  index: number;
+  onStudy: (startIndex: number) => void;
+  onUnmaster: (e: React.MouseEvent, cardId: number) => void;
+}
+
+// Memoized: a mastery change or a new page only re-renders the rows whose card changed
+const FlashcardRow = memo(function FlashcardRow({ card, index, onStudy, onUnmaster }: FlashcardRowProps) {
+  return (
+    <div
+      className="absolute left-0 right-0 flex items-center gap-3 px-4 border-b hover:bg-muted/50 transition-colors cursor-pointer"
+      style={{ top: index * ROW_HEIGHT, height: ROW_HEIGHT }}
+      onClick={() => onStudy(index)}
+    >
+      <div className="flex-1 min-w-0">
+        <p className="font-medium text-sm sm:text-base truncate" title={card.front}>
+          {card.front}
+        </p>
+      </div>
+
+      <div className="flex items-center gap-2 shrink-0">
+        <span className={`inline-flex items-center px-2 py-1 rounded-full text-xs font-medium ${
+          card.mastered 
+            ? "bg-green-100 text-green-800 dark:bg-green-900 dark:text-green-200" 
+            : "bg-red-100 text-red-800 dark:bg-red-900 dark:text-red-200"
+        }`}>
+          {card.mastered ? "✅ Mastered" : "❌ Not Mastered"}
+        </span>
+
+        {card.mastered && (
+          <Button
+            variant="outline"
+            size="sm"
+            onClick={(e) => onUnmaster(e, card.id)}
+            className="text-xs"
+          >
+            Unmaster
+          </Button>
+        )}
+      </div>
+    </div>
+  );
+});
+
 const FlashcardList: FC<FlashcardListProps> = ({
   flashcards,
+  totalCount,
+  hasMore,
+  isLoadingMore,
+  onLoadMore,
   subjectName,
   testName,
   onStudy,
   onBack,
 }) => {
   const { mutate: updateMastery } = useUpdateMastery();
+  const [container, setContainer] = useState<HTMLDivElement | null>(null);
+
+  // The scroll height covers the whole deck; rows past the loaded pages show placeholders
+  const rowCount = Math.max(totalCount, flashcards.length);
+  const { start, end } = useVisibleRows(container, rowCount);
+
+  useEffect(() => {
+    if (hasMore && end + LOAD_AHEAD > flashcards.length) {
+      onLoadMore();
+    }
+  }, [hasMore, end, flashcards.length, onLoadMore]);
 
-  const handleUnmaster = (e: React.MouseEvent, cardId: number) => {
+  const handleUnmaster = useCallback((e: React.MouseEvent, cardId: number) => {
     e.stopPropagation(); // Prevent row click
     updateMastery({ flashcardId: cardId, mastered: false });
-  };
+  }, [updateMastery]);
+
+  const rows = [];
+  for (let index = start; index < end; index++) {
+    const card = flashcards[index];
+    rows.push(card ? (
+      <FlashcardRow key={card.id} card={card} index={index} onStudy={onStudy} onUnmaster={handleUnmaster} />
+    ) : (
+      <div
+        key={`placeholder-${index}`}
+        className="absolute left-0 right-0 flex items-center px-4 border-b text-sm text-muted-foreground"
+        style={{ top: index * ROW_HEIGHT, height: ROW_HEIGHT }}
+      >
+        Loading…
+      </div>
+    ));
+  }
 
   return (
     <div className="space-y-6">
@@ -59,47 +162,21 @@ const FlashcardList: FC<FlashcardListProps> = ({
 
       {/* Content Section */}
       <div className="border rounded-lg shadow-sm">
-        {flashcards.length === 0 ? (
+        {rowCount === 0 ? (
           <div className="p-8 text-center">
             <p className="text-muted-foreground">No flashcards available.</p>
           </div>
         ) : (
-          <div className="space-y-2">
-            {flashcards.map((card, index) => (
-              <div
-                key={card.id}
-                className="flex flex-col sm:flex-row items-start sm:items-center gap-3 p-4 border rounded-lg hover:bg-muted/50 transition-colors cursor-pointer"
-                onClick={() => onStudy(index)}
-              >
-                <div className="flex-1 min-w-0">
-                  <p className="font-medium text-sm sm:text-base break-words">
-                    {card.front}
-                  </p>
-                </div>
-                
-                <div className="flex flex-col sm:flex-row items-start sm:items-center gap-2 w-full sm:w-auto">
-                  <span className={`inline-flex items-center px-2 py-1 rounded-full text-xs font-medium ${
-                    card.mastered 
-                      ? "bg-green-100 text-green-800 dark:bg-green-900 dark:text-green-200" 
-                      : "bg-red-100 text-red-800 dark:bg-red-900 dark:text-red-200"
-                  }`}>
-                    {card.mastered ? "✅ Mastered" : "❌ Not Mastered"}
-                  </span>
-                  
-                  {card.mastered && (
-                    <Button
-                      variant="outline"
-                      size="sm"
-                      onClick={(e) => handleUnmaster(e, card.id)}
-                      className="text-xs w-full sm:w-auto"
-                    >
-                      Unmaster
-                    </Button>
-                  )}
-                </div>
-              </div>
-            ))}
-          </div>
+          <>
+            <div ref={setContainer} className="overflow-y-auto" style={{ maxHeight: "70vh" }}>
+              <div className="relative" style={{ height: rowCount * ROW_HEIGHT }}>{rows}</div>
+            </div>
+            {hasMore && (
+              <p className="px-4 py-2 border-t text-xs text-muted-foreground">
+                {flashcards.length} of {totalCount} cards loaded{isLoadingMore ? ", loading more…" : ""}
+              </p>
+            )}
+          </>
         )}
       </div>
     </div>
@@ -1,5 +1,5 @@
-import { useState, useEffect } from "react";
-import { useUpdateMastery } from "../api/hooks";
+import { useState, useEffect, useRef } from "react";
+import { useRecordReview, useUpdateMastery } from "../api/hooks";
 import { Button } from "./ui/button";
 import {
   Card,
@@ -25,6 +25,11 @@ export function FlashcardPlayer({ cards, startIndex = 0 }: FlashcardPlayerProps)
   const [current, setCurrent] = useState(startIndex);
   const [isFlipped, setIsFlipped] = useState(false);
   const { mutate: updateMastery } = useUpdateMastery();
+  const { mutate: recordReview } = useRecordReview();
+
+  // When the current card was shown and when its answer was first revealed (ms)
+  const shownAt = useRef(performance.now());
+  const revealedAt = useRef<number | null>(null);
 
   // Reset current index if it's out of bounds
   useEffect(() => {
@@ -33,31 +38,52 @@ export function FlashcardPlayer({ cards, startIndex = 0 }: FlashcardPlayerProps)
     }
   }, [cards.length, current]);
 
-  // Reset flip state when card changes
+  // Reset flip state and review timing when card changes
   useEffect(() => {
     setIsFlipped(false);
+    shownAt.current = performance.now();
+    revealedAt.current = null;
   }, [current]);
 
   const card = cards[current];
 
+  // Record how the card went when leaving it: skipped if the answer was never
+  // revealed, otherwise correct/incorrect by its mastery when moving on
+  const recordCurrentReview = () => {
+    if (!card) return;
+    const revealed = revealedAt.current;
+    recordReview({
+      flashcardId: card.id,
+      result: revealed === null ? "skipped" : card.mastered ? "correct" : "incorrect",
+      latencyMs: (revealed ?? performance.now()) - shownAt.current,
+    });
+  };
+
   const handleToggleMastery = () => {
     if (!card) return;
     
-    // Update on server (cache invalidation will handle UI update)
+    // The cached card updates optimistically (see useUpdateMastery)
     updateMastery({ flashcardId: card.id, mastered: !card.mastered });
   };
 
   const handleFlip = () => {
+    if (!isFlipped && revealedAt.current === null) {
+      revealedAt.current = performance.now();
+    }
     setIsFlipped(!isFlipped);
   };
 
-  const goToPrevious = () => {
-    setCurrent(Math.max(0, current - 1));
+  // Only a move to another card ends the review; Previous on the first card
+  // and Next on the last one leave it open
+  const goTo = (index: number) => {
+    if (index === current) return;
+    recordCurrentReview();
+    setCurrent(index);
   };
 
-  const goToNext = () => {
-    setCurrent(Math.min(cards.length - 1, current + 1));
-  };
+  const goToPrevious = () => goTo(Math.max(0, current - 1));
+
+  const goToNext = () => goTo(Math.min(cards.length - 1, current + 1));
 
   if (!card) {
     return (
@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import { Button } from './ui/button';
 import { Input } from './ui/input';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
+import { rememberReadAfter } from '../api/hooks';
 
 interface Flashcard {
   front: string;
@@ -46,7 +47,7 @@ export const LocalCardCreator: React.FC<LocalCardCreatorProps> = ({ onSync }) =>
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({ flashcards: cards }),
-      });
+      }).then(rememberReadAfter);
 
       if (!response.ok) {
         throw new Error('Failed to sync cards');
@@ -4,7 +4,7 @@ import { Input } from './ui/input';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
 
 interface LoginFormProps {
-  onLogin: (token: string) => void;
+  onLogin: (token: string, refreshToken?: string) => void;
 }
 
 export const LoginForm: React.FC<LoginFormProps> = ({ onLogin }) => {
@@ -34,7 +34,7 @@ export const LoginForm: React.FC<LoginFormProps> = ({ onLogin }) => {
 
       const data = await response.json();
       localStorage.setItem('token', data.access_token);
-      onLogin(data.access_token);
+      onLogin(data.access_token, data.refresh_token);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Login failed');
     } finally {
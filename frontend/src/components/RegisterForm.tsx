@@ -4,7 +4,7 @@ import { Input } from './ui/input';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
 
 interface RegisterFormProps {
-  onRegister: (token: string) => void;
+  onRegister: (token: string, refreshToken?: string) => void;
   onSwitchToLogin: () => void;
 }
 
@@ -49,7 +49,7 @@ export const RegisterForm: React.FC<RegisterFormProps> = ({ onRegister, onSwitch
 
       const data = await response.json();
       localStorage.setItem('token', data.access_token);
-      onRegister(data.access_token);
+      onRegister(data.access_token, data.refresh_token);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Registration failed');
     } finally {
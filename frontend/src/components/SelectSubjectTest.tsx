@@ -1,16 +1,11 @@
 import { useState, useEffect } from "react";
 import { useSubjects, useTests } from "../api/hooks";
+import type { DeckCounts, SubjectSummary, TestSummary } from "../api/hooks";
 import { Button } from "./ui/button";
 
-interface Subject {
-  id: number;
-  name: string;
-}
-
-interface Test {
-  id: number;
-  name: string;
-}
+// e.g. "12/40 mastered"
+const countsLabel = ({ card_count, mastered_count }: DeckCounts) =>
+  `${mastered_count}/${card_count} mastered`;
 
 interface Props {
   onSelectTest: (testId: number, subjectId: number) => void;
@@ -53,13 +48,14 @@ export default function SelectSubjectTest({ onSelectTest }: Props) {
     return (
       <div>
         <h2 className="text-xl mb-2">Choose Subject</h2>
-        {subjects?.map((s: Subject) => (
+        {subjects?.map((s: SubjectSummary) => (
           <Button
             key={s.id}
             className="m-2"
             onClick={() => setSelectedSubjectId(s.id)}
           >
             {s.name}
+            <span className="ml-2 text-xs opacity-75">{countsLabel(s)}</span>
           </Button>
         ))}
       </div>
@@ -69,13 +65,14 @@ export default function SelectSubjectTest({ onSelectTest }: Props) {
   return (
     <div>
       <h2 className="text-xl mb-2">Choose Test</h2>
-      {tests?.map((t: Test) => (
+      {tests?.map((t: TestSummary) => (
         <Button
           key={t.id}
           className="m-2"
           onClick={() => handleTestClick(t.id)}
         >
           {t.name}
+          <span className="ml-2 text-xs opacity-75">{countsLabel(t)}</span>
         </Button>
       ))}
 
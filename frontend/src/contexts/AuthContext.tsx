@@ -1,4 +1,19 @@
-import React, { createContext, useContext, useState, useEffect, type ReactNode } from 'react';
+import React, { createContext, useContext, useState, useEffect, useRef, useCallback, type ReactNode } from 'react';
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
+
+// Refresh the access token this long before it expires
+const REFRESH_MARGIN_MS = 60_000;
+
+// Expiry (ms since epoch) read from the JWT payload; 0 if it cannot be read
+const tokenExpiry = (jwt: string): number => {
+  try {
+    const payload = JSON.parse(atob(jwt.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')));
+    return typeof payload.exp === 'number' ? payload.exp * 1000 : 0;
+  } catch {
+    return 0;
+  }
+};
 
 interface User {
   id: number;
@@ -9,7 +24,7 @@ interface User {
 interface AuthContextType {
   user: User | null;
   token: string | null;
-  login: (token: string) => void;
+  login: (token: string, refreshToken?: string) => void;
   logout: () => void;
   isLoading: boolean;
 }
@@ -33,51 +48,138 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   const [token, setToken] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
 
-  useEffect(() => {
-    const storedToken = localStorage.getItem('token');
-    if (storedToken) {
-      setToken(storedToken);
-      fetchUser(storedToken);
-    } else {
-      setIsLoading(false);
-    }
+  const refreshing = useRef<Promise<string | null> | null>(null);
+
+  const clearSession = useCallback(() => {
+    setUser(null);
+    setToken(null);
+    localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
+  }, []);
+
+  // Trade the stored refresh token for a new token pair without asking for the password again.
+  // Concurrent callers share one request, since each refresh token can only be used once.
+  const refreshAccessToken = useCallback((): Promise<string | null> => {
+    if (refreshing.current) return refreshing.current;
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (!refreshToken) return Promise.resolve(null);
+
+    refreshing.current = (async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        });
+        if (!response.ok) {
+          // Another tab may have rotated the token first and stored the new pair
+          const latest = localStorage.getItem('refreshToken');
+          if (latest && latest !== refreshToken) {
+            const latestToken = localStorage.getItem('token');
+            setToken(latestToken);
+            return latestToken;
+          }
+          return null;
+        }
+        const data = await response.json();
+        localStorage.setItem('token', data.access_token);
+        localStorage.setItem('refreshToken', data.refresh_token);
+        setToken(data.access_token);
+        return data.access_token as string;
+      } catch (error) {
+        console.error('Failed to refresh token:', error);
+        return null;
+      } finally {
+        refreshing.current = null;
+      }
+    })();
+    return refreshing.current;
   }, []);
 
-  const fetchUser = async (authToken: string) => {
+  const fetchUser = useCallback(async (authToken: string) => {
     try {
-      const response = await fetch(`${import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'}/me`, {
+      let response = await fetch(`${API_BASE_URL}/me`, {
         headers: {
           'Authorization': `Bearer ${authToken}`,
         },
       });
 
+      if (response.status === 401) {
+        const refreshed = await refreshAccessToken();
+        if (refreshed) {
+          response = await fetch(`${API_BASE_URL}/me`, {
+            headers: { 'Authorization': `Bearer ${refreshed}` },
+          });
+        }
+      }
+
       if (response.ok) {
         const userData = await response.json();
         setUser(userData);
       } else {
-        // Token is invalid, remove it
-        localStorage.removeItem('token');
-        setToken(null);
+        // Token is invalid and could not be refreshed, remove it
+        clearSession();
       }
     } catch (error) {
       console.error('Failed to fetch user:', error);
-      localStorage.removeItem('token');
-      setToken(null);
+      clearSession();
     } finally {
       setIsLoading(false);
     }
-  };
+  }, [refreshAccessToken, clearSession]);
+
+  useEffect(() => {
+    const storedToken = localStorage.getItem('token');
+    if (storedToken) {
+      setToken(storedToken);
+      fetchUser(storedToken);
+    } else {
+      setIsLoading(false);
+    }
+  }, [fetchUser]);
+
+  // Refresh silently shortly before the access token expires, and when the tab becomes
+  // visible again (timers are throttled in background tabs and stop while the machine sleeps)
+  useEffect(() => {
+    if (!token) return;
+    const refreshIfDue = () => {
+      if (tokenExpiry(token) - Date.now() <= REFRESH_MARGIN_MS) {
+        refreshAccessToken().then((refreshed) => {
+          if (!refreshed) clearSession();
+        });
+      }
+    };
+    const timer = window.setTimeout(refreshIfDue, Math.max(tokenExpiry(token) - Date.now() - REFRESH_MARGIN_MS, 0));
+    const onVisible = () => {
+      if (document.visibilityState === 'visible') refreshIfDue();
+    };
+    document.addEventListener('visibilitychange', onVisible);
+    return () => {
+      window.clearTimeout(timer);
+      document.removeEventListener('visibilitychange', onVisible);
+    };
+  }, [token, refreshAccessToken, clearSession]);
 
-  const login = (authToken: string) => {
+  const login = (authToken: string, refreshToken?: string) => {
     setToken(authToken);
     localStorage.setItem('token', authToken);
+    if (refreshToken) {
+      localStorage.setItem('refreshToken', refreshToken);
+    }
     fetchUser(authToken);
   };
 
   const logout = () => {
-    setUser(null);
-    setToken(null);
-    localStorage.removeItem('token');
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      // Revoke server-side too; the session ends locally either way
+      fetch(`${API_BASE_URL}/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch(() => undefined);
+    }
+    clearSession();
   };
 
   const value: AuthContextType = {
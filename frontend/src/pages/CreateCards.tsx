@@ -4,6 +4,7 @@ import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../components/ui/card';
 import { useAuth } from '../contexts/AuthContext';
+import { rememberReadAfter } from '../api/hooks';
 import { Plus, Trash2, Upload } from 'lucide-react';
 
 interface Flashcard {
@@ -61,7 +62,7 @@ export const CreateCards: React.FC = () => {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({ flashcards: cards }),
-      });
+      }).then(rememberReadAfter);
 
       if (!response.ok) {
         throw new Error('Failed to sync cards');
@@ -1,38 +1,50 @@
-import React, { useState } from "react";
+import React, { useCallback, useEffect, useMemo, useState } from "react";
 import SelectSubjectTest from "../components/SelectSubjectTest";
 import FlashcardList from "../components/FlashcardList";
 import { FlashcardPlayer } from "../components/FlashcardPlayer";
 import { useFlashcards, useSubjects, useTests } from "../api/hooks";
 
-interface Flashcard {
-  id: number;
-  front: string;
-  back: string;
-  mastered: boolean;
-}
-
 interface Subject {
   id: number;
   name: string;
 }
 
-interface Test {
-  id: number;
-  name: string;
-}
-
 export const StudyPage: React.FC = () => {
   // State for selected test and subject
   const [selectedTestId, setSelectedTestId] = useState<number | null>(null);
   const [selectedSubjectId, setSelectedSubjectId] = useState<number | null>(null);
   
   // Get data from the API cache
-  const { data: flashcards = [] } = useFlashcards(selectedTestId || 0);
+  const {
+    data: flashcardPages,
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useFlashcards(selectedTestId || 0);
   const { data: subjects = [] } = useSubjects();
   const { data: tests = [] } = useTests(selectedSubjectId || 0);
 
+  // Cards of every page loaded so far, in deck order
+  const flashcards = useMemo(
+    () => flashcardPages?.pages.flatMap((page) => page.cards) ?? [],
+    [flashcardPages]
+  );
+
   // UI mode: "select" | "list" | "study"
   const [mode, setMode] = useState<"select" | "list" | "study">("select");
+
+  const loadMore = useCallback(() => {
+    if (hasNextPage && !isFetchingNextPage) {
+      fetchNextPage();
+    }
+  }, [hasNextPage, isFetchingNextPage, fetchNextPage]);
+
+  // The player steps through the whole deck, so keep loading the remaining pages while studying
+  useEffect(() => {
+    if (mode === "study") {
+      loadMore();
+    }
+  }, [mode, loadMore]);
   
   // Track which card to start studying from
   const [startIndex, setStartIndex] = useState<number>(0);
@@ -45,10 +57,11 @@ export const StudyPage: React.FC = () => {
   };
 
   // View list or study directly
-  const handleStudy = (cardIndex: number = 0) => {
+  // Stable so the memoized list rows don't re-render when the page does
+  const handleStudy = useCallback((cardIndex: number = 0) => {
     setStartIndex(cardIndex);
     setMode("study");
-  };
+  }, []);
 
   const handleBackToTests = () => {
     setMode("select");
@@ -60,13 +73,14 @@ export const StudyPage: React.FC = () => {
     setMode("list");
   };
 
-  // Calculate mastered count
-  const masteredCount = flashcards.filter((card: Flashcard) => card.mastered).length;
-  const totalCount = flashcards.length;
+  // Counts come from the test's summary, which covers cards not loaded yet
+  const selectedTest = tests.find((t) => t.id === selectedTestId);
+  const masteredCount = selectedTest?.mastered_count ?? 0;
+  const totalCount = selectedTest?.card_count ?? flashcardPages?.pages[0]?.total ?? 0;
 
   // Get subject and test names
   const subjectName = subjects.find((s: Subject) => s.id === selectedSubjectId)?.name || "";
-  const testName = tests.find((t: Test) => t.id === selectedTestId)?.name || "";
+  const testName = selectedTest?.name || "";
 
   return (
     <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8 py-8">
@@ -93,6 +107,10 @@ export const StudyPage: React.FC = () => {
       {mode === "list" && (
         <FlashcardList
           flashcards={flashcards}
+          totalCount={flashcardPages?.pages[0]?.total ?? 0}
+          hasMore={!!hasNextPage}
+          isLoadingMore={isFetchingNextPage}
+          onLoadMore={loadMore}
           subjectName={subjectName}
           testName={testName}
           onStudy={handleStudy}